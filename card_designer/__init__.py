@@ -0,0 +1,29 @@
+"""Rendering and export core for the Professional Business Card Designer.
+
+Importing the package is cheap: card geometry and templates are plain
+Python, and the renderers (NumPy, Pillow, ReportLab) are imported the
+first time one of their functions is used; see :mod:`.backends`.
+"""
+import importlib
+
+from .geometry import (BLEED_INCHES, DPI_OPTIONS, FORMAT_DIMS, ORIENTATIONS, SAFE_INCHES, SHEET_SIZES,
+                       CardGeometry, bleed_pixels, card_geometry, card_size, safe_pixels)
+from .templates import DEFAULT_PLACEHOLDERS, TEMPLATE_CONFIGS
+
+_LAZY = {
+    "load_design": "render",
+    "render_design": "render",
+    "export_design": "export",
+}
+
+__all__ = ["BLEED_INCHES", "DEFAULT_PLACEHOLDERS", "DPI_OPTIONS", "FORMAT_DIMS", "ORIENTATIONS", "SAFE_INCHES",
+           "SHEET_SIZES", "TEMPLATE_CONFIGS", "CardGeometry", "bleed_pixels", "card_geometry", "card_size",
+           "safe_pixels", *_LAZY]
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,75 @@
+"""Content-addressed store for processed uploads, served by URL.
+
+Each asset is written once as ``<sha256>.<ext>`` under a directory that
+Streamlit serves statically (``server.enableStaticServing`` exposes
+``./static`` as ``app/static``).  The canvas references the stable URL, so
+the bytes are neither inlined into the component HTML nor copied into undo
+snapshots, and identical uploads from any session share one file.
+
+Every blur or brightness setting produces a new asset, so the store is
+bounded: once its files exceed ``max_bytes`` the least recently stored or
+re-stored ones are deleted.  The app stores the current background again
+on every rerun, which keeps it recent and rewrites it if it was evicted.
+"""
+import hashlib
+import pathlib
+
+from PIL import Image
+
+from .cache import DiskLRUCache
+from .render import load_image_source
+
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp", "image/svg+xml": "svg"}
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class AssetStore:
+    def __init__(self, root, url_prefix="app/static/assets", max_bytes=DEFAULT_MAX_BYTES):
+        self.root = pathlib.Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_bytes = max_bytes
+        self._files = DiskLRUCache(self.root, max_bytes)
+
+    def __getstate__(self):
+        # Render workers receive open_image and only read files; the size
+        # index (and its lock) stays with the process that stores assets.
+        return dict(self.__dict__, _files=None)
+
+    def filename(self, digest, mime):
+        return f"{digest}.{EXTENSIONS.get(mime, 'bin')}"
+
+    def put(self, data, mime, digest=None):
+        """Store ``data`` if it is not already present and return its URL.
+
+        Storing an existing asset marks it as recently used.  Files are
+        written atomically, so no session ever serves a partial asset.
+        """
+        digest = digest or hashlib.sha256(data).hexdigest()
+        name = self.filename(digest, mime)
+        if not self._files.touch(name):
+            self._files.put(name, data)
+        return f"{self.url_prefix}/{name}"
+
+    def path_for(self, url):
+        """Local path of an asset URL produced by :meth:`put`, or ``None``."""
+        prefix = self.url_prefix + "/"
+        url = url.split("?", 1)[0]
+        index = url.find(prefix)
+        if index == -1:
+            return None
+        name = url[index + len(prefix):]
+        if "/" in name or "\\" in name or name.startswith("."):
+            return None
+        return self.root / name
+
+    def open_image(self, src):
+        """``image_loader`` for the renderers: opens asset URLs and data URLs only.
+
+        Any other ``src`` raises ``ValueError``, so a design cannot make the
+        server read arbitrary files.
+        """
+        path = self.path_for(src)
+        if path is None:
+            return load_image_source(src)
+        return Image.open(path)
+
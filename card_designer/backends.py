@@ -0,0 +1,151 @@
+"""Export backends, imported the first time they are used.
+
+Each backend is a module plus the entry point the rest of the package
+calls.  :func:`load` imports it on first use, so the app, the command
+line and job workers only pay for the backends a request actually needs;
+ReportLab, for example, is not loaded until someone exports a PDF.
+
+:func:`measure` imports each backend in a fresh interpreter and records
+its cold import time and the heavy libraries it pulled in, against the
+budgets in :data:`BACKENDS`.  ``python -m card_designer imports --check``
+runs it and fails when a backend is over budget, which catches a stray
+top-level import before it slows every app start and worker spawn.
+"""
+import importlib
+import importlib.util
+import json
+import os
+import pathlib
+import subprocess
+import sys
+from typing import NamedTuple
+
+
+class Backend(NamedTuple):
+    module: str
+    attr: str = None  # entry point; None loads the module itself
+    budget_ms: float = 250.0  # cold import time budget
+    optional: bool = False  # a missing optional backend is skipped, not an error
+
+
+BACKENDS = {
+    "core": Backend("card_designer", budget_ms=50),
+    "raster": Backend("card_designer.render", "render_design"),
+    "export": Backend("card_designer.export", "export_design"),
+    "cmyk": Backend("card_designer.cmyk", "to_cmyk"),
+    "pdf": Backend("card_designer.vectorpdf", "export_pdf", budget_ms=350),
+    "svg": Backend("card_designer.svg", "export_svg"),
+    "batch": Backend("card_designer.batch", "run_batch", budget_ms=300),
+    "imposition": Backend("card_designer.impose", "run_imposition", budget_ms=400),
+    "jobs": Backend("card_designer.jobs", "JobScheduler", budget_ms=100),
+    "opencv": Backend("cv2", budget_ms=400, optional=True),
+}
+# Exporter backend for each format of :data:`~card_designer.export.EXPORT_FORMATS`.
+EXPORTERS = {"png": "raster", "jpg": "raster", "pdf": "pdf", "svg": "svg"}
+# Third-party packages worth reporting when a backend's import pulls them in.
+HEAVY_MODULES = ("numpy", "PIL", "reportlab", "cv2", "pandas", "streamlit", "pypdfium2")
+
+_loaded = {}
+
+
+class ImportTiming(NamedTuple):
+    name: str
+    module: str
+    ms: float  # best of the runs; None if the backend is not installed
+    budget_ms: float
+    heavy: tuple  # HEAVY_MODULES the import loaded
+
+    @property
+    def over_budget(self):
+        return self.ms is not None and self.ms > self.budget_ms
+
+
+def register(name, module, attr=None, *, budget_ms=250.0, optional=False):
+    """Add or replace a backend; it is imported by the next :func:`load`."""
+    BACKENDS[name] = Backend(module, attr, budget_ms, optional)
+    _loaded.pop(name, None)
+
+
+def _backend(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown backend {name!r}; expected one of {', '.join(BACKENDS)}") from None
+
+
+def load(name):
+    """Import backend ``name`` and return its entry point (or its module)."""
+    try:
+        return _loaded[name]
+    except KeyError:
+        pass
+    backend = _backend(name)
+    value = importlib.import_module(backend.module)
+    if backend.attr is not None:
+        value = getattr(value, backend.attr)
+    _loaded[name] = value
+    return value
+
+
+def exporter(format):
+    """Entry point of the backend that writes ``format``."""
+    try:
+        return load(EXPORTERS[format])
+    except KeyError:
+        raise ValueError(f"Unsupported export format: {format!r}") from None
+
+
+def available(name):
+    """Whether backend ``name`` can be imported, without importing it."""
+    module = _backend(name).module
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+# Run in a fresh interpreter: import one module, print its time and what it loaded.
+_PROBE = """\
+import importlib, json, sys, time
+before = set(sys.modules)
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+ms = (time.perf_counter() - started) * 1000
+print(json.dumps({"ms": ms, "modules": sorted({m.partition(".")[0] for m in set(sys.modules) - before})}))
+"""
+
+
+def _probe(module, python):
+    env = dict(os.environ)
+    root = str(pathlib.Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    result = subprocess.run([python, "-c", _PROBE, module], env=env, capture_output=True, text=True)
+    if result.returncode:
+        if "ModuleNotFoundError" in result.stderr or "ImportError" in result.stderr:
+            return None
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def measure(names=None, *, runs=3, python=None):
+    """Cold import time of each backend, as a list of :class:`ImportTiming`.
+
+    Every run imports the backend in a new interpreter so nothing is
+    already loaded; the fastest of ``runs`` is kept to damp scheduling
+    noise.  A missing backend gets ``ms=None``, which is an error for a
+    required one.
+    """
+    python = python or sys.executable
+    timings = []
+    for name in names or BACKENDS:
+        backend = _backend(name)
+        probes = [_probe(backend.module, python) for _ in range(runs)]
+        if None in probes:
+            if not backend.optional:
+                raise ImportError(f"backend {name!r} ({backend.module}) cannot be imported")
+            timings.append(ImportTiming(name, backend.module, None, backend.budget_ms, ()))
+            continue
+        heavy = tuple(m for m in HEAVY_MODULES if m in probes[0]["modules"])
+        timings.append(ImportTiming(name, backend.module, round(min(p["ms"] for p in probes), 1),
+                                    backend.budget_ms, heavy))
+    return timings
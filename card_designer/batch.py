@@ -0,0 +1,312 @@
+"""Mail-merge batch generation: one saved template, one card per data row.
+
+The template is the file written by the editor's 💾 Save button.  Rows come
+from a CSV file or a pandas DataFrame; placeholder text from the editor
+("Your Name", the Contact Info block, ...) is replaced with each row's
+values and every card is rendered in a process pool (or written as SVG,
+with shared images stored once under ``assets/``).  Results are consumed
+in order with a bounded number of cards in flight and written straight to a
+ZIP archive or a multi-page PDF, so memory stays flat for any run length.
+"""
+import csv
+import hashlib
+import io
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from PIL import Image
+
+from . import fabric
+from .assets import EXTENSIONS
+from .cmyk import to_cmyk
+from .pdfstream import PdfStreamWriter, flate_pixels
+from .geometry import bleed_pixels
+from .render import load_design, render_design
+from .svg import export_svg
+from .templates import DEFAULT_PLACEHOLDERS
+
+_FIELD_TOKEN = re.compile(r"\{\{\s*([\w .-]+?)\s*\}\}")
+
+_worker_state = {}
+
+
+class Card(NamedTuple):
+    index: int
+    filename: str
+    data: bytes
+    size: tuple
+    mask: bytes = None  # zlib alpha samples for ``encoding="raw-alpha"``
+    assets: tuple = ()  # ``(name, data)`` of images first referenced by this SVG card
+
+
+class _SvgAssets:
+    """``assets`` callable for SVG cards: images are named by content under ``assets/``.
+
+    Each worker hands a file to the writer once, with the first card that
+    uses it, however many cards reference it.
+    """
+
+    def __init__(self):
+        self.shipped = set()
+        self.pending = []
+
+    def __call__(self, data, mime):
+        name = f"assets/{hashlib.sha256(data).hexdigest()}.{EXTENSIONS.get(mime, 'bin')}"
+        if name not in self.shipped:
+            self.shipped.add(name)
+            self.pending.append((name, data))
+        return name
+
+    def drain(self):
+        pending, self.pending = tuple(self.pending), []
+        return pending
+
+
+def iter_rows(source):
+    """Yield each data row as a dict with lower-cased column names.
+
+    ``source`` is a pandas DataFrame, a list of dicts, a CSV path, or a text
+    or binary file object holding CSV.  CSV input is read lazily.
+    """
+    if hasattr(source, "to_dict") and hasattr(source, "columns"):
+        columns = [str(c).strip().lower() for c in source.columns]
+        for values in source.itertuples(index=False, name=None):
+            yield {c: ("" if v != v or v is None else str(v)) for c, v in zip(columns, values)}
+        return
+    if isinstance(source, (list, tuple)):
+        for row in source:
+            yield {str(k).strip().lower(): "" if v is None else str(v) for k, v in row.items()}
+        return
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline="", encoding="utf-8-sig") as fp:
+            yield from iter_rows(fp)
+        return
+    if isinstance(source.read(0), bytes):
+        source = io.TextIOWrapper(source, encoding="utf-8-sig", newline="")
+    for row in csv.DictReader(source):
+        yield {str(k).strip().lower(): (v or "").strip() for k, v in row.items() if k is not None}
+
+
+def count_rows(source):
+    """Number of rows when it is known up front (DataFrame or list), else ``None``."""
+    if hasattr(source, "columns") or isinstance(source, (list, tuple)):
+        return len(source)
+    return None
+
+
+def merge_text(text, row, placeholders=DEFAULT_PLACEHOLDERS):
+    """Substitute row values into one text object's content.
+
+    ``{{column}}`` tokens are always replaced.  For editor placeholders, a
+    line whose placeholder column is empty in this row is dropped, so a
+    missing phone number removes the phone line from the contact block.
+    """
+    lines = []
+    for line in text.split("\n"):
+        keep = True
+        for placeholder, column in placeholders.items():
+            if placeholder in line and column in row:
+                value = row[column]
+                if not value:
+                    keep = False
+                    break
+                line = line.replace(placeholder, value)
+        if keep:
+            lines.append(_FIELD_TOKEN.sub(lambda m: row.get(m.group(1).lower(), ""), line))
+    return "\n".join(lines)
+
+
+def merge_objects(objects, row, placeholders=DEFAULT_PLACEHOLDERS):
+    """Copy an object list with merged text.
+
+    Only dicts are copied; large values such as image ``src`` data URLs are
+    shared with the template instead of being duplicated per card.
+    """
+    merged = []
+    for obj in objects or ():
+        obj = dict(obj)
+        if fabric.is_text(obj):
+            obj["text"] = merge_text(str(obj.get("text") or ""), row, placeholders)
+        elif obj.get("type") == "group":
+            obj["objects"] = merge_objects(obj.get("objects"), row, placeholders)
+        merged.append(obj)
+    return merged
+
+
+def merge_design(canvas_json, row, placeholders=DEFAULT_PLACEHOLDERS):
+    design = dict(canvas_json)
+    design["objects"] = merge_objects(canvas_json.get("objects"), row, placeholders)
+    return design
+
+
+def card_filename(index, row, extension):
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", row.get("name", "")).strip("-").lower()
+    return f"{index + 1:05d}-{slug or 'card'}.{extension}"
+
+
+def template_dimensions(metadata, dpi):
+    """Return ``(width, height, bleed, scale)`` to render a template at ``dpi``.
+
+    Saved templates record the canvas pixel size at the DPI they were
+    designed at; rendering at another DPI scales the whole design.
+    """
+    dims = metadata.get("dimensions") or {}
+    if not dims.get("width") or not dims.get("height"):
+        raise ValueError("template has no metadata.dimensions; save it from the editor")
+    design_dpi = int(dims.get("dpi") or dpi)
+    return int(dims["width"]), int(dims["height"]), bleed_pixels(design_dpi), dpi / design_dpi
+
+
+def _encode(image, encoding, quality, dpi, color="rgb"):
+    if encoding == "raw-alpha":
+        # The alpha goes out as a separate mask, so drop it instead of letting
+        # to_cmyk flatten edges onto white, which would fringe them on the sheet.
+        image = image.convert("RGB")
+    elif image.mode == "RGBA" and color != "cmyk":
+        # Transparent areas are paper, as to_cmyk flattens them for CMYK.
+        image = Image.alpha_composite(Image.new("RGBA", image.size, "white"), image)
+    image = to_cmyk(image) if color == "cmyk" else image.convert("RGB")
+    if encoding in ("raw", "raw-alpha"):
+        return flate_pixels(image)
+    buffer = io.BytesIO()
+    if encoding == "jpeg":
+        image.save(buffer, "JPEG", quality=quality, dpi=(dpi, dpi), optimize=True)
+    elif image.mode == "CMYK":
+        # PNG has no CMYK mode; lossless CMYK goes to TIFF instead.
+        image.save(buffer, "TIFF", dpi=(dpi, dpi), compression="tiff_adobe_deflate")
+    else:
+        # Level 3 is about twice as fast as the default for ~25% larger files.
+        image.save(buffer, "PNG", dpi=(dpi, dpi), compress_level=3)
+    return buffer.getvalue()
+
+
+def _init_worker(canvas_json, metadata, options):
+    # The template (with any embedded background) is shipped once per worker
+    # instead of once per row.
+    _worker_state.update(canvas=canvas_json, metadata=metadata, options=options, assets=_SvgAssets())
+
+
+def _render_row(index, row):
+    options = _worker_state["options"]
+    width, height, bleed, scale = template_dimensions(_worker_state["metadata"], options["dpi"])
+    design = merge_design(_worker_state["canvas"], row, options["placeholders"])
+    if options["encoding"] == "svg":
+        buffer = io.BytesIO()
+        export_svg(design, buffer, width, height, bleed, dpi=options["dpi"] / scale,
+                   include_bleed=options["include_bleed"], image_loader=options["image_loader"],
+                   assets=_worker_state["assets"])
+        return Card(index, card_filename(index, row, "svg"), buffer.getvalue(), (width, height),
+                    assets=_worker_state["assets"].drain())
+    image = render_design(design, width, height, bleed, scale=scale, include_bleed=options["include_bleed"],
+                          image_loader=options["image_loader"])
+    data = _encode(image, options["encoding"], options["quality"], options["dpi"], options["color"])
+    mask = flate_pixels(image.getchannel("A")) if options["encoding"] == "raw-alpha" else None
+    extension = {"jpeg": "jpg", "png": "tif" if options["color"] == "cmyk" else "png"}.get(options["encoding"], "bin")
+    return Card(index, card_filename(index, row, extension), data, image.size, mask)
+
+
+def render_batch(template, rows, *, dpi=300, encoding="png", quality=95, include_bleed=True,
+                 placeholders=DEFAULT_PLACEHOLDERS, workers=None, max_pending=None, progress=None,
+                 image_loader=None, color="rgb"):
+    """Render one card per row, yielding :class:`Card` results in row order.
+
+    ``encoding`` is ``"png"``, ``"jpeg"``, ``"raw"`` (zlib RGB for PDF
+    pages), ``"raw-alpha"`` (``"raw"`` plus a zlib alpha ``mask``) or
+    ``"svg"`` (vector cards whose images are returned in ``assets``).  At
+    most ``max_pending`` cards (default ``2 * workers``) are queued or held
+    at once.  ``progress(done, total)`` is called after each
+    card; ``total`` is ``None`` when reading CSV lazily.  ``workers=0`` renders
+    in the calling process.  ``image_loader`` is passed to the renderer and
+    must be picklable, e.g. :meth:`AssetStore.open_image`.  ``color="cmyk"``
+    converts cards with :func:`~card_designer.cmyk.to_cmyk` (PNG becomes TIFF).
+    """
+    canvas_json, metadata = load_design(template)
+    template_dimensions(metadata, dpi)  # fail fast on templates without dimensions
+    options = {"dpi": dpi, "encoding": encoding, "quality": quality,
+               "include_bleed": include_bleed, "placeholders": placeholders, "image_loader": image_loader,
+               "color": color}
+    total = count_rows(rows)
+    row_iter = enumerate(iter_rows(rows))
+
+    if workers == 0:
+        _init_worker(canvas_json, metadata, options)
+        for done, (index, row) in enumerate(row_iter, 1):
+            yield _render_row(index, row)
+            if progress:
+                progress(done, total)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(canvas_json, metadata, options)) as pool:
+        pending = deque()
+        done = 0
+        try:
+            for index, row in row_iter:
+                pending.append(pool.submit(_render_row, index, row))
+                if len(pending) >= max_pending:
+                    done += 1
+                    yield pending.popleft().result()
+                    if progress:
+                        progress(done, total)
+            while pending:
+                done += 1
+                yield pending.popleft().result()
+                if progress:
+                    progress(done, total)
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def write_zip(cards, fp):
+    """Stream cards, and the assets SVG cards reference, into a ZIP archive; returns the number of cards."""
+    count = 0
+    written = set()
+    with zipfile.ZipFile(fp, "w", compression=zipfile.ZIP_STORED) as archive:
+        for card in cards:
+            for name, data in card.assets:
+                # Workers ship the same asset independently; keep the first copy.
+                if name not in written:
+                    written.add(name)
+                    archive.writestr(name, data)
+            archive.writestr(card.filename, card.data)
+            count += 1
+    return count
+
+
+def write_pdf(cards, fp, dpi, *, encoding="jpeg", color="rgb"):
+    """Stream cards into a multi-page PDF, one card per page.
+
+    ``cards`` must have been rendered with ``encoding="jpeg"`` or ``"raw"``
+    and the same ``color``.
+    """
+    pdf_filter = "DCTDecode" if encoding == "jpeg" else "FlateDecode"
+    colorspace = "DeviceCMYK" if color == "cmyk" else "DeviceRGB"
+    count = 0
+    with PdfStreamWriter(fp) as pdf:
+        for card in cards:
+            pdf.add_image_page(card.data, card.size[0], card.size[1], dpi, filter=pdf_filter, colorspace=colorspace)
+            count += 1
+    return count
+
+
+def run_batch(template, rows, fp, *, output="zip", dpi=300, image_format="png", quality=95, **options):
+    """Render ``rows`` against ``template`` into ``fp`` as ``"zip"`` or ``"pdf"``.
+
+    For PDF output ``image_format`` selects JPEG pages (``"jpeg"``) or
+    lossless Flate pages (anything else); ZIP archives hold PNG, JPEG or
+    SVG files.  Returns the number of cards.
+    """
+    if output == "pdf":
+        encoding = "jpeg" if image_format in ("jpg", "jpeg") else "raw"
+        cards = render_batch(template, rows, dpi=dpi, encoding=encoding, quality=quality, **options)
+        return write_pdf(cards, fp, dpi, encoding=encoding, color=options.get("color", "rgb"))
+    encoding = {"jpg": "jpeg", "jpeg": "jpeg", "svg": "svg"}.get(image_format, "png")
+    cards = render_batch(template, rows, dpi=dpi, encoding=encoding, quality=quality, **options)
+    return write_zip(cards, fp)
@@ -0,0 +1,339 @@
+"""Reproducible benchmarks of the editor sync, ingest, render and export paths.
+
+    python -m card_designer bench -o results.json
+    python -m card_designer bench --fixtures stress --formats png pdf --dpi 300 --baseline old.json
+
+Every case runs one path on one fixture design, generated from fixed seeds
+so results compare across machines and versions:
+
+* ``blank``: background colour only;
+* ``text``: a dense card of multi-line text in several fonts and sizes;
+* ``image``: a photographic background image covering the bleed;
+* ``stress``: 200 mixed shapes, lines, text and groups.
+
+The paths are ``sync`` (the editor's settings and a full canvas delta
+serialized, applied and read back, which replaced the generated HTML),
+``ingest`` (a 12 MP phone photo downscaled, blurred and stored), and
+``render``/``export`` at each DPI of :data:`~card_designer.geometry.DPI_OPTIONS`
+and card size of :data:`~card_designer.geometry.FORMAT_DIMS`.  Each case
+reports latency percentiles over ``repeat`` runs after a warm-up run
+(which also fills the decoded-image caches, so timings are steady state),
+the output size and two peaks: the Python heap seen by :mod:`tracemalloc`,
+which includes NumPy buffers but not Pillow's image memory, and on Linux
+the growth of the process's resident set, which includes both.  Results
+are written as JSON; ``--baseline`` compares them with an earlier file.
+"""
+import base64
+import io
+import json
+import os
+import platform
+import re
+import tempfile
+import time
+import tracemalloc
+from importlib import metadata
+
+import numpy as np
+from PIL import Image
+
+from .geometry import DPI_OPTIONS, FORMAT_DIMS, card_geometry
+from .templates import TEMPLATE_CONFIGS
+
+FIXTURES = ("blank", "text", "image", "stress")
+PATHS = ("sync", "ingest", "render", "export")
+EXPORT_FORMATS = ("png", "jpg", "pdf", "svg")
+DEFAULT_REPEAT = 5
+# A p50 this much slower than the baseline counts as a regression.
+REGRESSION_TOLERANCE = 0.2
+STRESS_OBJECTS = 200
+PHOTO_SIZE = (4032, 3024)
+RESULTS_VERSION = 1
+
+_FONTS = ("Arial", "Helvetica", "Georgia", "Times New Roman", "Courier New")
+_COLORS = ("#2c3e50", "#3498db", "#e74c3c", "#f39c12", "#27ae60", "#8e44ad")
+_WORDS = ("design", "print", "studio", "north", "street", "office", "mobile", "creative", "director", "global")
+
+
+# -- fixtures ------------------------------------------------------------------
+
+def photo(size=PHOTO_SIZE, seed=0, format="JPEG"):
+    """Encoded bytes of a deterministic photo-like image: smooth gradients plus sensor noise."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+    channels = [127 + 100 * np.sin(x / w * (3 + c) + y / h * (2 + c) + c) for c in range(3)]
+    pixels = np.stack(channels, axis=-1) + rng.normal(0, 12, (h, w, 3))
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format, quality=92)
+    return buffer.getvalue()
+
+
+def _text(obj_id, text, left, top, width, font_size, rng):
+    return {"type": "textbox", "id": obj_id, "text": text, "left": left, "top": top, "width": width,
+            "fontSize": font_size, "fontFamily": _FONTS[rng.integers(len(_FONTS))],
+            "fontWeight": "bold" if rng.random() < 0.3 else "normal", "fill": _COLORS[rng.integers(len(_COLORS))],
+            "textAlign": ("left", "center", "right")[rng.integers(3)]}
+
+
+def _sentence(rng, words):
+    return " ".join(_WORDS[i] for i in rng.integers(len(_WORDS), size=words))
+
+
+def _shape(obj_id, kind, left, top, size, rng):
+    obj = {"type": kind, "id": obj_id, "left": left, "top": top, "fill": _COLORS[rng.integers(len(_COLORS))],
+           "stroke": _COLORS[rng.integers(len(_COLORS))], "strokeWidth": float(rng.integers(0, 4)),
+           "angle": float(rng.integers(0, 360)), "opacity": round(float(rng.uniform(0.4, 1.0)), 2)}
+    if kind == "circle":
+        obj["radius"] = size / 2
+    elif kind == "line":
+        obj.update(x1=0, y1=0, x2=size, y2=size / 3, fill=None, strokeWidth=2)
+    elif kind == "polygon":
+        obj["points"] = [{"x": 0, "y": size}, {"x": size / 2, "y": 0}, {"x": size, "y": size},
+                         {"x": size / 2, "y": size * 0.7}]
+    else:
+        obj.update(width=size, height=size * 0.6, rx=size / 10, ry=size / 10)
+    return obj
+
+
+def fixture(name, geometry):
+    """Canvas JSON of fixture ``name`` for a :class:`~card_designer.geometry.CardGeometry`."""
+    rng = np.random.default_rng(FIXTURES.index(name))
+    w, h = geometry.canvas_size
+    unit = geometry.dpi / 300  # fixtures are laid out at 300 DPI and scaled with the card
+    objects = []
+    design = {"version": "5.3.0", "objects": objects, "background": "#ffffff"}
+    if name == "text":
+        top = geometry.bleed + geometry.safe
+        while top < h - geometry.bleed - 60 * unit:
+            size = int(rng.choice([18, 24, 30, 40])) * unit
+            objects.append(_text(f"text-{len(objects)}", "\n".join(_sentence(rng, 4) for _ in range(2)),
+                                 geometry.bleed + geometry.safe, top, w * 0.8, size, rng))
+            top += size * 2.6
+    elif name == "image":
+        source_w, source_h = 1600, 1200
+        scale = max(w / source_w, h / source_h)
+        # The editor syncs its background as Fabric's backgroundImage, not as an object.
+        design["backgroundImage"] = {"type": "image", "id": "background_image", "left": 0, "top": 0,
+                                     "width": source_w, "height": source_h, "scaleX": scale, "scaleY": scale,
+                                     "src": "data:image/jpeg;base64,"
+                                            + base64.b64encode(photo((source_w, source_h), seed=1)).decode("ascii")}
+        objects.append(_text("name", "Your Name", w * 0.1, h * 0.6, w * 0.8, 48 * unit, rng))
+    elif name == "stress":
+        kinds = ("rect", "circle", "line", "polygon", "textbox", "group")
+        for i in range(STRESS_OBJECTS):
+            kind = kinds[i % len(kinds)]
+            left, top = float(rng.uniform(0, w * 0.9)), float(rng.uniform(0, h * 0.9))
+            size = float(rng.uniform(20, 120)) * unit
+            if kind == "textbox":
+                objects.append(_text(f"obj-{i}", _sentence(rng, 3), left, top, size * 3, 20 * unit, rng))
+            elif kind == "group":
+                children = [_shape(f"obj-{i}-{j}", "rect" if j % 2 else "circle", -size / 2 + j * size / 3,
+                                   -size / 2, size / 2, rng) for j in range(3)]
+                objects.append({"type": "group", "id": f"obj-{i}", "left": left, "top": top,
+                                "width": size * 1.5, "height": size, "objects": children})
+            else:
+                objects.append(_shape(f"obj-{i}", kind, left, top, size, rng))
+    elif name != "blank":
+        raise ValueError(f"unknown fixture {name!r}; expected one of {', '.join(FIXTURES)}")
+    return design
+
+
+# -- measurement ---------------------------------------------------------------
+
+def _rss_high_water():
+    """Peak resident set size in bytes since the last reset, or ``None`` off Linux."""
+    try:
+        with open("/proc/self/status") as fp:
+            return int(re.search(r"VmHWM:\s+(\d+) kB", fp.read()).group(1)) * 1024
+    except (OSError, AttributeError):
+        return None
+
+
+def _reset_rss_high_water():
+    try:
+        with open("/proc/self/clear_refs", "w") as fp:
+            fp.write("5")
+    except OSError:
+        pass
+
+
+def percentiles(values_ms):
+    """Nearest-rank p50/p95/p99, max and mean of a list of milliseconds."""
+    ordered = sorted(values_ms)
+
+    def rank(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+    return {"p50": rank(0.5), "p95": rank(0.95), "p99": rank(0.99), "max": round(ordered[-1], 2),
+            "mean": round(sum(ordered) / len(ordered), 2)}
+
+
+def run_case(fn, repeat=DEFAULT_REPEAT):
+    """Time ``fn()`` over ``repeat`` runs after one warm-up; returns timings, peaks and output size.
+
+    ``fn`` returns the bytes it produced (or their length).  The heap peak
+    comes from one extra run under :mod:`tracemalloc`, which would
+    otherwise slow the timed runs down.
+    """
+    _reset_rss_high_water()
+    baseline_rss = _rss_high_water()
+    output = fn()
+    peak_rss = _rss_high_water()
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    try:
+        fn()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    size = output if isinstance(output, int) else len(output)
+    rss = None if baseline_rss is None or peak_rss is None else peak_rss - baseline_rss
+    return {"runs": repeat, "ms": percentiles(times), "peak_bytes": peak, "peak_rss_bytes": rss,
+            "output_bytes": size}
+
+
+def _sync_case(geometry, design):
+    # Imported here: the component module loads Streamlit.
+    from .component import apply_delta, canvas_json, new_canvas_state
+
+    settings = {"canvas": {"width": geometry.width, "height": geometry.height, "dpi": geometry.dpi},
+                "guides": {"bleed": True, "safeZone": True, "center": False, "grid": False},
+                "templates": TEMPLATE_CONFIGS, "export": {"format": "PNG"}}
+    delta = {"session": "bench", "rev": 1, "full": True, "objects": {obj["id"]: obj for obj in design["objects"]},
+             "order": [obj["id"] for obj in design["objects"]], "background": design["background"],
+             "backgroundImage": design.get("backgroundImage")}
+
+    def run():
+        payload = json.dumps({"settings": settings}) + json.dumps(delta)
+        state = new_canvas_state()
+        apply_delta(state, json.loads(json.dumps(delta)))
+        return len(payload) + len(json.dumps(canvas_json(state)))
+
+    return run
+
+
+def _ingest_case(geometry, raw, assets_dir):
+    from .assets import AssetStore
+    from .ingest import adjust_background, background_cache, prepare_background
+
+    store = AssetStore(assets_dir)
+
+    def run():
+        background_cache.clear()
+        proxy = prepare_background(raw, geometry.canvas_size, geometry.dpi, "image/jpeg")
+        proxy = adjust_background(proxy, blur=0.2, brightness=1.1)
+        store.put(proxy.data, proxy.mime)
+        return proxy.data
+
+    return run
+
+
+def _render_case(geometry, design):
+    from .render import render_design
+
+    def run():
+        image = render_design(design, geometry.width, geometry.height, geometry.bleed)
+        return image.width * image.height * len(image.getbands())
+
+    return run
+
+
+def _export_case(geometry, design, format):
+    from .export import export_design
+
+    def run():
+        return export_design(design, format, geometry.width, geometry.height, geometry.bleed, dpi=geometry.dpi)
+
+    return run
+
+
+def run_benchmarks(*, paths=PATHS, fixtures=FIXTURES, formats=EXPORT_FORMATS, dpis=DPI_OPTIONS,
+                   sizes=tuple(FORMAT_DIMS), repeat=DEFAULT_REPEAT, progress=None):
+    """Run every selected case; returns the results document written by :func:`write_results`.
+
+    ``ingest`` runs once per size and DPI (it takes an upload, not a
+    design); ``sync`` once per fixture, since its cost does not depend on
+    the card size.  ``progress(case)`` is called after each case.
+    """
+    cases = []
+
+    def record(fn, **labels):
+        case = {**labels, **run_case(fn, repeat)}
+        cases.append(case)
+        if progress:
+            progress(case)
+
+    sync_geometry = card_geometry("US Standard")
+    with tempfile.TemporaryDirectory(prefix="card-bench-") as assets_dir:
+        raw = photo() if "ingest" in paths else None
+        for fixture_name in fixtures:
+            if "sync" in paths:
+                record(_sync_case(sync_geometry, fixture(fixture_name, sync_geometry)),
+                       path="sync", fixture=fixture_name, size="US Standard", dpi=300)
+        for size in sizes:
+            for dpi in dpis:
+                geometry = card_geometry(size, dpi=dpi)
+                if "ingest" in paths:
+                    record(_ingest_case(geometry, raw, assets_dir), path="ingest", fixture="photo", size=size, dpi=dpi)
+                for fixture_name in fixtures:
+                    design = fixture(fixture_name, geometry)
+                    if "render" in paths:
+                        record(_render_case(geometry, design), path="render", fixture=fixture_name, size=size, dpi=dpi)
+                    if "export" in paths:
+                        for format in formats:
+                            record(_export_case(geometry, design, format), path="export", fixture=fixture_name,
+                                   size=size, dpi=dpi, format=format)
+    return {"version": RESULTS_VERSION, "environment": environment(), "repeat": repeat, "cases": cases}
+
+
+def environment():
+    """Interpreter, machine and library versions, to judge whether two result files compare."""
+    versions = {}
+    for package in ("numpy", "pillow", "reportlab", "streamlit", "opencv-python"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "packages": versions}
+
+
+def case_key(case):
+    return case["path"], case["fixture"], case["size"], case["dpi"], case.get("format")
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Cases whose p50 is more than ``tolerance`` slower than in ``baseline``.
+
+    Returns ``(case, baseline_case, ratio)`` tuples, slowest first; cases
+    missing from either side are ignored.
+    """
+    previous = {case_key(case): case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(case_key(case))
+        if old is None or not old["ms"]["p50"]:
+            continue
+        ratio = case["ms"]["p50"] / old["ms"]["p50"]
+        if ratio > 1 + tolerance:
+            regressions.append((case, old, ratio))
+    return sorted(regressions, key=lambda item: -item[2])
+
+
+def write_results(results, fp):
+    json.dump(results, fp, indent=1)
+    fp.write("\n")
+
+
+def format_case(case):
+    label = "/".join(str(part) for part in case_key(case) if part is not None)
+    ms = case["ms"]
+    return (f"{label:<44} p50 {ms['p50']:>9.1f} ms  p95 {ms['p95']:>9.1f} ms  "
+            f"heap {case['peak_bytes'] / 1e6:>6.1f} MB  rss +{(case['peak_rss_bytes'] or 0) / 1e6:>6.1f} MB  "
+            f"out {case['output_bytes'] / 1e3:>8.1f} kB")
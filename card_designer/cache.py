@@ -0,0 +1,195 @@
+"""Caches shared by every Streamlit session: in-process and on disk."""
+import hashlib
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by the total size of its values.
+
+    ``sizeof`` measures a value in bytes; the least recently used entries
+    are evicted once ``max_bytes`` is exceeded.  A single value larger than
+    the budget is returned to the caller but not stored.
+    """
+
+    def __init__(self, max_bytes, sizeof=sys.getsizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, _size = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._data.pop(key)[1]
+            if size > self.max_bytes:
+                return value
+            self._data[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _key, (_value, evicted) = self._data.popitem(last=False)
+                self.current_bytes -= evicted
+        return value
+
+    def get_or_create(self, key, factory):
+        """Return the cached value for ``key``, computing it with ``factory()`` on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self.put(key, factory())
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class DiskLRUCache:
+    """Thread-safe LRU of byte blobs stored as files under ``root``.
+
+    Keys must be safe file names, e.g. :func:`canonical_hash` digests.  The
+    recency order survives restarts through file modification times, which
+    are bumped on every hit.  Entries are evicted oldest first once the
+    total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = OrderedDict()
+        self._lock = threading.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.root):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _mtime, name, size in sorted(entries):
+            self._index[name] = size
+            self.current_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._index:
+            name, size = self._index.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self.root / name)
+            except FileNotFoundError:
+                pass
+
+    def _forget(self, key):
+        self.current_bytes -= self._index.pop(key, 0)
+
+    def get(self, key, default=None):
+        path = self.root / key
+        with self._lock:
+            if key in self._index:
+                try:
+                    data = path.read_bytes()
+                    os.utime(path)
+                except FileNotFoundError:
+                    self._forget(key)  # removed behind our back
+                else:
+                    self._index.move_to_end(key)
+                    self.hits += 1
+                    return data
+            self.misses += 1
+            return default
+
+    def put(self, key, data):
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            os.replace(tmp, self.root / key)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        with self._lock:
+            self._forget(key)
+            self._index[key] = len(data)
+            self.current_bytes += len(data)
+            self._evict()
+        return data
+
+    def touch(self, key):
+        """Mark ``key`` as recently used without reading it; returns whether it is stored."""
+        with self._lock:
+            if key not in self._index:
+                return False
+            try:
+                os.utime(self.root / key)
+            except FileNotFoundError:
+                self._forget(key)
+                return False
+            self._index.move_to_end(key)
+            return True
+
+    def get_or_create(self, key, factory):
+        """Return the cached bytes for ``key``, producing them with ``factory()`` on a miss."""
+        data = self.get(key, _MISSING)
+        if data is _MISSING:
+            data = self.put(key, factory())
+        return data
+
+    def clear(self):
+        with self._lock:
+            for name in self._index:
+                try:
+                    os.unlink(self.root / name)
+                except FileNotFoundError:
+                    pass
+            self._index.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+
+def canonical_hash(*parts):
+    """SHA-256 hex digest of JSON-serializable ``parts``, independent of key order and whitespace."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, separators=(",", ":"), default=str).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+_MISSING = object()
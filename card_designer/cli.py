@@ -0,0 +1,213 @@
+"""Headless command line: render one design or mail-merge a batch.
+
+    python -m card_designer render business-card-template.json -o card.pdf
+    python -m card_designer batch template.json contacts.csv -o cards.zip --format svg
+    python -m card_designer imports --check --json imports.json
+    python -m card_designer bench -o results.json --baseline previous.json
+
+Start-up stays small because each command imports only the backend it
+needs: a PNG render loads Pillow and NumPy, never ReportLab or Streamlit.
+``--timings`` reports the time from this module loading to the start of
+work against :data:`COLD_START_BUDGET_MS`, and the time the work took;
+``imports`` measures every backend's cold import time against its budget,
+and ``bench`` runs the benchmark suite of :mod:`.bench`.
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse  # noqa: E402
+import pathlib  # noqa: E402
+import sys  # noqa: E402
+
+from .geometry import DPI_OPTIONS, FORMAT_DIMS, ORIENTATIONS, bleed_pixels, card_geometry  # noqa: E402
+
+COLD_START_BUDGET_MS = 200
+SUFFIX_FORMATS = {".png": "png", ".tif": "png", ".tiff": "png", ".jpg": "jpg", ".jpeg": "jpg", ".pdf": "pdf",
+                  ".svg": "svg"}
+
+
+def _dimensions(metadata, args):
+    """Design size ``(width, height, bleed, design_dpi)`` from saved metadata or the command line."""
+    dims = metadata.get("dimensions") or {}
+    if dims.get("width") and dims.get("height"):
+        design_dpi = int(dims.get("dpi") or args.dpi or 300)
+        return int(dims["width"]), int(dims["height"]), bleed_pixels(design_dpi), design_dpi
+    geometry = card_geometry(args.card_format, args.orientation, args.dpi or 300)
+    return geometry.width, geometry.height, geometry.bleed, geometry.dpi
+
+
+def _format(args):
+    fmt = args.format or SUFFIX_FORMATS.get(pathlib.Path(args.output).suffix.lower())
+    if fmt is None:
+        raise SystemExit(f"cannot tell the format from {args.output!r}; pass --format")
+    return fmt
+
+
+def _report(args, started, stage):
+    if not args.timings:
+        return
+    now = time.perf_counter()
+    startup_ms = (started - _STARTED) * 1000
+    over = " OVER BUDGET" if startup_ms > COLD_START_BUDGET_MS else ""
+    print(f"{stage}: startup {startup_ms:.0f} ms (budget {COLD_START_BUDGET_MS} ms){over}, "
+          f"work {(now - started) * 1000:.0f} ms", file=sys.stderr)
+
+
+def cmd_render(args):
+    from .export import export_design
+    from .render import load_design
+
+    started = time.perf_counter()
+    canvas_json, metadata = load_design(pathlib.Path(args.design))
+    width, height, bleed, design_dpi = _dimensions(metadata, args)
+    data = export_design(canvas_json, _format(args), width, height, bleed, dpi=design_dpi,
+                         scale=(args.dpi or design_dpi) / design_dpi, quality=args.quality,
+                         compress_level=args.compress_level, include_bleed=not args.no_bleed,
+                         color="cmyk" if args.cmyk else "rgb")
+    pathlib.Path(args.output).write_bytes(data)
+    _report(args, started, "render")
+
+
+def cmd_batch(args):
+    import os
+    import tempfile
+
+    from .batch import run_batch
+
+    started = time.perf_counter()
+    target = pathlib.Path(args.output)
+    output = "pdf" if target.suffix.lower() == ".pdf" else "zip"
+
+    def progress(done, total):
+        if args.progress:
+            print(f"\r{done} cards", end="", file=sys.stderr, flush=True)
+
+    # Written beside the target and renamed on success, so a bad template
+    # never leaves an empty file in place of an earlier good one.
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=".tmp-", suffix=target.suffix)
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            count = run_batch(pathlib.Path(args.template).read_bytes(), args.rows, fp, output=output,
+                              dpi=args.dpi or 300, image_format=args.format or "png", quality=args.quality,
+                              include_bleed=not args.no_bleed, workers=args.workers, progress=progress,
+                              color="cmyk" if args.cmyk else "rgb")
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)  # mkstemp creates the file private
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    if args.progress:
+        print(file=sys.stderr)
+    print(f"{count} cards written to {args.output}")
+    _report(args, started, "batch")
+
+
+def cmd_imports(args):
+    import json
+
+    from .backends import measure
+
+    timings = measure(args.backends or None, runs=args.runs)
+    for t in timings:
+        ms = "not installed" if t.ms is None else f"{t.ms:.0f} ms"
+        over = " OVER BUDGET" if t.over_budget else ""
+        print(f"{t.name:<12} {t.module:<26} {ms:>14} (budget {t.budget_ms:.0f} ms){over}  {' '.join(t.heavy)}")
+    if args.json:
+        records = [{**t._asdict(), "heavy": list(t.heavy), "over_budget": t.over_budget} for t in timings]
+        pathlib.Path(args.json).write_text(json.dumps(records, indent=2))
+    if args.check and any(t.over_budget for t in timings):
+        raise SystemExit(1)
+
+
+def cmd_bench(args):
+    import json
+
+    from . import bench
+
+    def progress(case):
+        if not args.quiet:
+            print(bench.format_case(case), file=sys.stderr)
+
+    results = bench.run_benchmarks(paths=args.paths, fixtures=args.fixtures, formats=args.formats, dpis=args.dpi,
+                                   sizes=args.sizes, repeat=args.repeat, progress=progress)
+    with open(args.output, "w") as fp:
+        bench.write_results(results, fp)
+    print(f"{len(results['cases'])} cases written to {args.output}")
+    if args.baseline:
+        regressions = bench.compare(results, json.loads(pathlib.Path(args.baseline).read_text()), args.tolerance)
+        for case, old, ratio in regressions:
+            print(f"{ratio:.2f}x slower (p50 was {old['ms']['p50']:.1f} ms): {bench.format_case(case)}")
+        if args.check and regressions:
+            raise SystemExit(1)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m card_designer", description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-o", "--output", required=True, help="output file; its suffix picks the format")
+    common.add_argument("--dpi", type=int, help=f"output resolution, e.g. {', '.join(map(str, DPI_OPTIONS))}")
+    common.add_argument("--quality", type=int, default=95, help="JPEG quality (default: 95)")
+    common.add_argument("--no-bleed", action="store_true", help="crop to the trim size")
+    common.add_argument("--cmyk", action="store_true", help="CMYK output (PNG becomes TIFF)")
+    common.add_argument("--timings", action="store_true", help="print start-up and run times to stderr")
+
+    render = commands.add_parser("render", parents=[common], help="export one design")
+    render.add_argument("design", help="saved design (business-card-template.json) or canvas JSON")
+    render.add_argument("--format", choices=["png", "jpg", "pdf", "svg"])
+    render.add_argument("--compress-level", type=int, default=6, help="PNG compression 0-9 (default: 6)")
+    render.add_argument("--card-format", choices=list(FORMAT_DIMS), default="US Standard",
+                        help="card size for designs saved without dimensions")
+    render.add_argument("--orientation", choices=ORIENTATIONS, default="Landscape")
+    render.set_defaults(func=cmd_render)
+
+    batch = commands.add_parser("batch", parents=[common], help="one card per CSV row, into a ZIP or PDF")
+    batch.add_argument("template", help="saved template (business-card-template.json)")
+    batch.add_argument("rows", help="CSV file with one contact per row")
+    batch.add_argument("--format", choices=["png", "jpg", "svg"], help="card format in a ZIP, or JPEG PDF pages")
+    batch.add_argument("--workers", type=int, help="render processes (default: one per CPU; 0 renders inline)")
+    batch.add_argument("--progress", action="store_true", help="show a running card count")
+    batch.set_defaults(func=cmd_batch)
+
+    imports = commands.add_parser("imports", help="measure each backend's cold import time")
+    imports.add_argument("backends", nargs="*", help="backends to measure (default: all)")
+    imports.add_argument("--runs", type=int, default=3, help="fresh interpreters per backend; the best is kept")
+    imports.add_argument("--json", help="also write the timings to this JSON file")
+    imports.add_argument("--check", action="store_true", help="exit with status 1 if a backend is over budget")
+    imports.set_defaults(func=cmd_imports)
+
+    # Choices are spelled out so --help works without importing the benchmarks.
+    bench = commands.add_parser("bench", help="benchmark sync, ingest, render and export; results as JSON")
+    bench.add_argument("-o", "--output", default="bench-results.json", help="results file (default: %(default)s)")
+    bench.add_argument("--paths", nargs="+", choices=["sync", "ingest", "render", "export"],
+                       default=["sync", "ingest", "render", "export"])
+    bench.add_argument("--fixtures", nargs="+", choices=["blank", "text", "image", "stress"],
+                       default=["blank", "text", "image", "stress"])
+    bench.add_argument("--formats", nargs="+", choices=["png", "jpg", "pdf", "svg"],
+                       default=["png", "jpg", "pdf", "svg"])
+    bench.add_argument("--dpi", nargs="+", type=int, default=list(DPI_OPTIONS))
+    bench.add_argument("--sizes", nargs="+", choices=list(FORMAT_DIMS), default=list(FORMAT_DIMS))
+    bench.add_argument("--repeat", type=int, default=5, help="timed runs per case, after one warm-up")
+    bench.add_argument("--baseline", help="earlier results file to compare p50 latencies with")
+    bench.add_argument("--tolerance", type=float, default=0.2, help="p50 slowdown counted as a regression")
+    bench.add_argument("--check", action="store_true", help="exit with status 1 on a regression")
+    bench.add_argument("--quiet", action="store_true", help="do not print each case as it finishes")
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except (OSError, ImportError, ValueError) as exc:
+        raise SystemExit(f"error: {exc}") from exc
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""RGB to CMYK conversion for print output.
+
+With an ICC output profile (set ``CARD_DESIGNER_CMYK_PROFILE`` or install one
+of :data:`PROFILE_CANDIDATES`), whole images go through a cached LittleCMS
+transform from sRGB.  Without one, a NumPy grey-component replacement is
+used, which printers accept but which does not model any particular press.
+Single colours (swatches for vector fills) are converted through the same
+path and memoized, so a design's handful of colours costs one lookup each.
+"""
+import os
+import pathlib
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageChops, ImageCms
+
+PROFILE_ENV = "CARD_DESIGNER_CMYK_PROFILE"
+PROFILE_DIRS = [
+    pathlib.Path("/usr/share/color/icc"),
+    pathlib.Path("/usr/local/share/color/icc"),
+    pathlib.Path.home() / ".color/icc",
+    pathlib.Path("/Library/ColorSync/Profiles"),
+    pathlib.Path(os.environ.get("WINDIR", "C:/Windows")) / "System32/spool/drivers/color",
+]
+PROFILE_CANDIDATES = ["ISOcoated_v2_eci.icc", "CoatedFOGRA39.icc", "USWebCoatedSWOP.icc",
+                      "GRACoL2013_CRPC6.icc", "default_cmyk.icc"]
+INTENTS = {
+    "perceptual": ImageCms.Intent.PERCEPTUAL,
+    "relative": ImageCms.Intent.RELATIVE_COLORIMETRIC,
+    "saturation": ImageCms.Intent.SATURATION,
+    "absolute": ImageCms.Intent.ABSOLUTE_COLORIMETRIC,
+}
+
+
+@lru_cache(maxsize=1)
+def default_profile():
+    """Path of the CMYK output profile to use, or ``None`` for the built-in conversion."""
+    configured = os.environ.get(PROFILE_ENV)
+    if configured:
+        return configured
+    for root in PROFILE_DIRS:
+        for name in PROFILE_CANDIDATES:
+            for path in root.rglob(name) if root.is_dir() else ():
+                return str(path)
+    return None
+
+
+@lru_cache(maxsize=8)
+def _transform(profile, intent):
+    return ImageCms.buildTransform(ImageCms.createProfile("sRGB"), ImageCms.getOpenProfile(profile),
+                                   "RGB", "CMYK", renderingIntent=INTENTS[intent])
+
+
+@lru_cache(maxsize=1)
+def _gcr_table():
+    # table[max << 8 | v] = (max - v) * 255 / max for one of R, G, B
+    top, value = np.meshgrid(np.arange(256), np.arange(256), indexing="ij")
+    table = (top - value) * 255 / np.maximum(top, 1)
+    return table.clip(0, 255).round().astype(np.uint8).ravel()
+
+
+def _gcr(image):
+    """Grey-component replacement: K from the brightest channel, CMY scaled to the rest.
+
+    Band operations run in Pillow and the division is a 64 KB table lookup,
+    so a 600 DPI card converts in about a tenth of a second.
+    """
+    bands = image.split()
+    top = ImageChops.lighter(ImageChops.lighter(bands[0], bands[1]), bands[2])
+    index = np.asarray(top).astype(np.uint16) << 8
+    table = _gcr_table()
+    cmy = [Image.fromarray(np.take(table, index | np.asarray(band))) for band in bands]
+    return Image.merge("CMYK", cmy + [ImageChops.invert(top)])
+
+
+def to_cmyk(image, profile=None, intent="perceptual", background=(255, 255, 255)):
+    """Convert a Pillow image to mode ``CMYK``.
+
+    Transparent areas are flattened onto ``background`` first, as the paper
+    shows through them.  ``profile`` defaults to :func:`default_profile`.
+    """
+    if image.mode == "CMYK":
+        return image
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        flat = Image.new("RGB", image.size, background)
+        flat.paste(image, mask=image.getchannel("A"))
+        image = flat
+    else:
+        image = image.convert("RGB")
+    profile = profile or default_profile()
+    if profile:
+        return ImageCms.applyTransform(image, _transform(profile, intent))
+    return _gcr(image)
+
+
+@lru_cache(maxsize=4096)
+def rgb_to_cmyk(rgb, profile=None, intent="perceptual"):
+    """Convert one ``(r, g, b)`` colour to ``(c, m, y, k)`` fractions in 0-1."""
+    swatch = to_cmyk(Image.new("RGB", (1, 1), tuple(rgb[:3])), profile, intent)
+    return tuple(v / 255 for v in swatch.getpixel((0, 0)))
@@ -0,0 +1,49 @@
+"""Parsing of the colour strings Fabric.js writes into canvas JSON."""
+from functools import lru_cache
+
+from PIL import ImageColor
+
+TRANSPARENT = (0, 0, 0, 0)
+
+
+@lru_cache(maxsize=1024)
+def parse_color(value):
+    """Return ``(r, g, b, a)`` with 0-255 channels, or ``None`` for no paint.
+
+    Handles ``#rgb``/``#rrggbb``/``#rrggbbaa``, ``rgb()``/``rgba()`` with the
+    fractional alpha Fabric uses (``rgba(102, 126, 234, 0.3)``) and CSS names.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    if value in ("none", "transparent"):
+        return None
+    if value.startswith(("rgb(", "rgba(")):
+        parts = [p.strip() for p in value[value.index("(") + 1:value.rindex(")")].split(",")]
+        channels = []
+        for part in parts[:3]:
+            if part.endswith("%"):
+                channels.append(round(float(part[:-1]) * 2.55))
+            else:
+                channels.append(round(float(part)))
+        alpha = 255
+        if len(parts) > 3:
+            a = parts[3]
+            alpha = round(float(a[:-1]) * 2.55) if a.endswith("%") else round(float(a) * 255)
+        r, g, b = (max(0, min(255, c)) for c in channels)
+        return (r, g, b, max(0, min(255, alpha)))
+    try:
+        rgba = ImageColor.getrgb(value)
+    except ValueError:
+        return None
+    if len(rgba) == 3:
+        rgba = (*rgba, 255)
+    return tuple(rgba)
+
+
+def with_opacity(rgba, opacity):
+    """Scale the alpha of ``rgba`` by an object's ``opacity``."""
+    if rgba is None:
+        return None
+    r, g, b, a = rgba
+    return (r, g, b, max(0, min(255, round(a * opacity))))
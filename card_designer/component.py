@@ -0,0 +1,90 @@
+"""Bidirectional Streamlit component hosting the Fabric.js editor.
+
+The iframe is created once per session and kept alive across reruns:
+sidebar and tab widgets reach it as a small ``settings`` dict that the
+editor diffs and applies in place, and canvas edits come back as deltas of
+the objects that changed.  Deltas are merged into a per-session
+:func:`new_canvas_state` so Python always has the current design without
+the browser re-sending the whole canvas.
+
+The uploaded background is not one of the canvas objects: the editor
+paints it into a static underlay with the guides and syncs it as Fabric's
+``backgroundImage``, which the renderers draw beneath the objects.
+"""
+import pathlib
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+FRONTEND_DIR = pathlib.Path(__file__).parent / "frontend"
+STATE_KEY = "card_canvas_state"
+FABRIC_VERSION = "5.3.0"
+# Time from iframe navigation to a usable canvas that the editor should stay under.
+EDITOR_TTI_TARGET_MS = 1500
+
+_component = components.declare_component("card_canvas", path=str(FRONTEND_DIR))
+
+
+def new_canvas_state():
+    return {"session": None, "rev": 0, "objects": {}, "order": [], "background": "#ffffff",
+            "backgroundImage": None, "metrics": {}, "telemetry": None}
+
+
+def apply_delta(state, delta):
+    """Merge an editor delta into ``state``; returns whether anything changed.
+
+    A delta from a new editor session replaces the state once its full sync
+    arrives.  Older or repeated revisions are ignored, and because the
+    editor re-sends every change until it is acknowledged, applying the
+    latest revision is always enough.
+    """
+    if not delta:
+        return False
+    if delta.get("session") != state["session"]:
+        if not delta.get("full"):
+            return False
+        state.update(new_canvas_state(), session=delta["session"])
+    elif delta.get("rev", 0) <= state["rev"]:
+        return False
+    if delta.get("full"):
+        state["objects"] = {}
+    for object_id, obj in (delta.get("objects") or {}).items():
+        if obj is None:
+            state["objects"].pop(object_id, None)
+        else:
+            state["objects"][object_id] = obj
+    if delta.get("order") is not None:
+        state["order"] = list(delta["order"])
+    if delta.get("background") is not None:
+        state["background"] = delta["background"]
+    if "backgroundImage" in delta:
+        state["backgroundImage"] = delta["backgroundImage"]
+    if delta.get("metrics"):
+        state["metrics"] = delta["metrics"]
+    # Browser timings since the previous delta; the app hands them on and clears them.
+    state["telemetry"] = delta.get("telemetry") or None
+    state["rev"] = delta["rev"]
+    return True
+
+
+def canvas_json(state):
+    """The synced design in the shape of Fabric's ``canvas.toJSON()``."""
+    objects = [state["objects"][object_id] for object_id in state["order"] if object_id in state["objects"]]
+    design = {"version": FABRIC_VERSION, "objects": objects, "background": state["background"]}
+    if state.get("backgroundImage"):
+        design["backgroundImage"] = state["backgroundImage"]
+    return design
+
+
+def card_canvas(settings, key="card_canvas"):
+    """Render the editor and return the session's canvas state.
+
+    ``settings`` must be JSON serializable; the editor applies only the
+    parts that differ from the previous run.
+    """
+    state = st.session_state.setdefault(STATE_KEY, new_canvas_state())
+    # The component's latest value is already in session state at the start
+    # of the run, so it can be merged and acknowledged in the same render.
+    apply_delta(state, st.session_state.get(key))
+    _component(settings=settings, ack={"session": state["session"], "rev": state["rev"]}, key=key, default=None)
+    return state
@@ -0,0 +1,83 @@
+"""Single-card export in the sidebar's formats: PNG, JPG, PDF and SVG.
+
+Every format is produced server-side from the synced canvas JSON and
+returned as encoded bytes, ready for a download response.  Raster formats
+come from :func:`render_design`, PDF from :func:`export_pdf` and SVG from
+:func:`export_svg`, which embeds the images so the file stands alone.
+"""
+import io
+from typing import NamedTuple
+
+from . import backends
+from .render import load_design, load_image_source, render_design
+
+
+class ExportFormat(NamedTuple):
+    extension: str
+    mime: str
+
+
+EXPORT_FORMATS = {
+    "png": ExportFormat("png", "image/png"),
+    "jpg": ExportFormat("jpg", "image/jpeg"),
+    "pdf": ExportFormat("pdf", "application/pdf"),
+    "svg": ExportFormat("svg", "image/svg+xml"),
+}
+# PNG has no CMYK mode; lossless CMYK output is written as TIFF instead.
+CMYK_PNG_FORMAT = ExportFormat("tif", "image/tiff")
+DEFAULT_PNG_COMPRESSION = 6
+
+
+def output_format(format, color="rgb"):
+    """The :class:`ExportFormat` actually written for ``format`` and ``color``."""
+    if format == "png" and color == "cmyk":
+        return CMYK_PNG_FORMAT
+    return EXPORT_FORMATS[format]
+
+
+def encode_image(image, format, *, quality=95, compress_level=DEFAULT_PNG_COMPRESSION, dpi=300, color="rgb"):
+    """Encode a rendered card as ``"png"`` or ``"jpg"`` bytes.
+
+    JPEGs are progressive and optimized at ``quality``; PNGs are lossless at
+    every ``compress_level`` (0-9), which only trades encode time for size.
+    """
+    if color == "cmyk":
+        image = backends.load("cmyk")(image)
+    buffer = io.BytesIO()
+    if format == "jpg":
+        image = image if image.mode == "CMYK" else image.convert("RGB")
+        image.save(buffer, "JPEG", quality=quality, dpi=(dpi, dpi), optimize=True, progressive=True)
+    elif image.mode == "CMYK":
+        image.save(buffer, "TIFF", dpi=(dpi, dpi), compression="tiff_adobe_deflate")
+    else:
+        image.save(buffer, "PNG", dpi=(dpi, dpi), compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def export_design(design, format, width, height, bleed=0, *, dpi=300, scale=1.0, quality=95,
+                  compress_level=DEFAULT_PNG_COMPRESSION, include_bleed=True, image_loader=None, color="rgb"):
+    """Export one design as ``format`` (a key of :data:`EXPORT_FORMATS`); returns the bytes.
+
+    Arguments are those of :func:`render_design`, plus the encoder settings
+    of :func:`encode_image`.  ``dpi`` is the design's; ``scale`` resamples
+    PNG and JPG output, whose files record ``dpi * scale``.
+    ``color="cmyk"`` applies to PNG, JPG and PDF; SVG is always sRGB.
+    """
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {format!r}")
+    canvas_json, _metadata = load_design(design)
+    if format in ("pdf", "svg"):
+        buffer = io.BytesIO()
+        # Each vector backend is imported on first use; ReportLab only for PDF.
+        write = backends.exporter(format)
+        if format == "pdf":
+            write(canvas_json, buffer, width, height, bleed, dpi=dpi, include_bleed=include_bleed,
+                  image_loader=image_loader, color=color)
+        else:
+            write(canvas_json, buffer, width, height, bleed, dpi=dpi, include_bleed=include_bleed,
+                  image_loader=image_loader or load_image_source)
+        return buffer.getvalue()
+    image = render_design(canvas_json, width, height, bleed, scale=scale, include_bleed=include_bleed,
+                          image_loader=image_loader)
+    return encode_image(image, format, quality=quality, compress_level=compress_level, dpi=round(dpi * scale),
+                        color=color)
@@ -0,0 +1,201 @@
+"""Fabric.js object model helpers shared by the server-side renderers.
+
+Matrices use the canvas 2D convention ``(a, b, c, d, e, f)`` so that
+``x' = a*x + c*y + e`` and ``y' = b*x + d*y + f``, exactly like Fabric's
+``calcTransformMatrix``.  All geometry is in canvas units, which are print
+pixels because the editor sizes the canvas at the chosen DPI.
+"""
+import math
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Fabric's text layout constants (fabric.Text.prototype, v5).
+FONT_SIZE_MULT = 1.13
+FONT_SIZE_FRACTION = 0.222
+DECORATION_OFFSETS = {"underline": 0.10, "linethrough": -0.315, "overline": -0.88}
+
+_ORIGINS = {"left": -0.5, "top": -0.5, "center": 0.0, "right": 0.5, "bottom": 0.5}
+_TEXT_TYPES = ("text", "i-text", "textbox")
+
+
+def multiply(m, n):
+    """Return ``m @ n`` (``n`` is applied first)."""
+    return (
+        m[0] * n[0] + m[2] * n[1],
+        m[1] * n[0] + m[3] * n[1],
+        m[0] * n[2] + m[2] * n[3],
+        m[1] * n[2] + m[3] * n[3],
+        m[0] * n[4] + m[2] * n[5] + m[4],
+        m[1] * n[4] + m[3] * n[5] + m[5],
+    )
+
+
+def invert(m):
+    a, b, c, d, e, f = m
+    det = a * d - b * c
+    if det == 0:
+        raise ValueError("matrix is not invertible")
+    return (d / det, -b / det, -c / det, a / det, (c * f - d * e) / det, (b * e - a * f) / det)
+
+
+def translate(x, y):
+    return (1.0, 0.0, 0.0, 1.0, float(x), float(y))
+
+
+def scale(sx, sy=None):
+    return (float(sx), 0.0, 0.0, float(sx if sy is None else sy), 0.0, 0.0)
+
+
+def apply(m, points):
+    a, b, c, d, e, f = m
+    return [(a * x + c * y + e, b * x + d * y + f) for x, y in points]
+
+
+def linear_scale(m):
+    """Geometric mean scale of ``m``; used to size strokes."""
+    return math.sqrt(abs(m[0] * m[3] - m[1] * m[2]))
+
+
+def is_text(obj):
+    return obj.get("type") in _TEXT_TYPES
+
+
+def _origin(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return _ORIGINS.get(value, -0.5)
+
+
+def object_size(obj):
+    """Untransformed ``(width, height)``; text boxes may be re-measured."""
+    return float(obj.get("width") or 0), float(obj.get("height") or 0)
+
+
+def own_matrix(obj, size=None):
+    """Fabric ``calcOwnMatrix``: local (centre-origin) space to parent space."""
+    width, height = size or object_size(obj)
+    stroke_width = float(obj.get("strokeWidth", 1) or 0)
+    sx = float(obj.get("scaleX", 1) or 0)
+    sy = float(obj.get("scaleY", 1) or 0)
+    angle = math.radians(float(obj.get("angle", 0) or 0))
+
+    # Fabric offsets the origin by the transformed size, stroke included.
+    dim_x = (width + stroke_width) * sx
+    dim_y = (height + stroke_width) * sy
+    ox = (0.0 - _origin(obj.get("originX", "left"))) * dim_x
+    oy = (0.0 - _origin(obj.get("originY", "top"))) * dim_y
+    cos_a, sin_a = math.cos(angle), math.sin(angle)
+    cx = float(obj.get("left", 0) or 0) + ox * cos_a - oy * sin_a
+    cy = float(obj.get("top", 0) or 0) + ox * sin_a + oy * cos_a
+
+    m = (cos_a, sin_a, -sin_a, cos_a, cx, cy)
+    m = multiply(m, scale(-sx if obj.get("flipX") else sx, -sy if obj.get("flipY") else sy))
+    skew_x = float(obj.get("skewX", 0) or 0)
+    if skew_x:
+        m = multiply(m, (1.0, 0.0, math.tan(math.radians(skew_x)), 1.0, 0.0, 0.0))
+    skew_y = float(obj.get("skewY", 0) or 0)
+    if skew_y:
+        m = multiply(m, (1.0, math.tan(math.radians(skew_y)), 0.0, 1.0, 0.0, 0.0))
+    return m
+
+
+def walk(objects, matrix=IDENTITY, opacity=1.0, measure=None):
+    """Yield ``(obj, matrix, opacity, size)`` for every visible leaf object.
+
+    Group children are positioned relative to the group centre, so their
+    matrices are composed with the group's.  ``measure`` may return a
+    replacement ``(width, height)`` for text objects whose size depends on
+    fonts (``i-text`` is re-measured by Fabric on load as well).
+    """
+    for obj in objects or ():
+        if obj.get("visible") is False:
+            continue
+        size = measure(obj) if measure and is_text(obj) else object_size(obj)
+        m = multiply(matrix, own_matrix(obj, size))
+        alpha = opacity * float(obj.get("opacity", 1) if obj.get("opacity") is not None else 1)
+        if obj.get("type") == "group":
+            yield from walk(obj.get("objects"), m, alpha, measure)
+        else:
+            yield obj, m, alpha, size
+
+
+def _ellipse_points(rx, ry, segments, start=0.0, end=2 * math.pi):
+    step = (end - start) / segments
+    return [(rx * math.cos(start + i * step), ry * math.sin(start + i * step)) for i in range(segments + 1)]
+
+
+def _segments(radius, matrix):
+    return max(24, min(720, int(radius * linear_scale(matrix) * 0.75)))
+
+
+def _rounded_rect(w, h, rx, ry, matrix):
+    rx, ry = min(rx or ry, w / 2), min(ry or rx, h / 2)
+    if rx <= 0 or ry <= 0:
+        return [(-w / 2, -h / 2), (w / 2, -h / 2), (w / 2, h / 2), (-w / 2, h / 2)]
+    n = max(4, _segments(max(rx, ry), matrix) // 4)
+    points = []
+    for cx, cy, start in ((w / 2 - rx, -h / 2 + ry, -math.pi / 2), (w / 2 - rx, h / 2 - ry, 0.0),
+                          (-w / 2 + rx, h / 2 - ry, math.pi / 2), (-w / 2 + rx, -h / 2 + ry, math.pi)):
+        points.extend((cx + x, cy + y) for x, y in _ellipse_points(rx, ry, n, start, start + math.pi / 2))
+    return points
+
+
+def outline(obj, matrix=IDENTITY):
+    """Return ``(points, closed)`` for a shape in its local space, or ``None``.
+
+    ``matrix`` is only used to choose how finely curves are flattened.
+    """
+    kind = obj.get("type")
+    w, h = object_size(obj)
+    if kind == "rect":
+        return _rounded_rect(w, h, float(obj.get("rx") or 0), float(obj.get("ry") or 0), matrix), True
+    if kind == "circle":
+        r = float(obj.get("radius") or 0)
+        start = math.radians(float(obj.get("startAngle") or 0))
+        end = math.radians(float(obj.get("endAngle", 360) if obj.get("endAngle") is not None else 360))
+        if end - start >= 2 * math.pi - 1e-9:
+            return _ellipse_points(r, r, _segments(r, matrix))[:-1], True
+        return _ellipse_points(r, r, _segments(r, matrix), start, end), True
+    if kind == "ellipse":
+        rx, ry = float(obj.get("rx") or 0), float(obj.get("ry") or 0)
+        return _ellipse_points(rx, ry, _segments(max(rx, ry), matrix))[:-1], True
+    if kind == "triangle":
+        return [(-w / 2, h / 2), (0.0, -h / 2), (w / 2, h / 2)], True
+    if kind == "line":
+        return [(float(obj.get("x1", 0)), float(obj.get("y1", 0))),
+                (float(obj.get("x2", 0)), float(obj.get("y2", 0)))], False
+    if kind in ("polygon", "polyline"):
+        points = [(float(p["x"]), float(p["y"])) for p in obj.get("points") or ()]
+        if not points:
+            return None
+        xs, ys = [p[0] for p in points], [p[1] for p in points]
+        ox, oy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        return [(x - ox, y - oy) for x, y in points], kind == "polygon"
+    return None
+
+
+def text_lines(obj):
+    return str(obj.get("text") or "").split("\n")
+
+
+def text_height(obj):
+    """Fabric ``calcTextHeight`` for uniform font size text."""
+    font_size = float(obj.get("fontSize") or 40)
+    line_height = float(obj.get("lineHeight") or 1.16)
+    n = len(text_lines(obj))
+    return font_size * FONT_SIZE_MULT * (line_height * (n - 1) + 1)
+
+
+def baseline_offsets(obj, height):
+    """Baseline y of each line relative to the object's centre."""
+    font_size = float(obj.get("fontSize") or 40)
+    line_height = float(obj.get("lineHeight") or 1.16)
+    step = font_size * FONT_SIZE_MULT * line_height
+    first = font_size * FONT_SIZE_MULT * (1 - FONT_SIZE_FRACTION)
+    return [-height / 2 + i * step + first for i in range(len(text_lines(obj)))]
+
+
+def bounding_box(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
@@ -0,0 +1,91 @@
+"""Map the font families offered in the editor to TrueType files on disk."""
+import os
+import pathlib
+from functools import lru_cache
+
+from PIL import ImageFont
+
+FONT_DIRS = [
+    pathlib.Path.home() / ".fonts",
+    pathlib.Path.home() / ".local/share/fonts",
+    pathlib.Path("/usr/share/fonts"),
+    pathlib.Path("/usr/local/share/fonts"),
+    pathlib.Path("/Library/Fonts"),
+    pathlib.Path("/System/Library/Fonts"),
+    pathlib.Path(os.environ.get("WINDIR", "C:/Windows")) / "Fonts",
+]
+
+# Metric-compatible substitutes come first so server-side text measures the
+# same as the browser's Arial/Times, with DejaVu as the last resort.
+FAMILY_CANDIDATES = {
+    "arial": ["Arial", "LiberationSans", "Arimo", "DejaVuSans"],
+    "helvetica": ["Helvetica", "LiberationSans", "Arimo", "Arial", "DejaVuSans"],
+    "times new roman": ["Times New Roman", "TimesNewRoman", "times", "LiberationSerif", "Tinos", "DejaVuSerif"],
+    "georgia": ["Georgia", "Gelasio", "LiberationSerif", "DejaVuSerif"],
+    "verdana": ["Verdana", "DejaVuSans"],
+    "trebuchet ms": ["Trebuchet MS", "trebuc", "DejaVuSans"],
+    "impact": ["Impact", "LiberationSans", "DejaVuSans"],
+    "comic sans ms": ["Comic Sans MS", "comic", "DejaVuSans"],
+}
+DEFAULT_CANDIDATES = ["LiberationSans", "DejaVuSans"]
+
+_VARIANT_SUFFIXES = {
+    (False, False): ["-Regular", "", "_Regular"],
+    (True, False): ["-Bold", "bd", "_Bold", " Bold"],
+    (False, True): ["-Italic", "-Oblique", "i", "_Italic", " Italic"],
+    (True, True): ["-BoldItalic", "-BoldOblique", "bi", "z", "_Bold_Italic", " Bold Italic"],
+}
+_FONT_EXTENSIONS = (".ttf", ".otf", ".ttc")
+
+
+def is_bold(font_weight):
+    """Fabric stores weight as ``'bold'``/``'normal'`` or a CSS number."""
+    if isinstance(font_weight, (int, float)):
+        return font_weight >= 600
+    font_weight = str(font_weight or "").lower()
+    if font_weight.isdigit():
+        return int(font_weight) >= 600
+    return font_weight in ("bold", "bolder")
+
+
+def is_italic(font_style):
+    return str(font_style or "").lower() in ("italic", "oblique")
+
+
+@lru_cache(maxsize=1)
+def _font_index():
+    index = {}
+    for root in FONT_DIRS:
+        if not root.is_dir():
+            continue
+        for dirpath, _dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                stem, ext = os.path.splitext(filename)
+                if ext.lower() in _FONT_EXTENSIONS:
+                    index.setdefault(stem.lower(), os.path.join(dirpath, filename))
+    return index
+
+
+@lru_cache(maxsize=256)
+def resolve_font(family, bold=False, italic=False):
+    """Return the path of the best font file for a family, or ``None``."""
+    index = _font_index()
+    family = (family or "").strip().strip("'\"")
+    candidates = FAMILY_CANDIDATES.get(family.lower(), [family]) + DEFAULT_CANDIDATES
+    for variant in ((bold, italic), (bold, False), (False, False)):
+        for stem in candidates:
+            for suffix in _VARIANT_SUFFIXES[variant]:
+                path = index.get((stem + suffix).lower())
+                if path:
+                    return path
+    return None
+
+
+@lru_cache(maxsize=256)
+def load_font(family, size, bold=False, italic=False):
+    """Load a Pillow font; falls back to Pillow's bundled font if none is found."""
+    path = resolve_font(family, bold, italic)
+    size = max(1, round(size))
+    if path is None:
+        return ImageFont.load_default(size)
+    return ImageFont.truetype(path, size)
@@ -0,0 +1,1523 @@
+// Canvas configuration (updated from Streamlit settings on every render)
+let settings = null;
+let canvasW = 0;
+let canvasH = 0;
+let dpi = 300;
+let safeMarginPx = 0;
+let bleedMarginPx = 0;
+
+function setCanvasGeometry(geometry) {
+    canvasW = geometry.width;
+    canvasH = geometry.height;
+    dpi = geometry.dpi;
+    safeMarginPx = Math.round(0.125 * dpi);
+    bleedMarginPx = Math.round(0.125 * dpi);
+}
+
+// Initialize canvas
+const canvas = new fabric.Canvas('canvas', {
+    backgroundColor: '#ffffff',
+    preserveObjectStacking: true,
+    selection: true,
+    imageSmoothingEnabled: true,
+});
+
+// Global variables
+let currentZoom = 1;
+let panelsVisible = true;
+let undoStack = [];
+let redoStack = [];
+let objectCounter = 0;
+let historyBytes = 0;
+let historyBusy = false;
+let lastSnapshot = null;
+let HISTORY_BUDGET_BYTES = 16 * 1024 * 1024;
+const HISTORY_PROPS = ['id', 'selectable', 'evented', 'lockMovementX', 'lockMovementY',
+                       'lockScalingX', 'lockScalingY', 'lockRotation'];
+// Changes to these are re-created from JSON rather than set in place
+const REPLACE_PROPS = ['type', 'objects', 'filters', 'src', 'path', 'points', 'styles', 'clipPath'];
+
+// Template configurations
+let templates = {};
+
+// Frame scheduler: canvas changes call invalidate() and panel/status updates
+// set a flag; one requestAnimationFrame callback then does a single
+// renderAll and writes the status bar at most every STATUS_BAR_INTERVAL_MS.
+const STATUS_BAR_INTERVAL_MS = 100;
+let frameQueued = false;
+let renderQueued = false;
+let renderRequests = 0; // invalidate() calls since load
+let renderFrames = 0; // renderAll calls they turned into
+let statusDirty = false;
+let statusWrittenAt = 0;
+let pendingPointer = null;
+
+function scheduleFrame() {
+    if (frameQueued || batchDepth) return;
+    frameQueued = true;
+    requestAnimationFrame(runFrame);
+}
+
+function invalidate() {
+    renderRequests += 1;
+    renderQueued = true;
+    scheduleFrame();
+}
+
+function runFrame(now) {
+    frameQueued = false;
+    if (renderQueued) {
+        renderQueued = false;
+        renderFrames += 1;
+        canvas.renderAll();
+    }
+    if (layerRenderQueued) renderLayerRows();
+    if (statusDirty || pendingPointer) {
+        if (now - statusWrittenAt >= STATUS_BAR_INTERVAL_MS) {
+            statusWrittenAt = now;
+            writeStatusBar();
+        } else {
+            scheduleFrame();
+        }
+    }
+}
+
+// Transactions: bulk edits run inside batch(fn), or between beginBatch()
+// and commitBatch().  While one is open Fabric skips its render on add and
+// remove, the layer panel ignores add/remove events, history capture and
+// frames are held; commit then does one layer update, one render and
+// records one undo entry.  Batches nest; only the outermost commits.
+let batchDepth = 0;
+let batchLayersDirty = false;
+let batchRenderOnAddRemove = true;
+
+function beginBatch() {
+    if (batchDepth++ === 0) {
+        batchRenderOnAddRemove = canvas.renderOnAddRemove;
+        canvas.renderOnAddRemove = false;
+    }
+}
+
+function commitBatch() {
+    if (batchDepth === 0 || --batchDepth > 0) return;
+    canvas.renderOnAddRemove = batchRenderOnAddRemove;
+    if (batchLayersDirty) {
+        batchLayersDirty = false;
+        updateLayerPanel();
+    }
+    updateStatusBar();
+    invalidate();
+    saveState();
+}
+
+function batch(fn) {
+    // Runs fn() as one transaction; an async fn commits when its promise settles
+    beginBatch();
+    let result;
+    try {
+        result = fn();
+    } catch (err) {
+        commitBatch();
+        throw err;
+    }
+    if (result && typeof result.then === 'function') return result.finally(commitBatch);
+    commitBatch();
+    return result;
+}
+
+// Responsive canvas scaling
+function fitCanvasDisplay() {
+    if (!settings) return;
+    const holder = document.getElementById('canvas-holder');
+    const wrapper = holder.querySelector('.canvas-wrapper');
+    const availableWidth = window.innerWidth - (panelsVisible ? 480 : 80);
+    const availableHeight = window.innerHeight - 300;
+
+    const scale = Math.min(
+        availableWidth / (canvasW + 2 * bleedMarginPx), 
+        availableHeight / (canvasH + 2 * bleedMarginPx),
+        1
+    );
+
+    canvas.setWidth((canvasW + 2 * bleedMarginPx) * scale);
+    canvas.setHeight((canvasH + 2 * bleedMarginPx) * scale);
+    canvas.setZoom(scale);
+    canvas.calcOffset();
+    currentZoom = scale;
+    renderUnderlay();
+    updateStatusBar();
+}
+
+window.addEventListener('resize', fitCanvasDisplay);
+
+// Static layers: the uploaded background and the guides never take input,
+// so they are painted once into an offscreen canvas that Fabric draws as its
+// backgroundImage, and only editable objects are in canvas.getObjects().
+// The underlay is repainted when the geometry, zoom, guides or background
+// change, never per frame.
+const underlayEl = document.createElement('canvas');
+let backgroundObject = null; // background as a fabric.Image, kept off the canvas
+
+function renderUnderlay() {
+    const mark = startMeasure('underlay');
+    const fullW = canvasW + 2 * bleedMarginPx;
+    const fullH = canvasH + 2 * bleedMarginPx;
+    // Screen resolution, but never finer than one device pixel per design pixel
+    const retina = canvas.getRetinaScaling();
+    const resolution = Math.min(currentZoom, 1) * retina;
+    underlayEl.width = Math.max(1, Math.round(fullW * resolution));
+    underlayEl.height = Math.max(1, Math.round(fullH * resolution));
+    const ctx = underlayEl.getContext('2d');
+    ctx.setTransform(resolution, 0, 0, resolution, 0, 0);
+    if (backgroundObject) backgroundObject.render(ctx);
+    drawGuides(ctx, fullW, fullH);
+    canvas.backgroundImage = new fabric.Image(underlayEl, {
+        left: 0,
+        top: 0,
+        scaleX: 1 / resolution,
+        scaleY: 1 / resolution,
+        objectCaching: false,
+        selectable: false,
+        evented: false,
+        excludeFromExport: true
+    });
+    endMeasure('underlay', mark);
+    invalidate();
+}
+
+function strokeLine(ctx, x1, y1, x2, y2) {
+    ctx.beginPath();
+    ctx.moveTo(x1, y1);
+    ctx.lineTo(x2, y2);
+    ctx.stroke();
+}
+
+function drawGuides(ctx, fullW, fullH) {
+    const guides = settings.guides;
+    // Bleed area
+    if (guides.bleed) {
+        ctx.fillStyle = 'rgba(255,0,0,0.05)';
+        ctx.fillRect(0, 0, fullW, fullH);
+        ctx.strokeStyle = 'rgba(255,0,0,0.3)';
+        ctx.lineWidth = 1;
+        ctx.setLineDash([5, 5]);
+        ctx.strokeRect(0.5, 0.5, fullW, fullH);
+    }
+
+    // Safe zone
+    if (guides.safeZone) {
+        ctx.strokeStyle = 'rgba(0,0,255,0.4)';
+        ctx.lineWidth = 1;
+        ctx.setLineDash([3, 3]);
+        ctx.strokeRect(bleedMarginPx + safeMarginPx + 0.5, bleedMarginPx + safeMarginPx + 0.5,
+                       canvasW - 2 * safeMarginPx, canvasH - 2 * safeMarginPx);
+    }
+    ctx.setLineDash([]);
+
+    // Center guides
+    if (guides.center) {
+        ctx.strokeStyle = 'rgba(0,255,0,0.5)';
+        ctx.lineWidth = 1;
+        strokeLine(ctx, fullW / 2, 0, fullW / 2, fullH);
+        strokeLine(ctx, 0, fullH / 2, fullW, fullH / 2);
+    }
+
+    // Grid
+    if (guides.grid) {
+        const gridSize = dpi / 8; // 1/8 inch grid
+        ctx.strokeStyle = 'rgba(0,0,0,0.1)';
+        ctx.lineWidth = 0.5;
+        ctx.beginPath();
+        for (let i = gridSize; i < fullW; i += gridSize) {
+            ctx.moveTo(i, 0);
+            ctx.lineTo(i, fullH);
+        }
+        for (let i = gridSize; i < fullH; i += gridSize) {
+            ctx.moveTo(0, i);
+            ctx.lineTo(fullW, i);
+        }
+        ctx.stroke();
+    }
+}
+
+// Enhanced text creation functions
+document.getElementById('add-text').onclick = () => {
+    const size = parseInt(document.getElementById('font-size').value) || 24;
+    const color = document.getElementById('text-color').value || '#000';
+    const font = document.getElementById('font-family').value || 'Arial';
+
+    const text = new fabric.IText('Click to edit text', {
+        left: bleedMarginPx + 50, 
+        top: bleedMarginPx + 50,
+        fontSize: size,
+        fill: color,
+        fontFamily: font,
+        editable: true,
+        id: 'text_' + (++objectCounter)
+    });
+    addObjectToCanvas(text);
+};
+
+document.getElementById('add-heading').onclick = () => {
+    const font = document.getElementById('font-family').value || 'Arial';
+
+    const heading = new fabric.IText('Your Name', {
+        left: bleedMarginPx + 50,
+        top: bleedMarginPx + 30,
+        fontSize: 36,
+        fill: settings.style.primaryColor,
+        fontFamily: font,
+        fontWeight: 'bold',
+        editable: true,
+        id: 'heading_' + (++objectCounter)
+    });
+    addObjectToCanvas(heading);
+};
+
+document.getElementById('add-contact').onclick = () => {
+    const font = document.getElementById('font-family').value || 'Arial';
+
+    const contact = new fabric.IText('📧 email@company.com\n📞 (555) 123-4567\n🏢 Your Company Name', {
+        left: bleedMarginPx + 50,
+        top: bleedMarginPx + 120,
+        fontSize: 16,
+        fill: '#666666',
+        fontFamily: font,
+        editable: true,
+        id: 'contact_' + (++objectCounter)
+    });
+    addObjectToCanvas(contact);
+};
+
+// Shape creation functions
+document.getElementById('add-rect').onclick = () => {
+    const rect = new fabric.Rect({
+        left: bleedMarginPx + 60,
+        top: bleedMarginPx + 60,
+        width: canvasW * 0.3,
+        height: canvasH * 0.25,
+        fill: 'rgba(102, 126, 234, 0.3)',
+        stroke: '#667eea',
+        strokeWidth: 2,
+        rx: settings.style.roundedCorners ? 8 : 0,
+        ry: settings.style.roundedCorners ? 8 : 0,
+        id: 'rect_' + (++objectCounter)
+    });
+    addObjectToCanvas(rect);
+};
+
+document.getElementById('add-circle').onclick = () => {
+    const circle = new fabric.Circle({
+        left: bleedMarginPx + 80,
+        top: bleedMarginPx + 80,
+        radius: Math.min(canvasW, canvasH) * 0.08,
+        fill: 'rgba(240, 147, 251, 0.3)',
+        stroke: '#f093fb',
+        strokeWidth: 2,
+        id: 'circle_' + (++objectCounter)
+    });
+    addObjectToCanvas(circle);
+};
+
+document.getElementById('add-line').onclick = () => {
+    const line = new fabric.Line([50, 50, 200, 50], {
+        left: bleedMarginPx + 50,
+        top: bleedMarginPx + 100,
+        stroke: '#333333',
+        strokeWidth: 3,
+        id: 'line_' + (++objectCounter)
+    });
+    addObjectToCanvas(line);
+};
+
+document.getElementById('add-triangle').onclick = () => {
+    const triangle = new fabric.Triangle({
+        left: bleedMarginPx + 100,
+        top: bleedMarginPx + 100,
+        width: 80,
+        height: 80,
+        fill: 'rgba(231, 76, 60, 0.3)',
+        stroke: '#e74c3c',
+        strokeWidth: 2,
+        id: 'triangle_' + (++objectCounter)
+    });
+    addObjectToCanvas(triangle);
+};
+
+// Text formatting functions
+document.getElementById('text-bold').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj && obj.type === 'i-text') {
+        obj.set('fontWeight', obj.fontWeight === 'bold' ? 'normal' : 'bold');
+        invalidate();
+        updatePropertiesPanel();
+        saveState();
+    }
+};
+
+document.getElementById('text-italic').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj && obj.type === 'i-text') {
+        obj.set('fontStyle', obj.fontStyle === 'italic' ? 'normal' : 'italic');
+        invalidate();
+        updatePropertiesPanel();
+        saveState();
+    }
+};
+
+document.getElementById('text-underline').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj && obj.type === 'i-text') {
+        obj.set('underline', !obj.underline);
+        invalidate();
+        updatePropertiesPanel();
+        saveState();
+    }
+};
+
+document.getElementById('align-left').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj && obj.type === 'i-text') {
+        obj.set('textAlign', 'left');
+        invalidate();
+        saveState();
+    }
+};
+
+document.getElementById('align-center').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj && obj.type === 'i-text') {
+        obj.set('textAlign', 'center');
+        invalidate();
+        saveState();
+    }
+};
+
+document.getElementById('align-right').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj && obj.type === 'i-text') {
+        obj.set('textAlign', 'right');
+        invalidate();
+        saveState();
+    }
+};
+
+// Layer management functions
+document.getElementById('bring-forward').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj) {
+        obj.bringForward();
+        updateLayerPanel();
+        saveState();
+    }
+};
+
+document.getElementById('send-backward').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj) {
+        obj.sendBackwards();
+        updateLayerPanel();
+        saveState();
+    }
+};
+
+document.getElementById('bring-front').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj) {
+        canvas.bringToFront(obj);
+        updateLayerPanel();
+        saveState();
+    }
+};
+
+document.getElementById('send-back').onclick = () => {
+    const obj = canvas.getActiveObject();
+    if (obj) {
+        canvas.sendToBack(obj);
+        updateLayerPanel();
+        saveState();
+    }
+};
+
+// Object manipulation functions
+document.getElementById('group').onclick = () => {
+    const activeSelection = canvas.getActiveObject();
+    if (activeSelection && activeSelection.type === 'activeSelection') {
+        // canvas.add inside toGroup already gave the group its group_N id and
+        // indexed it under that id, so it must not be renamed afterwards
+        batch(() => ensureObjectId(activeSelection.toGroup()));
+    }
+};
+
+document.getElementById('ungroup').onclick = () => {
+    const activeObject = canvas.getActiveObject();
+    if (activeObject && activeObject.type === 'group') {
+        batch(() => activeObject.toActiveSelection());
+    }
+};
+
+document.getElementById('duplicate').onclick = () => duplicateActiveObject();
+
+document.getElementById('delete').onclick = () => deleteActiveObject();
+
+// Zoom and view functions
+document.getElementById('zoom-in').onclick = () => {
+    let zoom = canvas.getZoom();
+    zoom = zoom * 1.2;
+    if (zoom > 5) zoom = 5;
+    canvas.setZoom(zoom);
+    currentZoom = zoom;
+    renderUnderlay();
+    updateStatusBar();
+};
+
+document.getElementById('zoom-out').onclick = () => {
+    let zoom = canvas.getZoom();
+    zoom = zoom / 1.2;
+    if (zoom < 0.1) zoom = 0.1;
+    canvas.setZoom(zoom);
+    currentZoom = zoom;
+    renderUnderlay();
+    updateStatusBar();
+};
+
+document.getElementById('zoom-fit').onclick = () => {
+    fitCanvasDisplay();
+};
+
+document.getElementById('toggle-panels').onclick = () => {
+    panelsVisible = !panelsVisible;
+    const propertiesPanel = document.getElementById('properties-panel');
+    const layerPanel = document.getElementById('layer-panel');
+
+    if (panelsVisible) {
+        propertiesPanel.style.display = 'block';
+        layerPanel.style.display = 'block';
+    } else {
+        propertiesPanel.style.display = 'none';
+        layerPanel.style.display = 'none';
+    }
+    fitCanvasDisplay();
+};
+
+// History functions
+document.getElementById('undo').onclick = async () => {
+    if (historyBusy || undoStack.length === 0) return;
+    historyBusy = true;
+    const patch = undoStack.pop();
+    try {
+        await timed('undo', () => batch(() => applyPatch(patch, false)));
+    } finally {
+        redoStack.push(patch);
+        historyBusy = false;
+    }
+};
+
+document.getElementById('redo').onclick = async () => {
+    if (historyBusy || redoStack.length === 0) return;
+    historyBusy = true;
+    const patch = redoStack.pop();
+    try {
+        await timed('redo', () => batch(() => applyPatch(patch, true)));
+    } finally {
+        undoStack.push(patch);
+        historyBusy = false;
+    }
+};
+
+document.getElementById('clear-all').onclick = () => {
+    if (confirm('Are you sure you want to clear all objects?')) {
+        batch(() => {
+            canvas.clear();
+            canvas.backgroundColor = '#ffffff';
+            renderUnderlay();
+        });
+    }
+};
+
+document.getElementById('save-template').onclick = () => {
+    const json = timed('saveTemplate', () => JSON.stringify({
+        canvas: Object.assign(canvas.toJSON(), { backgroundImage: backgroundImageJSON() }),
+        metadata: {
+            name: 'Custom Template',
+            created: new Date().toISOString(),
+            dimensions: { width: canvasW, height: canvasH, dpi: dpi }
+        }
+    }, null, 2));
+
+    const blob = new Blob([json], { type: 'application/json' });
+    const url = URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = 'business-card-template.json';
+    link.click();
+    URL.revokeObjectURL(url);
+
+    alert('Template saved successfully!');
+};
+
+// Export: every format is encoded server-side from the synced canvas
+document.getElementById('export').onclick = () => {
+    alert(`Use "Print-Resolution Export" below the editor to download the card as ${settings.export.format}.`);
+};
+
+document.getElementById('print').onclick = () => {
+    window.print();
+};
+
+// Helper functions
+function addObjectToCanvas(obj) {
+    canvas.add(obj);
+    canvas.setActiveObject(obj);
+    updateStatusBar();
+    saveState();
+}
+
+// History records per-object property patches against the last snapshot
+// instead of whole-canvas JSON, and is bounded by bytes rather than steps.
+function historyObjects() {
+    return canvas.getObjects();
+}
+
+function takeSnapshot() {
+    const objects = {};
+    const order = [];
+    historyObjects().forEach(obj => {
+        ensureObjectId(obj);
+        // _toObject realizes active-selection transforms like canvas.toJSON() does
+        objects[obj.id] = JSON.stringify(canvas._toObject(obj, 'toObject', HISTORY_PROPS));
+        order.push(obj.id);
+    });
+    return { objects, order, background: canvas.backgroundColor };
+}
+
+function isPlainObject(value) {
+    return value !== null && typeof value === 'object' && !Array.isArray(value);
+}
+
+function diffSnapshots(before, after) {
+    const patch = { added: [], removed: [], modified: [], order: null, background: null };
+    after.order.forEach(id => {
+        if (!(id in before.objects)) {
+            patch.added.push({ id, json: after.objects[id] });
+        } else if (before.objects[id] !== after.objects[id]) {
+            const a = JSON.parse(before.objects[id]);
+            const b = JSON.parse(after.objects[id]);
+            const props = {};
+            let replace = false;
+            new Set([...Object.keys(a), ...Object.keys(b)]).forEach(key => {
+                if (JSON.stringify(a[key]) === JSON.stringify(b[key])) return;
+                if (REPLACE_PROPS.includes(key) || isPlainObject(a[key]) || isPlainObject(b[key])) replace = true;
+                props[key] = [a[key], b[key]];
+            });
+            patch.modified.push(replace
+                ? { id, before: before.objects[id], after: after.objects[id] }
+                : { id, props });
+        }
+    });
+    before.order.forEach(id => {
+        if (!(id in after.objects)) patch.removed.push({ id, json: before.objects[id] });
+    });
+    if (before.order.join('|') !== after.order.join('|')) patch.order = [before.order, after.order];
+    if (before.background !== after.background) patch.background = [before.background, after.background];
+    return patch;
+}
+
+function enlivenJSON(json) {
+    return new Promise(resolve => fabric.util.enlivenObjects([JSON.parse(json)], objects => resolve(objects[0])));
+}
+
+function restoreOrder(order) {
+    const objects = canvas._objects;
+    const byId = {};
+    objects.forEach(obj => { byId[obj.id] = obj; });
+    order.filter(id => byId[id]).forEach((id, n) => { objects[n] = byId[id]; });
+}
+
+async function applyPatch(patch, forward) {
+    const side = forward ? 1 : 0;
+    canvas.discardActiveObject();
+    (forward ? patch.removed : patch.added).forEach(entry => {
+        const obj = objectById(entry.id);
+        if (obj) canvas.remove(obj);
+    });
+    for (const entry of patch.modified) {
+        const obj = objectById(entry.id);
+        if (!obj) continue;
+        if (entry.props) {
+            const values = {};
+            Object.entries(entry.props).forEach(([key, pair]) => { values[key] = pair[side]; });
+            obj.set(values);
+            obj.setCoords();
+        } else {
+            const replacement = await enlivenJSON(forward ? entry.after : entry.before);
+            canvas.insertAt(replacement, canvas.getObjects().indexOf(obj), true);
+        }
+    }
+    for (const entry of (forward ? patch.added : patch.removed)) {
+        canvas.add(await enlivenJSON(entry.json));
+    }
+    if (patch.order) restoreOrder(patch.order[side]);
+    if (patch.background) canvas.backgroundColor = patch.background[side];
+    lastSnapshot = takeSnapshot();
+    reindexPatch(patch);
+    markDirty(patch);
+    invalidate();
+    updateLayerPanel();
+    updateStatusBar();
+}
+
+function saveState() {
+    if (historyBusy || batchDepth) return;
+    const snapshot = timed('snapshot', takeSnapshot);
+    if (lastSnapshot) {
+        const patch = diffSnapshots(lastSnapshot, snapshot);
+        if (patch.added.length || patch.removed.length || patch.modified.length || patch.order || patch.background) {
+            patch.bytes = JSON.stringify(patch).length * 2; // UTF-16
+            redoStack.forEach(p => { historyBytes -= p.bytes; });
+            redoStack = []; // Clear redo stack on new action
+            undoStack.push(patch);
+            historyBytes += patch.bytes;
+            reindexPatch(patch);
+            markDirty(patch);
+            while (historyBytes > HISTORY_BUDGET_BYTES && undoStack.length > 1) {
+                historyBytes -= undoStack.shift().bytes;
+            }
+        }
+    }
+    lastSnapshot = snapshot;
+}
+
+// Layer panel: rows follow an object-id -> position index that add and
+// remove events patch in place, and only the rows scrolled into view exist
+// in the DOM, redrawn at most once per animation frame.
+const LAYER_ROW_HEIGHT = 40; // px, .layer-item height plus the gap below it
+const LAYER_OVERSCAN = 4; // rows rendered beyond each edge of the viewport
+const layerList = document.getElementById('layer-list');
+const layerRowsEl = document.getElementById('layer-rows');
+let layerRows = []; // editable objects in stacking order, bottom first
+let layerIndex = new Map(); // object id -> position in layerRows
+let layerRowEls = new Map(); // object id -> row element currently in the DOM
+let layerActiveIds = new Set();
+let layerRenderQueued = false;
+
+function reindexLayers(from) {
+    for (let i = from; i < layerRows.length; i++) layerIndex.set(layerRows[i].id, i);
+}
+
+function layerPosition(obj) {
+    // Objects below obj on the canvas; objects are usually added on top
+    const objects = canvas.getObjects();
+    const index = objects.length - 1;
+    return objects[index] === obj ? index : objects.indexOf(obj);
+}
+
+function ensureObjectId(obj) {
+    if (!obj.id) obj.id = obj.type + '_' + (++objectCounter);
+    return obj.id;
+}
+
+function onLayerAdded(e) {
+    const obj = e.target;
+    if (batchDepth) {
+        batchLayersDirty = true;
+        return;
+    }
+    ensureObjectId(obj);
+    if (layerIndex.has(obj.id)) {
+        // insertAt(..., true) swaps in a replacement without removing the original
+        layerRows[layerIndex.get(obj.id)] = obj;
+    } else {
+        const position = layerPosition(obj);
+        layerRows.splice(position, 0, obj);
+        reindexLayers(position);
+    }
+    scheduleLayerRender();
+}
+
+function onLayerRemoved(e) {
+    const obj = e.target;
+    if (batchDepth) {
+        batchLayersDirty = true;
+        return;
+    }
+    const position = layerIndex.get(obj.id);
+    if (position === undefined || layerRows[position] !== obj) return;
+    layerRows.splice(position, 1);
+    layerIndex.delete(obj.id);
+    reindexLayers(position);
+    scheduleLayerRender();
+}
+
+function updateLayerPanel() {
+    // Re-read the stacking order after reordering, grouping or undo; no DOM work
+    if (batchDepth) {
+        batchLayersDirty = true;
+        return;
+    }
+    layerRows = canvas.getObjects().slice();
+    layerRows.forEach(ensureObjectId);
+    layerIndex = new Map();
+    reindexLayers(0);
+    scheduleLayerRender();
+}
+
+function scheduleLayerRender() {
+    layerRenderQueued = true;
+    scheduleFrame();
+}
+
+function renderLayerRows() {
+    layerRenderQueued = false;
+    const mark = startMeasure('layerPanel');
+    const count = layerRows.length;
+    layerRowsEl.style.height = (count * LAYER_ROW_HEIGHT) + 'px';
+    // Row 0 is the top-most object
+    const first = Math.max(0, Math.floor(layerList.scrollTop / LAYER_ROW_HEIGHT) - LAYER_OVERSCAN);
+    const last = Math.min(count - 1,
+        Math.ceil((layerList.scrollTop + layerList.clientHeight) / LAYER_ROW_HEIGHT) + LAYER_OVERSCAN);
+    const visible = new Map();
+    for (let row = first; row <= last; row++) {
+        const obj = layerRows[count - 1 - row];
+        visible.set(obj.id, row);
+    }
+    const spare = [];
+    layerRowEls.forEach((el, id) => {
+        if (!visible.has(id)) {
+            spare.push(el);
+            layerRowEls.delete(id);
+        }
+    });
+    visible.forEach((row, id) => {
+        let el = layerRowEls.get(id);
+        if (!el) {
+            el = spare.pop() || createLayerRow();
+            layerRowEls.set(id, el);
+        }
+        fillLayerRow(el, layerRows[count - 1 - row], row);
+    });
+    spare.forEach(el => el.remove());
+    endMeasure('layerPanel', mark);
+}
+
+function createLayerRow() {
+    const el = document.createElement('div');
+    el.className = 'layer-item';
+    el.innerHTML = `
+        <span class="layer-name"></span>
+        <span>
+            <button data-action="visibility" style="font-size:12px; padding:2px 4px;"></button>
+            <button data-action="lock" style="font-size:12px; padding:2px 4px;"></button>
+        </span>
+    `;
+    layerRowsEl.appendChild(el);
+    return el;
+}
+
+function fillLayerRow(el, obj, row) {
+    const active = layerActiveIds.has(obj.id);
+    const key = [obj.id, obj.type, row, obj.visible !== false, !!obj.lockMovementX, active].join('|');
+    if (el.dataset.key === key) return;
+    el.dataset.key = key;
+    el.dataset.id = obj.id;
+    el.style.top = (row * LAYER_ROW_HEIGHT) + 'px';
+    el.classList.toggle('active', active);
+    el.querySelector('.layer-name').textContent = `${obj.id || obj.type || 'Object'} ${row + 1}`;
+    el.querySelector('[data-action="visibility"]').textContent = obj.visible === false ? '👁‍🗨' : '👁';
+    el.querySelector('[data-action="lock"]').textContent = obj.lockMovementX ? '🔒' : '🔓';
+}
+
+// One listener for every row, present and future
+layerList.addEventListener('click', e => {
+    const el = e.target.closest('.layer-item');
+    if (!el) return;
+    const action = e.target.dataset.action;
+    if (action === 'visibility') {
+        toggleObjectVisibility(el.dataset.id);
+    } else if (action === 'lock') {
+        lockObject(el.dataset.id);
+    } else {
+        const obj = layerRows[layerIndex.get(el.dataset.id)];
+        if (!obj) return;
+        canvas.setActiveObject(obj);
+        invalidate();
+        updatePropertiesPanel();
+    }
+});
+layerList.addEventListener('scroll', scheduleLayerRender, { passive: true });
+
+function updateLayerSelection() {
+    layerActiveIds = new Set(canvas.getActiveObjects().map(obj => obj.id));
+    scheduleLayerRender();
+}
+
+function updatePropertiesPanel() {
+    const obj = canvas.getActiveObject();
+    const propertiesDiv = document.getElementById('object-properties');
+
+    if (!obj) {
+        propertiesDiv.innerHTML = '<p style="color:#999; font-style:italic;">Select an object to edit properties</p>';
+        return;
+    }
+
+    let html = `
+        <div class="property-group">
+            <h4>📐 Position & Size</h4>
+            <div class="property-row">
+                <label>X:</label>
+                <input type="number" value="${Math.round(obj.left)}" onchange="updateObjectProperty('left', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Y:</label>
+                <input type="number" value="${Math.round(obj.top)}" onchange="updateObjectProperty('top', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Width:</label>
+                <input type="number" value="${Math.round(obj.width * obj.scaleX)}" onchange="updateObjectSize('width', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Height:</label>
+                <input type="number" value="${Math.round(obj.height * obj.scaleY)}" onchange="updateObjectSize('height', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Rotation:</label>
+                <input type="number" value="${Math.round(obj.angle)}" min="0" max="360" onchange="updateObjectProperty('angle', this.value)">
+            </div>
+        </div>
+
+        <div class="property-group">
+            <h4>🎨 Appearance</h4>
+            <div class="property-row">
+                <label>Opacity:</label>
+                <input type="range" min="0" max="1" step="0.1" value="${obj.opacity}" oninput="previewObjectProperty('opacity', this.value)" onchange="updateObjectProperty('opacity', this.value)">
+            </div>
+    `;
+
+    if (obj.type === 'i-text') {
+        html += `
+            <div class="property-row">
+                <label>Font Size:</label>
+                <input type="number" value="${obj.fontSize}" min="8" max="200" onchange="updateObjectProperty('fontSize', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Color:</label>
+                <input type="color" value="${obj.fill}" oninput="previewObjectProperty('fill', this.value)" onchange="updateObjectProperty('fill', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Font:</label>
+                <select onchange="updateObjectProperty('fontFamily', this.value)">
+                    <option value="Arial" ${obj.fontFamily === 'Arial' ? 'selected' : ''}>Arial</option>
+                    <option value="Helvetica" ${obj.fontFamily === 'Helvetica' ? 'selected' : ''}>Helvetica</option>
+                    <option value="Times New Roman" ${obj.fontFamily === 'Times New Roman' ? 'selected' : ''}>Times New Roman</option>
+                    <option value="Georgia" ${obj.fontFamily === 'Georgia' ? 'selected' : ''}>Georgia</option>
+                </select>
+            </div>
+        `;
+    } else {
+        html += `
+            <div class="property-row">
+                <label>Fill:</label>
+                <input type="color" value="${obj.fill}" oninput="previewObjectProperty('fill', this.value)" onchange="updateObjectProperty('fill', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Stroke:</label>
+                <input type="color" value="${obj.stroke || '#000000'}" oninput="previewObjectProperty('stroke', this.value)" onchange="updateObjectProperty('stroke', this.value)">
+            </div>
+            <div class="property-row">
+                <label>Stroke Width:</label>
+                <input type="number" value="${obj.strokeWidth || 0}" min="0" max="20" onchange="updateObjectProperty('strokeWidth', this.value)">
+            </div>
+        `;
+    }
+
+    html += `
+        </div>
+
+        <div class="property-group">
+            <h4>🔧 Actions</h4>
+            <button onclick="duplicateActiveObject()" style="width:100%; margin:2px 0;">Duplicate</button>
+            <button onclick="deleteActiveObject()" style="width:100%; margin:2px 0; background:#e74c3c; color:white;">Delete</button>
+        </div>
+    `;
+
+    propertiesDiv.innerHTML = html;
+}
+
+function previewObjectProperty(prop, value) {
+    // Live feedback while a slider or colour picker moves; one redraw per frame
+    const obj = canvas.getActiveObject();
+    if (!obj) return null;
+    if (prop === 'fill' || prop === 'stroke') {
+        obj.set(prop, value);
+    } else {
+        obj.set(prop, parseFloat(value) || value);
+    }
+    invalidate();
+    return obj;
+}
+
+function updateObjectProperty(prop, value) {
+    if (previewObjectProperty(prop, value)) saveState();
+}
+
+function updateObjectSize(dimension, value) {
+    const obj = canvas.getActiveObject();
+    if (obj) {
+        const newValue = parseFloat(value);
+        if (dimension === 'width') {
+            const scale = newValue / obj.width;
+            obj.set('scaleX', scale);
+        } else if (dimension === 'height') {
+            const scale = newValue / obj.height;
+            obj.set('scaleY', scale);
+        }
+        invalidate();
+        saveState();
+    }
+}
+
+function updateStatusBar() {
+    statusDirty = true;
+    scheduleFrame();
+}
+
+function writeStatusBar() {
+    if (statusDirty) {
+        statusDirty = false;
+        const objectCount = layerRows.length;
+        document.getElementById('object-count').textContent = `${objectCount} object${objectCount !== 1 ? 's' : ''}`;
+        document.getElementById('canvas-zoom').textContent = `${Math.round(currentZoom * 100)}%`;
+    }
+    if (pendingPointer) {
+        document.getElementById('mouse-coords').textContent =
+            `${Math.round(pendingPointer.x)}, ${Math.round(pendingPointer.y)}`;
+        pendingPointer = null;
+    }
+}
+
+function toggleObjectVisibility(id) {
+    const obj = objectById(id);
+    if (obj) {
+        obj.set('visible', !obj.visible);
+        invalidate();
+        scheduleLayerRender();
+        saveState();
+    }
+}
+
+function lockObject(id) {
+    const obj = objectById(id);
+    if (obj) {
+        const locked = !obj.lockMovementX;
+        obj.set({
+            lockMovementX: locked,
+            lockMovementY: locked,
+            lockScalingX: locked,
+            lockScalingY: locked,
+            lockRotation: locked
+        });
+        scheduleLayerRender();
+        saveState();
+    }
+}
+
+function duplicateActiveObject() {
+    // Copies the selection, single object or many, as one undo step
+    const obj = canvas.getActiveObject();
+    if (!obj) return;
+    obj.clone(cloned => batch(() => {
+        canvas.discardActiveObject();
+        cloned.set({ left: cloned.left + 20, top: cloned.top + 20 });
+        if (cloned.type === 'activeSelection') {
+            cloned.canvas = canvas;
+            cloned.forEachObject(child => canvas.add(child));
+            cloned.setCoords();
+        } else {
+            cloned.id = obj.type + '_' + (++objectCounter);
+            canvas.add(cloned);
+        }
+        canvas.setActiveObject(cloned);
+    }));
+}
+
+function deleteActiveObject() {
+    const activeObjects = canvas.getActiveObjects();
+    if (!activeObjects.length) return;
+    batch(() => {
+        canvas.discardActiveObject();
+        activeObjects.forEach(obj => canvas.remove(obj));
+    });
+}
+
+// Background image handling (blur and brightness arrive pre-applied by Python)
+function setBackground(background, previous) {
+    if (!background) {
+        backgroundObject = null;
+        backgroundImageChanged();
+        return;
+    }
+    if (previous && previous.url === background.url && backgroundObject) {
+        // Same image: repaint with the new opacity instead of reloading it
+        backgroundObject.set('opacity', background.opacity);
+        backgroundImageChanged();
+        return;
+    }
+    setBackgroundFromUrl(background.url);
+}
+
+async function setBackgroundFromUrl(url) {
+    if (!url) return;
+
+    fabric.Image.fromURL(url, function(img) {
+        const scale = Math.max(
+            (canvasW + 2 * bleedMarginPx) / img.width, 
+            (canvasH + 2 * bleedMarginPx) / img.height
+        );
+
+        img.scale(scale);
+        img.set({
+            left: ((canvasW + 2 * bleedMarginPx) - img.width * scale) / 2,
+            top: ((canvasH + 2 * bleedMarginPx) - img.height * scale) / 2,
+            selectable: false,
+            objectCaching: false,
+            opacity: settings.background ? settings.background.opacity : 1,
+            id: 'background_image'
+        });
+        backgroundObject = img;
+        backgroundImageChanged();
+    }, { crossOrigin: 'anonymous' });
+}
+
+function backgroundImageJSON() {
+    return backgroundObject ? backgroundObject.toObject(['id']) : null;
+}
+
+function backgroundImageChanged() {
+    renderUnderlay();
+    dirtyBackgroundImage = syncRev + 1;
+    scheduleSync();
+}
+
+// Apply template function
+function applyTemplate(templateName) {
+    if (!templates[templateName]) return;
+
+    const template = templates[templateName];
+
+    batch(() => {
+        // Apply background
+        if (template.bg_color) {
+            canvas.backgroundColor = template.bg_color;
+        } else if (template.bg_gradient) {
+            // Note: Fabric.js doesn't directly support CSS gradients
+            // This would need additional implementation
+            canvas.backgroundColor = template.bg_gradient.split(',')[0].replace('linear-gradient(135deg, ', '').trim();
+        }
+        // Text takes the template's colour and font
+        historyObjects().filter(obj => obj.type === 'i-text' || obj.type === 'textbox').forEach(obj => {
+            obj.set({ fill: template.primary_color, fontFamily: template.font });
+        });
+    });
+    alert(`Template "${templateName}" applied successfully!`);
+}
+
+// Spatial index: a uniform grid of object bounding boxes in design pixels,
+// plus the id -> object map.  Fabric's pointer hit-testing and marquee
+// selection scan every object; here they only test the objects whose boxes
+// overlap the pointer or the marquee.  Entries follow add/remove events,
+// object:modified and text edits, and each history patch re-boxes the
+// objects it touched, so programmatic edits are covered too.
+let spatialCellSize = 64; // design px, a quarter inch at the current DPI
+let spatialCells = new Map(); // "col,row" -> Set of object ids
+let spatialEntries = new Map(); // object id -> { obj, box, cells }
+
+function objectById(id) {
+    const entry = spatialEntries.get(id);
+    return entry ? entry.obj : undefined;
+}
+
+function sceneBounds(obj) {
+    // Corners in the parent's plane; children of an active selection need its transform
+    let corners = obj.getCoords(true, true);
+    if (obj.group) {
+        const matrix = obj.group.calcTransformMatrix();
+        corners = corners.map(point => fabric.util.transformPoint(point, matrix));
+    }
+    const pad = obj.padding || 0;
+    const xs = corners.map(point => point.x);
+    const ys = corners.map(point => point.y);
+    return { x1: Math.min(...xs) - pad, y1: Math.min(...ys) - pad, x2: Math.max(...xs) + pad, y2: Math.max(...ys) + pad };
+}
+
+function spatialCellKeys(box) {
+    const keys = [];
+    const c1 = Math.floor(box.x1 / spatialCellSize), c2 = Math.floor(box.x2 / spatialCellSize);
+    const r1 = Math.floor(box.y1 / spatialCellSize), r2 = Math.floor(box.y2 / spatialCellSize);
+    for (let c = c1; c <= c2; c++) {
+        for (let r = r1; r <= r2; r++) keys.push(c + ',' + r);
+    }
+    return keys;
+}
+
+function unindexObject(id) {
+    const entry = spatialEntries.get(id);
+    if (!entry) return;
+    entry.cells.forEach(key => {
+        const cell = spatialCells.get(key);
+        cell.delete(id);
+        if (!cell.size) spatialCells.delete(key);
+    });
+    spatialEntries.delete(id);
+}
+
+function indexObject(obj) {
+    if (!obj || obj.canvas !== canvas) return;
+    if (obj.type === 'activeSelection') {
+        obj.forEachObject(indexObject);
+        return;
+    }
+    const id = ensureObjectId(obj);
+    unindexObject(id);
+    const box = sceneBounds(obj);
+    const cells = spatialCellKeys(box);
+    cells.forEach(key => {
+        let cell = spatialCells.get(key);
+        if (!cell) spatialCells.set(key, cell = new Set());
+        cell.add(id);
+    });
+    spatialEntries.set(id, { obj, box, cells });
+}
+
+function rebuildSpatialIndex() {
+    spatialCellSize = Math.max(16, dpi / 4);
+    spatialCells = new Map();
+    spatialEntries = new Map();
+    canvas.getObjects().forEach(indexObject);
+}
+
+function reindexPatch(patch) {
+    patch.added.concat(patch.modified).forEach(entry => indexObject(objectById(entry.id)));
+}
+
+function objectsInRect(x1, y1, x2, y2) {
+    // Objects whose boxes overlap the rect, bottom first; null if the stacking index is stale
+    const found = new Set();
+    spatialCellKeys({ x1, y1, x2, y2 }).forEach(key => {
+        const cell = spatialCells.get(key);
+        if (cell) cell.forEach(id => found.add(id));
+    });
+    const hits = [];
+    for (const id of found) {
+        const entry = spatialEntries.get(id);
+        const box = entry.box;
+        if (box.x1 > x2 || box.x2 < x1 || box.y1 > y2 || box.y2 < y1) continue;
+        const position = layerIndex.get(id);
+        if (layerRows[position] !== entry.obj) return null;
+        hits.push(position);
+    }
+    return hits.sort((a, b) => a - b).map(position => layerRows[position]);
+}
+
+canvas.on('object:added', e => indexObject(e.target));
+canvas.on('object:removed', e => {
+    const entry = spatialEntries.get(e.target.id);
+    if (entry && entry.obj === e.target) unindexObject(e.target.id);
+});
+canvas.on('object:modified', e => indexObject(e.target));
+canvas.on('text:changed', e => indexObject(e.target));
+
+// Fabric passes its whole object list to these; hand it the index's candidates
+const searchAllTargets = canvas._searchPossibleTargets;
+canvas._searchPossibleTargets = function(objects, pointer) {
+    if (objects === this._objects) {
+        // pointer is in viewport pixels; the index is in design pixels
+        const scene = fabric.util.transformPoint(pointer, fabric.util.invertTransform(this.viewportTransform));
+        const tolerance = (this.targetFindTolerance + 1) / this.getZoom();
+        objects = objectsInRect(scene.x - tolerance, scene.y - tolerance, scene.x + tolerance, scene.y + tolerance)
+            || objects;
+    }
+    return searchAllTargets.call(this, objects, pointer);
+};
+
+const collectAllObjects = canvas._collectObjects;
+canvas._collectObjects = function(e) {
+    const selector = this._groupSelector;
+    const x1 = selector.ex, y1 = selector.ey;
+    const x2 = x1 + selector.left, y2 = y1 + selector.top;
+    const candidates = objectsInRect(Math.min(x1, x2), Math.min(y1, y2), Math.max(x1, x2), Math.max(y1, y2));
+    if (!candidates) return collectAllObjects.call(this, e);
+    const objects = this._objects;
+    this._objects = candidates;
+    try {
+        return collectAllObjects.call(this, e);
+    } finally {
+        this._objects = objects;
+    }
+};
+
+// Event listeners
+canvas.on('object:added', onLayerAdded);
+canvas.on('object:removed', onLayerRemoved);
+canvas.on('selection:created', updatePropertiesPanel);
+canvas.on('selection:updated', updatePropertiesPanel);
+canvas.on('selection:cleared', updatePropertiesPanel);
+canvas.on('selection:created', updateLayerSelection);
+canvas.on('selection:updated', updateLayerSelection);
+canvas.on('selection:cleared', updateLayerSelection);
+canvas.on('object:modified', saveState);
+
+// Fabric's frame time: one full canvas redraw
+let renderMark = null;
+canvas.on('before:render', () => { renderMark = startMeasure('render'); });
+canvas.on('after:render', () => {
+    if (renderMark) endMeasure('render', renderMark);
+    renderMark = null;
+});
+
+// Mouse tracking
+canvas.on('mouse:move', function(e) {
+    // Written with the next status bar update, not on every event
+    pendingPointer = canvas.getPointer(e.e);
+    scheduleFrame();
+});
+
+// Keyboard shortcuts
+window.addEventListener('keydown', function(e) {
+    if (e.ctrlKey || e.metaKey) {
+        switch(e.key) {
+            case 'z': e.preventDefault(); document.getElementById('undo').click(); break;
+            case 'y': e.preventDefault(); document.getElementById('redo').click(); break;
+            case 'c': e.preventDefault(); /* Copy functionality */ break;
+            case 'v': e.preventDefault(); /* Paste functionality */ break;
+            case 'd': e.preventDefault(); document.getElementById('duplicate').click(); break;
+            case 's': e.preventDefault(); document.getElementById('save-template').click(); break;
+        }
+    } else {
+        switch(e.key) {
+            case 'Delete': document.getElementById('delete').click(); break;
+            case 'Escape': canvas.discardActiveObject(); invalidate(); break;
+        }
+    }
+});
+
+// Rescale the design when the DPI changes so it keeps its physical size
+function rescaleObjects(factor) {
+    historyObjects().forEach(obj => {
+        obj.set({
+            left: obj.left * factor,
+            top: obj.top * factor,
+            scaleX: obj.scaleX * factor,
+            scaleY: obj.scaleY * factor
+        });
+        obj.setCoords();
+    });
+    // Recorded patches are in the old pixel units
+    undoStack = [];
+    redoStack = [];
+    historyBytes = 0;
+    lastSnapshot = takeSnapshot();
+    rebuildSpatialIndex();
+    fullSyncNeeded = true;
+    scheduleSync();
+}
+
+function updateStatusLeft() {
+    const c = settings.canvas;
+    document.getElementById('status-left').textContent = `Ready • ${c.format} • ${c.orientation} • ${c.dpi} DPI`;
+}
+
+// Streamlit component bridge: settings arrive as render events, canvas
+// changes go back as debounced deltas of the objects that changed.
+const SYNC_DELAY_MS = 800;
+const syncSession = Math.random().toString(36).slice(2);
+let syncRev = 0;
+let syncTimer = null;
+let fullSyncNeeded = true;
+let fullSyncRev = 0;
+let dirtyIds = new Map(); // object id -> revision of its latest change
+let dirtyOrder = 0;
+let dirtyBackground = 0;
+let dirtyBackgroundImage = 0;
+let editorReadyMs = 0; // time from iframe navigation to the first painted, usable canvas
+
+// Client telemetry: durations from performance.measure are sampled per
+// operation and reported to Python with the next delta, or on their own
+// after TELEMETRY_IDLE_FLUSH_MS so telemetry alone never drives reruns.
+const TELEMETRY_SAMPLE_CAP = 240;
+const TELEMETRY_IDLE_FLUSH_MS = 30000;
+let telemetry = {}; // operation -> { count, max, samples }
+let telemetryTimer = null;
+
+function startMeasure(name) {
+    const mark = name + ':start';
+    performance.mark(mark);
+    return mark;
+}
+
+function endMeasure(name, mark) {
+    performance.measure(name, mark);
+    const entries = performance.getEntriesByName(name, 'measure');
+    recordTiming(name, entries[entries.length - 1].duration);
+    performance.clearMarks(mark);
+    performance.clearMeasures(name);
+}
+
+function timed(name, fn) {
+    // Measures fn(), or the promise it returns
+    const mark = startMeasure(name);
+    let result;
+    try {
+        result = fn();
+    } catch (err) {
+        endMeasure(name, mark);
+        throw err;
+    }
+    if (result && typeof result.then === 'function') return result.finally(() => endMeasure(name, mark));
+    endMeasure(name, mark);
+    return result;
+}
+
+function recordTiming(name, ms) {
+    const entry = telemetry[name] || (telemetry[name] = { count: 0, max: 0, samples: [] });
+    entry.count += 1;
+    entry.max = Math.max(entry.max, ms);
+    // Reservoir sampling keeps a uniform sample of frequent operations such as render
+    if (entry.samples.length < TELEMETRY_SAMPLE_CAP) {
+        entry.samples.push(ms);
+    } else {
+        const slot = Math.floor(Math.random() * entry.count);
+        if (slot < TELEMETRY_SAMPLE_CAP) entry.samples[slot] = ms;
+    }
+    // Each sample restarts the countdown, so the flush waits for a quiet spell
+    clearTimeout(telemetryTimer);
+    telemetryTimer = setTimeout(sendCanvasState, TELEMETRY_IDLE_FLUSH_MS);
+}
+
+function takeTelemetry() {
+    clearTimeout(telemetryTimer);
+    telemetryTimer = null;
+    const names = Object.keys(telemetry);
+    if (!names.length) return null;
+    const round = ms => Math.round(ms * 10) / 10;
+    const report = {
+        dpi: dpi,
+        samples: {},
+        gauges: {
+            historyBytes: historyBytes,
+            undoSteps: undoStack.length,
+            objects: layerRows.length,
+            renderRequests: renderRequests,
+            rendersCoalesced: renderRequests - renderFrames,
+        },
+    };
+    names.forEach(name => {
+        const entry = telemetry[name];
+        report.samples[name] = { count: entry.count, max: round(entry.max), values: entry.samples.map(round) };
+    });
+    telemetry = {};
+    return report;
+}
+
+function sendToStreamlit(type, data) {
+    window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type: type }, data), '*');
+}
+
+function markDirty(patch) {
+    const rev = syncRev + 1;
+    patch.added.concat(patch.removed, patch.modified).forEach(entry => dirtyIds.set(entry.id, rev));
+    if (patch.order) dirtyOrder = rev;
+    if (patch.background) dirtyBackground = rev;
+    scheduleSync();
+}
+
+function scheduleSync() {
+    clearTimeout(syncTimer);
+    syncTimer = setTimeout(sendCanvasState, SYNC_DELAY_MS);
+}
+
+function sendCanvasState() {
+    if (!lastSnapshot) return;
+    const mark = startMeasure('sync');
+    syncRev += 1;
+    const delta = { session: syncSession, rev: syncRev, full: fullSyncNeeded, objects: {}, order: null, background: null };
+    const ids = fullSyncNeeded ? lastSnapshot.order : Array.from(dirtyIds.keys());
+    ids.forEach(id => {
+        delta.objects[id] = id in lastSnapshot.objects ? JSON.parse(lastSnapshot.objects[id]) : null;
+    });
+    if (fullSyncNeeded || dirtyOrder) delta.order = lastSnapshot.order;
+    if (fullSyncNeeded || dirtyBackground) delta.background = lastSnapshot.background;
+    // Present only when it changed; null removes it
+    if (fullSyncNeeded || dirtyBackgroundImage) delta.backgroundImage = backgroundImageJSON();
+    if (fullSyncNeeded && !fullSyncRev) fullSyncRev = syncRev;
+    if (fullSyncNeeded && editorReadyMs) delta.metrics = { ttiMs: Math.round(editorReadyMs) };
+    endMeasure('sync', mark);
+    delta.telemetry = takeTelemetry();
+    sendToStreamlit('streamlit:setComponentValue', { value: delta, dataType: 'json' });
+}
+
+function acknowledge(ack) {
+    // Python echoes the last revision it applied; changes up to it are synced
+    if (!ack || ack.session !== syncSession) return;
+    for (const [id, rev] of dirtyIds) {
+        if (rev <= ack.rev) dirtyIds.delete(id);
+    }
+    if (dirtyOrder && dirtyOrder <= ack.rev) dirtyOrder = 0;
+    if (dirtyBackground && dirtyBackground <= ack.rev) dirtyBackground = 0;
+    if (dirtyBackgroundImage && dirtyBackgroundImage <= ack.rev) dirtyBackgroundImage = 0;
+    if (fullSyncRev && fullSyncRev <= ack.rev) {
+        fullSyncNeeded = false;
+        fullSyncRev = 0;
+    }
+}
+
+function initializeEditor() {
+    setCanvasGeometry(settings.canvas);
+    rebuildSpatialIndex();
+    fitCanvasDisplay();
+    updateStatusLeft();
+    updateLayerPanel();
+    updateStatusBar();
+    saveState();
+    if (settings.background) setBackground(settings.background, null);
+    if (settings.template && settings.template !== 'Blank') {
+        setTimeout(() => applyTemplate(settings.template), 100);
+    }
+    // The frame after the first render is when the canvas can take input
+    requestAnimationFrame(() => {
+        editorReadyMs = performance.now();
+        performance.mark('editor-interactive');
+    });
+    scheduleSync();
+}
+
+function onRender(args) {
+    const previous = settings;
+    settings = args.settings;
+    templates = settings.templates;
+    HISTORY_BUDGET_BYTES = settings.historyBudgetBytes;
+    acknowledge(args.ack);
+    if (!previous) {
+        sendToStreamlit('streamlit:setFrameHeight', { height: settings.frameHeight });
+        initializeEditor();
+        return;
+    }
+
+    // Apply only what changed; the canvas and the user's work stay alive
+    const changed = key => JSON.stringify(previous[key]) !== JSON.stringify(settings[key]);
+    if (changed('canvas')) {
+        const factor = settings.canvas.dpi / previous.canvas.dpi;
+        setCanvasGeometry(settings.canvas);
+        if (factor !== 1) rescaleObjects(factor);
+        fitCanvasDisplay();
+        updateStatusLeft();
+    } else if (changed('guides')) {
+        renderUnderlay();
+    }
+    if (changed('background')) setBackground(settings.background, previous.background);
+    if (changed('template') && settings.template !== 'Blank') applyTemplate(settings.template);
+}
+
+window.addEventListener('message', event => {
+    if (event.data && event.data.type === 'streamlit:render') onRender(event.data.args);
+});
+sendToStreamlit('streamlit:componentReady', { apiVersion: 1 });
@@ -0,0 +1,69 @@
+"""Card formats and print geometry in inches and canvas pixels.
+
+Plain Python with no third-party imports, so scripts, job workers and the
+command line can size cards without loading the renderers.  Canvas pixels
+are print pixels: the editor sizes its canvas at the chosen DPI and adds
+the bleed margin on every side.
+"""
+from typing import NamedTuple
+
+# Trim size in inches, landscape.
+FORMAT_DIMS = {
+    "US Standard": (3.5, 2.0),
+    "EU Standard": (3.346, 2.165),
+    "Square": (2.5, 2.5),
+    "Mini": (2.75, 1.75),
+    "Jumbo": (4.25, 2.75),
+}
+ORIENTATIONS = ("Landscape", "Portrait")
+DPI_OPTIONS = (150, 300, 600)
+BLEED_INCHES = 0.125
+# Distance inside the trim that text should keep clear of.
+SAFE_INCHES = 0.125
+# Press sheets for imposition, portrait, in inches.
+SHEET_SIZES = {
+    "Letter": (8.5, 11.0),
+    "A4": (8.268, 11.693),
+    "Tabloid": (11.0, 17.0),
+    "A3": (11.693, 16.535),
+}
+
+
+class CardGeometry(NamedTuple):
+    width_in: float
+    height_in: float
+    dpi: int
+    width: int  # trim size in canvas pixels
+    height: int
+    bleed: int  # bleed margin on every side, in canvas pixels
+    safe: int  # safe-zone inset from the trim, in canvas pixels
+
+    @property
+    def canvas_size(self):
+        """Size of the editor canvas, bleed included."""
+        return self.width + 2 * self.bleed, self.height + 2 * self.bleed
+
+
+def card_size(card_format, orientation="Landscape"):
+    """Trim ``(width, height)`` in inches of one of :data:`FORMAT_DIMS`."""
+    try:
+        w_in, h_in = FORMAT_DIMS[card_format]
+    except KeyError:
+        raise ValueError(f"unknown card format {card_format!r}; expected one of {', '.join(FORMAT_DIMS)}") from None
+    return (h_in, w_in) if orientation == "Portrait" else (w_in, h_in)
+
+
+def bleed_pixels(dpi):
+    """Bleed margin in pixels, rounded like ``Math.round`` in the editor."""
+    return int(BLEED_INCHES * dpi + 0.5)
+
+
+def safe_pixels(dpi):
+    """Safe-zone inset in pixels, rounded like the editor's guide."""
+    return int(SAFE_INCHES * dpi + 0.5)
+
+
+def card_geometry(card_format, orientation="Landscape", dpi=300):
+    """The :class:`CardGeometry` the editor uses for a format, orientation and DPI."""
+    w_in, h_in = card_size(card_format, orientation)
+    return CardGeometry(w_in, h_in, dpi, int(w_in * dpi), int(h_in * dpi), bleed_pixels(dpi), safe_pixels(dpi))
@@ -0,0 +1,269 @@
+"""Impose cards onto press sheets (N-up) with crop marks.
+
+Cards are tiled in a centred grid on Letter, A4 or larger sheets, either
+with their own bleed around each card (``cut="bleed"``) or abutting on
+shared cut lines (``cut="shared"``, the classic 10-up Letter layout).
+Crop marks sit outside the grid at every cut line.
+
+Sheets are produced one at a time from a lazy row iterator.  Raster sheets
+go through :class:`~card_designer.pdfstream.PdfStreamWriter`, so at most
+one sheet of cards is held in memory; the template's background (the
+editor's ``background_image`` and canvas colour) is rendered once, embedded
+once and drawn under every card, and cards carry only their own content
+over a soft mask.  Vector sheets use ReportLab, which embeds identical
+images and fonts once per document but keeps every page in memory until the
+document is saved, so vector runs are capped at ``VECTOR_MAX_CARDS`` cards
+and larger merges default to raster sheets.
+"""
+import io
+import itertools
+from typing import NamedTuple
+
+from PIL import Image
+
+from .batch import DEFAULT_PLACEHOLDERS, count_rows, iter_rows, merge_design, render_batch, template_dimensions
+from .cmyk import to_cmyk
+from .pdfstream import POINTS_PER_INCH, PdfStreamWriter, _number
+from .geometry import BLEED_INCHES, SHEET_SIZES
+from .render import load_design, render_design
+
+SHEET_MARGIN_INCHES = 0.25
+CROP_MARK_LENGTH_INCHES = 0.25
+CROP_MARK_OFFSET_INCHES = 1 / 16
+CROP_MARK_WIDTH = 0.25  # points
+UNDERLAY_ID = "background_image"
+UNDERLAY_JPEG_QUALITY = 95
+VECTOR_MAX_CARDS = 1000
+
+
+class SheetLayout(NamedTuple):
+    """Grid of cards on one sheet; all lengths are in points."""
+    sheet_w: float
+    sheet_h: float
+    trim_w: float
+    trim_h: float
+    bleed: float
+    columns: int
+    rows: int
+
+    @property
+    def per_sheet(self):
+        return self.columns * self.rows
+
+    @property
+    def cell(self):
+        return self.trim_w + 2 * self.bleed, self.trim_h + 2 * self.bleed
+
+    @property
+    def block(self):
+        """``(x0, y0, x1, y1)`` of the whole grid, bleed included."""
+        cell_w, cell_h = self.cell
+        x0 = (self.sheet_w - self.columns * cell_w) / 2
+        y0 = (self.sheet_h - self.rows * cell_h) / 2
+        return x0, y0, x0 + self.columns * cell_w, y0 + self.rows * cell_h
+
+    def slots(self):
+        """Bottom-left corner of each trim box, row by row from the top left."""
+        cell_w, cell_h = self.cell
+        x0, _y0, _x1, y1 = self.block
+        return [(x0 + column * cell_w + self.bleed, y1 - (row + 1) * cell_h + self.bleed)
+                for row in range(self.rows) for column in range(self.columns)]
+
+
+def plan_sheet(trim_w_in, trim_h_in, sheet="Letter", *, bleed_in=0.0, margin_in=SHEET_MARGIN_INCHES):
+    """Fit as many cards as possible on ``sheet`` in either orientation.
+
+    ``bleed_in`` is kept around every card; use ``0`` for shared cut lines.
+    Raises ``ValueError`` if not even one card fits.
+    """
+    sheet_w, sheet_h = SHEET_SIZES[sheet]
+    cell_w, cell_h = trim_w_in + 2 * bleed_in, trim_h_in + 2 * bleed_in
+    best = None
+    for width, height in ((sheet_w, sheet_h), (sheet_h, sheet_w)):
+        columns = int((width - 2 * margin_in) // cell_w)
+        rows = int((height - 2 * margin_in) // cell_h)
+        if best is None or columns * rows > best[2] * best[3]:
+            best = (width, height, columns, rows)
+    width, height, columns, rows = best
+    if columns * rows == 0:
+        raise ValueError(f'a {trim_w_in:g}" x {trim_h_in:g}" card does not fit on a {sheet} sheet')
+    k = POINTS_PER_INCH
+    return SheetLayout(width * k, height * k, trim_w_in * k, trim_h_in * k, bleed_in * k, columns, rows)
+
+
+def crop_marks(layout):
+    """Line segments ``(x0, y0, x1, y1)`` marking every cut, outside the grid."""
+    bx0, by0, bx1, by1 = layout.block
+    offset = CROP_MARK_OFFSET_INCHES * POINTS_PER_INCH
+    length = min(CROP_MARK_LENGTH_INCHES * POINTS_PER_INCH,
+                 min(bx0, by0, layout.sheet_w - bx1, layout.sheet_h - by1) - offset)
+    if length <= 0:
+        return []
+    slots = layout.slots()
+    xs = sorted({x for x, _y in slots} | {x + layout.trim_w for x, _y in slots})
+    ys = sorted({y for _x, y in slots} | {y + layout.trim_h for _x, y in slots})
+    lines = []
+    for x in xs:
+        lines.append((x, by1 + offset, x, by1 + offset + length))
+        lines.append((x, by0 - offset, x, by0 - offset - length))
+    for y in ys:
+        lines.append((bx0 - offset, y, bx0 - offset - length, y))
+        lines.append((bx1 + offset, y, bx1 + offset + length, y))
+    return lines
+
+
+def _crop_marks_content(layout):
+    # Registration colour: the marks print on every separation.
+    ops = [b"q 1 1 1 1 K %s w" % _number(CROP_MARK_WIDTH)]
+    ops.extend(b"%s %s m %s %s l S" % (_number(x0), _number(y0), _number(x1), _number(y1))
+               for x0, y0, x1, y1 in crop_marks(layout))
+    ops.append(b"Q")
+    return b"\n".join(ops)
+
+
+def split_underlay(canvas_json):
+    """Split a design into ``(underlay, overlay)`` canvas dicts.
+
+    The underlay is the canvas colour, ``backgroundImage`` and the leading
+    ``background_image`` objects, which mail merge never changes; it is
+    ``None`` when the design has no background.  The overlay is everything
+    else on a transparent canvas.
+    """
+    objects = list(canvas_json.get("objects") or ())
+    split = 0
+    while split < len(objects) and objects[split].get("id") == UNDERLAY_ID:
+        split += 1
+    background = canvas_json.get("background")
+    overlay = dict(canvas_json, objects=objects[split:], background=None, backgroundImage=None)
+    if not split and not background and not canvas_json.get("backgroundImage"):
+        return None, overlay
+    underlay = dict(canvas_json, objects=objects[:split], overlayImage=None)
+    return underlay, overlay
+
+
+def _sheets(items, per_sheet):
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, per_sheet))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _sheet_rows(rows, layout):
+    # Without data rows, fill one sheet with copies of the template.
+    return [{}] * layout.per_sheet if rows is None else rows
+
+
+def impose_raster(template, rows, fp, *, sheet="Letter", cut="bleed", dpi=300, image_format="jpeg", quality=95,
+                  marks=True, placeholders=DEFAULT_PLACEHOLDERS, image_loader=None, color="rgb", **options):
+    """Render one card per row and stream them onto press sheets as a PDF.
+
+    ``color="cmyk"`` embeds CMYK images.  Extra ``options`` are passed to :func:`~card_designer.batch.render_batch`
+    (``workers``, ``progress``, ...).  Returns the number of cards.
+    """
+    canvas_json, metadata = load_design(template)
+    width, height, bleed, scale = template_dimensions(metadata, dpi)
+    layout = plan_sheet(width * scale / dpi, height * scale / dpi, sheet,
+                        bleed_in=BLEED_INCHES if cut == "bleed" else 0.0)
+    underlay, overlay = split_underlay(canvas_json)
+    jpeg = image_format in ("jpg", "jpeg")
+    marks_content = _crop_marks_content(layout) if marks else b""
+    colorspace = "DeviceCMYK" if color == "cmyk" else "DeviceRGB"
+    count = 0
+    with PdfStreamWriter(fp) as pdf:
+        underlay_id = None
+        if underlay is not None:
+            image = render_design(underlay, width, height, bleed, scale=scale, image_loader=image_loader)
+            if color == "cmyk":
+                flat = to_cmyk(image)
+            else:
+                flat = Image.new("RGB", image.size, "white")
+                flat.paste(image, mask=image.getchannel("A"))
+            buffer = io.BytesIO()
+            flat.save(buffer, "JPEG", quality=UNDERLAY_JPEG_QUALITY)
+            underlay_id = pdf.add_image(buffer.getvalue(), *image.size, colorspace=colorspace)
+        encoding = "raw-alpha" if underlay_id else ("jpeg" if jpeg else "raw")
+        cards = render_batch({"canvas": overlay, "metadata": metadata}, _sheet_rows(rows, layout), dpi=dpi,
+                             encoding=encoding, quality=quality, include_bleed=True, placeholders=placeholders,
+                             image_loader=image_loader, color=color, **options)
+        for sheet_cards in _sheets(cards, layout.per_sheet):
+            images = {"Bg": underlay_id} if underlay_id else {}
+            content = []
+            for (x, y), card in zip(layout.slots(), sheet_cards):
+                name = f"Im{len(images)}"
+                mask = None
+                if card.mask is not None:
+                    mask = pdf.add_image(card.mask, *card.size, filter="FlateDecode", colorspace="DeviceGray")
+                images[name] = pdf.add_image(card.data, *card.size, filter="DCTDecode" if encoding == "jpeg"
+                                             else "FlateDecode", colorspace=colorspace, smask=mask)
+                image_w, image_h = card.size[0] * POINTS_PER_INCH / dpi, card.size[1] * POINTS_PER_INCH / dpi
+                image_x, image_y = x - (image_w - layout.trim_w) / 2, y - (image_h - layout.trim_h) / 2
+                placement = b"%s 0 0 %s %s %s cm" % tuple(_number(v) for v in (image_w, image_h, image_x, image_y))
+                clip = b"%s %s %s %s re W n" % tuple(_number(v) for v in (
+                    x - layout.bleed, y - layout.bleed, layout.trim_w + 2 * layout.bleed, layout.trim_h + 2 * layout.bleed))
+                draw = (b"/Bg Do " if underlay_id else b"") + b"/%s Do" % name.encode()
+                content.append(b"q %s %s %s Q" % (clip, placement, draw))
+            content.append(marks_content)
+            pdf.add_page(layout.sheet_w, layout.sheet_h, b"\n".join(content), images)
+            count += len(sheet_cards)
+    return count
+
+
+def impose_vector(template, rows, fp, *, sheet="Letter", cut="bleed", marks=True,
+                  placeholders=DEFAULT_PLACEHOLDERS, image_loader=None, progress=None, color="rgb"):
+    """Merge one card per row and draw them as vector art onto press sheets.
+
+    ``color="cmyk"`` paints with CMYK operators.  Returns the number of cards.
+    Raises ``ValueError`` for more than ``VECTOR_MAX_CARDS`` rows, before any
+    card is drawn when the row count is known up front.
+    """
+    # ReportLab is only needed here; raster sheets are written without it.
+    from reportlab.pdfgen.canvas import Canvas
+    from .vectorpdf import PdfPainter, draw_design
+
+    canvas_json, metadata = load_design(template)
+    design_dpi = int((metadata.get("dimensions") or {}).get("dpi") or 300)
+    width, height, bleed, _scale = template_dimensions(metadata, design_dpi)
+    layout = plan_sheet(width / design_dpi, height / design_dpi, sheet,
+                        bleed_in=BLEED_INCHES if cut == "bleed" else 0.0)
+    total = count_rows(rows) if rows is not None else layout.per_sheet
+    if total is not None and total > VECTOR_MAX_CARDS:
+        raise ValueError(f"vector press sheets are limited to {VECTOR_MAX_CARDS} cards; use raster sheets")
+    lines = crop_marks(layout) if marks else []
+    pdf = Canvas(fp, pagesize=(layout.sheet_w, layout.sheet_h), pageCompression=1)
+    pdf.setCreator("Professional Business Card Designer")
+    painter = PdfPainter(pdf, image_loader, color)
+    count = 0
+    for sheet_rows in _sheets(iter_rows(_sheet_rows(rows, layout)), layout.per_sheet):
+        for (x, y), row in zip(layout.slots(), sheet_rows):
+            if count == VECTOR_MAX_CARDS:
+                raise ValueError(f"vector press sheets are limited to {VECTOR_MAX_CARDS} cards; use raster sheets")
+            draw_design(pdf, painter, merge_design(canvas_json, row, placeholders), width, height, bleed,
+                        (x, y + layout.trim_h), POINTS_PER_INCH / design_dpi, include_bleed=cut == "bleed")
+            count += 1
+            if progress:
+                progress(count, total)
+        if lines:
+            pdf.setStrokeColorCMYK(1, 1, 1, 1)
+            pdf.setLineWidth(CROP_MARK_WIDTH)
+            pdf.lines(lines)
+        pdf.showPage()
+    pdf.save()
+    return count
+
+
+def run_imposition(template, rows, fp, *, mode="auto", dpi=300, image_format="jpeg", quality=95, **options):
+    """Impose ``rows`` (or one sheet of copies when ``None``) as ``"vector"`` or ``"raster"``.
+
+    ``"auto"`` draws vector sheets when the row count is known and at most
+    ``VECTOR_MAX_CARDS``, and streams raster sheets otherwise.  ``dpi``,
+    ``image_format``, ``quality`` and ``workers`` only apply to raster sheets.
+    """
+    if mode == "auto":
+        total = count_rows(rows) if rows is not None else 0
+        mode = "vector" if total is not None and total <= VECTOR_MAX_CARDS else "raster"
+    if mode == "raster":
+        return impose_raster(template, rows, fp, dpi=dpi, image_format=image_format, quality=quality, **options)
+    options.pop("workers", None)
+    return impose_vector(template, rows, fp, **options)
@@ -0,0 +1,117 @@
+"""Decode uploaded images once and downscale them to the canvas size.
+
+A phone photo can be 20 MB; embedding it as-is means every rerun ships it
+to the browser and Fabric decodes it again.  Uploads are instead decoded
+with Pillow's JPEG draft mode (DCT scaling while decoding), resampled to
+just cover the canvas including bleed, re-encoded, and cached by content
+hash plus target size and DPI.  Blur and brightness adjustments are baked
+into a further cached copy so the browser never runs image filters.
+"""
+import hashlib
+import io
+from typing import NamedTuple
+
+from PIL import Image, ImageOps
+
+from .cache import LRUCache
+from .render import apply_filters
+
+PROXY_JPEG_QUALITY = 90
+# Shared by all sessions; proxies of a 600 DPI Jumbo card are ~1-2 MB.
+background_cache = LRUCache(max_bytes=256 * 1024 * 1024, sizeof=lambda proxy: len(proxy.data))
+
+
+class ImageProxy(NamedTuple):
+    data: bytes
+    mime: str
+    size: tuple
+    digest: str
+
+
+def content_hash(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+
+def cover_size(source_size, target_size):
+    """Smallest size with the source aspect ratio that covers ``target_size``.
+
+    Never larger than the source: images are only ever downscaled.
+    """
+    sw, sh = source_size
+    tw, th = target_size
+    ratio = min(1.0, max(tw / sw, th / sh))
+    return max(1, round(sw * ratio)), max(1, round(sh * ratio))
+
+
+def downscale(raw, target_size):
+    """Decode ``raw`` and resample it to cover ``target_size``.
+
+    Returns a PIL image in RGB or RGBA mode, EXIF-rotated like browsers do.
+    """
+    image = Image.open(io.BytesIO(raw))
+    orientation = image.getexif().get(0x0112, 1)
+    # EXIF rotations of 90/270 degrees swap the axes the draft must cover.
+    draft_target = target_size[::-1] if orientation in (5, 6, 7, 8) else target_size
+    if image.format == "JPEG":
+        image.draft("RGB", cover_size(image.size, draft_target))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    size = cover_size(image.size, target_size)
+    if size != image.size:
+        image = image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    return image
+
+
+def encode_proxy(image, digest):
+    buffer = io.BytesIO()
+    if image.mode == "RGBA":
+        image.save(buffer, "PNG", compress_level=3)
+        mime = "image/png"
+    else:
+        image.save(buffer, "JPEG", quality=PROXY_JPEG_QUALITY, optimize=True)
+        mime = "image/jpeg"
+    return ImageProxy(buffer.getvalue(), mime, image.size, digest)
+
+
+def prepare_background(raw, target_size, dpi, mime="image/png"):
+    """Return a cached :class:`ImageProxy` of an upload sized for the canvas.
+
+    ``target_size`` is the full canvas including bleed
+    (``pixels_w + 2 * bleed``, ``pixels_h + 2 * bleed``).  SVG uploads are
+    resolution independent and are passed through unchanged.
+    """
+    digest = content_hash(raw)
+    if mime == "image/svg+xml":
+        return ImageProxy(raw, mime, None, digest)
+    key = (digest, tuple(target_size), dpi)
+    return background_cache.get_or_create(key, lambda: encode_proxy(downscale(raw, target_size), digest))
+
+
+def background_filters(blur=0, brightness=1.0):
+    """Fabric filter specs for the editor's background sliders (as the JS used to build)."""
+    filters = []
+    if blur:
+        filters.append({"type": "Blur", "blur": blur})
+    if brightness != 1:
+        filters.append({"type": "Brightness", "brightness": brightness - 1})
+    return filters
+
+
+def adjust_background(proxy, blur=0, brightness=1.0):
+    """Return ``proxy`` with blur and brightness applied, memoized per setting.
+
+    The result matches what Fabric's ``Blur``/``Brightness`` filters would
+    draw, so the editor shows the adjusted image as-is.  Opacity is left to
+    the Fabric object, where it costs nothing.
+    """
+    filters = background_filters(blur, brightness)
+    if not filters or proxy.size is None:
+        return proxy
+    key = (proxy.digest, proxy.size, blur, brightness)
+
+    def create():
+        image = apply_filters(Image.open(io.BytesIO(proxy.data)), filters)
+        return encode_proxy(image, proxy.digest)
+
+    return background_cache.get_or_create(key, create)
@@ -0,0 +1,190 @@
+"""Per-rerun stage timings for the app's performance panel and logs.
+
+A :class:`RerunProfile` is created at the top of the script and
+:meth:`~RerunProfile.mark` is called after each stage: the stage's time is
+the time since the previous mark, so the app needs no extra nesting.
+Payload sizes (the editor settings sent to the component and the delta it
+sent back) are recorded as JSON byte counts, and with ``trace_memory`` the
+peak Python heap of the rerun comes from :mod:`tracemalloc`.
+
+:meth:`~RerunProfile.finish` logs one JSON record per rerun on the
+``card_designer.instrument`` logger so production sessions can be
+aggregated; set :data:`LOG_ENV` to write them to stderr when logging is
+not otherwise configured.
+
+The editor iframe times its own operations with ``performance.measure``
+(Fabric redraws, undo/redo, the layer panel, history snapshots, sync and
+template saves) and sends them with its canvas deltas;
+:class:`ClientTelemetry` pools those reports from every session into
+percentiles per operation and canvas DPI.
+"""
+import json
+import logging
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+
+LOG_ENV = "CARD_DESIGNER_PERF_LOG"
+HISTORY_LENGTH = 50
+# Browser samples kept per operation and DPI, and sessions whose gauges are kept.
+CLIENT_WINDOW = 2000
+CLIENT_SESSIONS = 200
+
+logger = logging.getLogger(__name__)
+if os.environ.get(LOG_ENV) and not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+
+def set_memory_tracing(enabled):
+    """Start or stop :mod:`tracemalloc`; tracing is process-wide and slows allocation."""
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not enabled and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def json_size(value):
+    """Bytes of ``value`` serialized compactly as JSON, as Streamlit sends component arguments."""
+    return len(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+class RerunProfile:
+    """Stage timings and payload sizes of one script run."""
+
+    def __init__(self, session, *, trace_memory=False):
+        self.session = session
+        self.trace_memory = trace_memory and tracemalloc.is_tracing()
+        self.stages = {}
+        self.payload_bytes = {}
+        self.peak_bytes = None
+        self.total_ms = None
+        self.started = self._last = time.perf_counter()
+        if self.trace_memory:
+            # Other sessions' reruns in the same interval count towards the peak too.
+            tracemalloc.reset_peak()
+
+    def mark(self, stage):
+        """End ``stage`` now; it covers the time since the previous mark."""
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def payload(self, name, value):
+        """Record the JSON size of ``value`` under ``name``; returns it."""
+        self.payload_bytes[name] = json_size(value)
+        return self.payload_bytes[name]
+
+    def finish(self, stage="rest"):
+        """Close the last stage, log the rerun and return its record."""
+        self.mark(stage)
+        self.total_ms = (self._last - self.started) * 1000
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        record = self.record()
+        logger.info(json.dumps(record, separators=(",", ":")))
+        return record
+
+    def record(self):
+        return {
+            "event": "rerun",
+            "time": round(time.time(), 3),
+            "session": self.session,
+            "total_ms": None if self.total_ms is None else round(self.total_ms, 2),
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages.items()},
+            "payload_bytes": dict(self.payload_bytes),
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+def _stats(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p95": None, "max": None}
+
+    def rank(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    return {"p50": rank(0.5), "p95": rank(0.95), "max": round(ordered[-1], 1)}
+
+
+class ClientTelemetry:
+    """Browser-side timings from every session's editor, in a sliding window.
+
+    Each report is what the editor attaches to a canvas delta: per
+    operation a ``count``, ``max`` and a uniform sample of ``values`` in
+    milliseconds, plus ``gauges`` such as the undo history's size in bytes.
+    Reports arrive on script threads, so the pools are locked.
+    """
+
+    def __init__(self, window=CLIENT_WINDOW):
+        self.window = window
+        self.reports = 0
+        self._samples = {}  # (operation, dpi) -> deque of ms
+        self._counts = {}
+        self._max = {}
+        self._gauges = OrderedDict()  # session -> latest gauges, least recent first
+        self._lock = threading.Lock()
+
+    def add(self, session, report):
+        """Pool one editor report and log it; malformed entries are skipped."""
+        dpi = report.get("dpi")
+        with self._lock:
+            self.reports += 1
+            for name, entry in (report.get("samples") or {}).items():
+                try:
+                    values = [float(v) for v in entry["values"]]
+                    count, peak = int(entry["count"]), float(entry["max"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                key = (str(name), dpi)
+                self._samples.setdefault(key, deque(maxlen=self.window)).extend(values)
+                self._counts[key] = self._counts.get(key, 0) + count
+                self._max[key] = max(self._max.get(key, 0.0), peak)
+            if isinstance(report.get("gauges"), dict):
+                self._gauges[session] = dict(report["gauges"], dpi=dpi)
+                self._gauges.move_to_end(session)
+                while len(self._gauges) > CLIENT_SESSIONS:
+                    self._gauges.popitem(last=False)
+        logger.info(json.dumps({"event": "client", "time": round(time.time(), 3), "session": session, **report},
+                               separators=(",", ":")))
+
+    def summary(self):
+        """Per operation and DPI: call count, p50/p95 of the sample and the true maximum, slowest p95 first.
+
+        ``gauges`` gives the p50 and maximum over sessions of each gauge.
+        """
+        with self._lock:
+            operations = []
+            for (name, dpi), values in self._samples.items():
+                stats = _stats(values)
+                stats["max"] = round(self._max[name, dpi], 1)
+                operations.append({"operation": name, "dpi": dpi, "count": self._counts[name, dpi], **stats})
+            gauges = {}
+            for session_gauges in self._gauges.values():
+                for name, value in session_gauges.items():
+                    if name != "dpi" and isinstance(value, (int, float)):
+                        gauges.setdefault(name, []).append(value)
+        operations.sort(key=lambda op: -(op["p95"] or 0))
+        return {"reports": self.reports, "operations": operations,
+                "gauges": {name: {"p50": _stats(values)["p50"], "max": max(values)} for name, values in gauges.items()}}
+
+
+def new_history():
+    """Recent rerun records of one session, newest last."""
+    return deque(maxlen=HISTORY_LENGTH)
+
+
+def summarize(history):
+    """p50/p95/max of total and per-stage times over ``history``, in milliseconds."""
+    stages = {}
+    for record in history:
+        for name, ms in record["stages_ms"].items():
+            stages.setdefault(name, []).append(ms)
+    return {"runs": len(history), "total_ms": _stats([record["total_ms"] for record in history]),
+            "stages_ms": {name: _stats(values) for name, values in stages.items()}}
@@ -0,0 +1,337 @@
+"""Process-pool job scheduler shared by every Streamlit session.
+
+Exports and mail-merge runs are CPU-bound, so running them in a script
+thread holds the GIL and stalls every other session's reruns.  Jobs go
+through one :class:`JobScheduler` per server instead: a process pool of
+:data:`WORKERS_ENV` workers (default: one per CPU) fed one job per free
+worker.  The next job always comes from the session with the fewest jobs
+running, so one user's long batch delays another user's export by at most
+a single job.  Each job writes its output to a file, reports progress and
+can be cancelled; queue wait and run times are kept for
+:meth:`JobScheduler.metrics`.  The job functions load their backend on
+first use, so neither the app nor a fresh worker imports ReportLab until
+a PDF job runs.
+"""
+import io
+import itertools
+import multiprocessing
+import os
+import pathlib
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from . import backends
+
+WORKERS_ENV = "CARD_DESIGNER_WORKERS"
+MAX_QUEUED_PER_SESSION = 4
+MAX_QUEUED = 64
+# Finished jobs nobody dismissed are dropped, with their files, after this long.
+RESULT_TTL_SECONDS = 3600
+METRICS_WINDOW = 200
+_CANCEL_SLOTS = 64
+
+_worker = {}
+
+
+class QueueFull(RuntimeError):
+    """Raised by :meth:`JobScheduler.submit` when a queue depth limit is reached."""
+
+
+class JobCancelled(Exception):
+    """Raised from a running job's ``progress`` callback once it has been cancelled."""
+
+
+class Job:
+    """One unit of work; its fields are updated in place by the scheduler.
+
+    ``state`` is ``"queued"``, ``"running"``, ``"done"``, ``"failed"`` or
+    ``"cancelled"``.  ``done``/``total`` are the latest progress report,
+    ``result`` is the job function's return value and ``path`` the file its
+    output was written to.
+    """
+
+    def __init__(self, job_id, session, label, fn, args, kwargs, path):
+        self.id = job_id
+        self.session = session
+        self.label = label
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.path = path
+        self.state = "queued"
+        self.done = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+        self._event = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in ("queued", "running")
+
+    @property
+    def wait_seconds(self):
+        return (self.started or self.finished or time.monotonic()) - self.submitted
+
+    @property
+    def run_seconds(self):
+        return None if self.started is None else (self.finished or time.monotonic()) - self.started
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns whether it did."""
+        return self._event.wait(timeout)
+
+    def read(self):
+        """The job's output bytes; raises the job's error if it did not succeed."""
+        if self.state != "done":
+            raise self.error or JobCancelled(f"job {self.id} is {self.state}")
+        return pathlib.Path(self.path).read_bytes()
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.label!r} {self.state}>"
+
+
+def _init_worker(progress_queue, cancelled):
+    _worker.update(progress=progress_queue, cancelled=cancelled)
+
+
+def _run_job(job_id, path, fn, args, kwargs):
+    progress_queue, cancelled = _worker["progress"], _worker["cancelled"]
+
+    def progress(done, total=None):
+        if job_id in cancelled[:]:
+            raise JobCancelled(f"job {job_id} was cancelled")
+        progress_queue.put((job_id, done, total))
+
+    with open(path, "wb") as fp:
+        return fn(*args, fp=fp, progress=progress, **kwargs)
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+
+    def ms(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50": ms(0.5), "p95": ms(0.95), "max": ms(1.0)}
+
+
+class JobScheduler:
+    """Run job functions in a shared process pool, taking turns between sessions.
+
+    A job function is called in a worker as ``fn(*args, fp=fp,
+    progress=progress, **kwargs)``: it writes its output to the binary file
+    ``fp`` and may call ``progress(done, total)``, which raises
+    :class:`JobCancelled` once the job is cancelled.  Functions and
+    arguments must be picklable.
+    """
+
+    def __init__(self, workers=None, *, max_queued_per_session=MAX_QUEUED_PER_SESSION, max_queued=MAX_QUEUED,
+                 results_dir=None):
+        self.workers = workers or int(os.environ.get(WORKERS_ENV) or 0) or os.cpu_count() or 1
+        self.max_queued_per_session = max_queued_per_session
+        self.max_queued = max_queued
+        self.results_dir = pathlib.Path(results_dir or pathlib.Path(tempfile.gettempdir()) / "card_designer" / "jobs")
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self._queues = OrderedDict()  # session -> deque of queued jobs, in turn order
+        self._running = {}
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._waits = deque(maxlen=METRICS_WINDOW)
+        self._runs = deque(maxlen=METRICS_WINDOW)
+        self._lock = threading.RLock()
+        self._progress = multiprocessing.Queue()
+        self._cancelled = multiprocessing.Array("q", _CANCEL_SLOTS)
+        self._cancel_slot = 0
+        self._pool = self._new_pool()
+        threading.Thread(target=self._listen, name="job-progress", daemon=True).start()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                   initargs=(self._progress, self._cancelled))
+
+    def _listen(self):
+        while True:
+            job_id, done, total = self._progress.get()
+            # Reports can arrive after the job's result; they are still in order.
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.done, job.total = done, total
+
+    # -- submission -------------------------------------------------------
+
+    def submit(self, session, fn, *args, label="", suffix=".bin", **kwargs):
+        """Queue ``fn`` for ``session``; returns its :class:`Job`.
+
+        Raises :class:`QueueFull` if the session or the server already has
+        too many jobs waiting.
+        """
+        with self._lock:
+            self._prune()
+            queued = self._queues.get(session, ())
+            if len(queued) >= self.max_queued_per_session:
+                raise QueueFull(f"{len(queued)} jobs are already waiting; wait for one to finish or cancel it")
+            if sum(len(q) for q in self._queues.values()) >= self.max_queued:
+                raise QueueFull("the server is busy; try again in a moment")
+            job_id = next(self._ids)
+            fd, path = tempfile.mkstemp(dir=self.results_dir, prefix=f"job-{job_id}-", suffix=suffix)
+            os.close(fd)
+            job = Job(job_id, session, label, fn, args, kwargs, path)
+            self._jobs[job_id] = job
+            self._queues.setdefault(session, deque()).append(job)
+            self._dispatch()
+        return job
+
+    def run(self, session, fn, *args, timeout=None, **kwargs):
+        """Submit a job, wait for it and return its output bytes; the job is then discarded."""
+        job = self.submit(session, fn, *args, **kwargs)
+        try:
+            if not job.wait(timeout):
+                raise TimeoutError(f"job {job.id} did not finish within {timeout} s")
+            return job.read()
+        finally:
+            self.discard(job)
+
+    def _dispatch(self):
+        while self._queues and len(self._running) < self.workers:
+            # The session with the fewest running jobs goes next; ties in turn order.
+            running = [job.session for job in self._running.values()]
+            session = min(self._queues, key=running.count)
+            queue = self._queues[session]
+            job = queue.popleft()
+            if queue:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            job.state, job.started = "running", time.monotonic()
+            self._waits.append(job.wait_seconds)
+            self._running[job.id] = job
+            try:
+                future = self._pool.submit(_run_job, job.id, job.path, job.fn, job.args, job.kwargs)
+            except BrokenProcessPool as exc:
+                self._pool = self._new_pool()
+                self._finish(job, None, exc)
+                continue
+            future.add_done_callback(lambda f, job=job: self._finished(job, f))
+
+    def _finished(self, job, future):
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            if isinstance(error, BrokenProcessPool):
+                # A worker died (e.g. out of memory); the pool cannot be reused.
+                self._pool = self._new_pool()
+            self._finish(job, None if error else future.result(), error)
+            discarded = job.id not in self._jobs
+            self._dispatch()
+        if discarded:
+            try:
+                os.unlink(job.path)
+            except FileNotFoundError:
+                pass
+
+    def _finish(self, job, result, error):
+        self._running.pop(job.id, None)
+        job.finished = time.monotonic()
+        if job.started is not None:
+            self._runs.append(job.run_seconds)
+        if isinstance(error, JobCancelled) or job.state == "cancelled":
+            job.state = "cancelled"
+            self.cancelled += 1
+        elif error is not None:
+            job.state, job.error = "failed", error
+            self.failed += 1
+        else:
+            job.state, job.result = "done", result
+            self.completed += 1
+        job._event.set()
+
+    # -- control ----------------------------------------------------------
+
+    def cancel(self, job):
+        """Cancel a queued job, or ask a running one to stop at its next progress report."""
+        with self._lock:
+            if job.state == "queued":
+                queue = self._queues.get(job.session)
+                if queue is not None:
+                    queue.remove(job)
+                    if not queue:
+                        del self._queues[job.session]
+                job.state = "cancelled"
+                self._finish(job, None, None)
+            elif job.state == "running":
+                self._cancelled[self._cancel_slot % _CANCEL_SLOTS] = job.id
+                self._cancel_slot += 1
+
+    def discard(self, job):
+        """Cancel ``job`` if needed and forget it, deleting its output file."""
+        self.cancel(job)
+        with self._lock:
+            self._jobs.pop(job.id, None)
+        try:
+            os.unlink(job.path)
+        except FileNotFoundError:
+            pass
+
+    def _prune(self):
+        cutoff = time.monotonic() - RESULT_TTL_SECONDS
+        for job in [job for job in self._jobs.values() if job.finished is not None and job.finished < cutoff]:
+            self.discard(job)
+
+    def jobs(self, session):
+        """The session's jobs that have not been discarded, oldest first."""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.session == session]
+
+    def metrics(self):
+        """Queue depth, job counts and queue wait / run time percentiles in milliseconds."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queued": sum(len(q) for q in self._queues.values()),
+                "running": len(self._running),
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "wait_ms": _percentiles(self._waits),
+                "run_ms": _percentiles(self._runs),
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+# -- job functions ----------------------------------------------------------
+
+def export_job(design, format, width, height, bleed=0, *, fp, progress, **options):
+    """Job running :func:`~card_designer.export.export_design`."""
+    fp.write(backends.load("export")(design, format, width, height, bleed, **options))
+    progress(1, 1)
+
+
+def merge_job(template, rows, *, fp, progress, imposition=False, **options):
+    """Job running a mail merge, or press-sheet imposition with ``imposition=True``.
+
+    ``rows`` is CSV bytes (or ``None`` for a sheet of template copies).  Cards
+    render inside the job's own worker, so a job never takes more than its
+    share of the pool.  Returns the number of cards.
+    """
+    rows = io.BytesIO(rows) if rows is not None else None
+    if imposition:
+        # Row dicts are small next to the sheets; a known count lets the
+        # imposition choose vector or raster sheets and fail fast.
+        from .batch import iter_rows  # imposition imports batch anyway
+        rows = list(iter_rows(rows)) if rows is not None else None
+        return backends.load("imposition")(template, rows, fp, progress=progress, workers=0, **options)
+    return backends.load("batch")(template, rows, fp, progress=progress, workers=0, **options)
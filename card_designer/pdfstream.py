@@ -0,0 +1,116 @@
+"""Minimal PDF writer that streams pages to a file as they are produced.
+
+Pillow and ReportLab both keep every page in memory until the document is
+saved.  Batch and imposition runs can have thousands of pages, so this
+writer emits each image and page object immediately and only keeps object
+offsets around for the cross-reference table.
+"""
+import zlib
+
+POINTS_PER_INCH = 72
+
+
+class PdfStreamWriter:
+    """Write a PDF incrementally to a binary file object.
+
+    Images are written once with :meth:`add_image` and can then be drawn on
+    any number of pages, so shared assets are embedded a single time.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.offsets = {}
+        self.pages = []
+        self.next_id = 3  # 1 = catalog, 2 = page tree (written on close)
+        self.position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.position += len(data)
+
+    def _object(self, body, stream=None, obj_id=None):
+        if obj_id is None:
+            obj_id = self.next_id
+            self.next_id += 1
+        self.offsets[obj_id] = self.position
+        self._write(b"%d 0 obj\n" % obj_id)
+        if stream is None:
+            self._write(body + b"\nendobj\n")
+        else:
+            self._write(body[:-2] + b" /Length %d >>\nstream\n" % len(stream))
+            self._write(stream)
+            self._write(b"\nendstream\nendobj\n")
+        return obj_id
+
+    def add_image(self, data, width, height, *, filter="DCTDecode", colorspace="DeviceRGB", smask=None):
+        """Embed encoded image ``data`` and return its object id.
+
+        ``filter`` is ``DCTDecode`` for JPEG bytes or ``FlateDecode`` for
+        zlib-compressed raw samples (see :func:`flate_pixels`).  ``smask`` is
+        the id of a ``DeviceGray`` image used as the alpha channel.
+        """
+        # Pillow writes Adobe-style inverted CMYK JPEGs, as its own PDF plugin assumes.
+        decode = b" /Decode [1 0 1 0 1 0 1 0]" if colorspace == "DeviceCMYK" and filter == "DCTDecode" else b""
+        if smask is not None:
+            decode += b" /SMask %d 0 R" % smask
+        body = (b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /%s "
+                b"/BitsPerComponent 8 /Filter /%s%s >>"
+                % (width, height, colorspace.encode(), filter.encode(), decode))
+        return self._object(body, data)
+
+    def add_page(self, width_pt, height_pt, content, images=None, boxes=None):
+        """Append a page drawing ``content`` with named image XObjects.
+
+        ``images`` maps resource names used in ``content`` (``Im0``) to ids
+        from :meth:`add_image`; ``boxes`` adds e.g. ``TrimBox``/``BleedBox``.
+        """
+        content_id = self._object(b"<< /Filter /FlateDecode >>", zlib.compress(content))
+        xobjects = b" ".join(b"/%s %d 0 R" % (name.encode(), ref) for name, ref in (images or {}).items())
+        extra = b"".join(b" /%s [%s]" % (name.encode(), _numbers(box)) for name, box in (boxes or {}).items())
+        body = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %s %s]%s "
+                b"/Resources << /XObject << %s >> >> /Contents %d 0 R >>"
+                % (_number(width_pt), _number(height_pt), extra, xobjects, content_id))
+        self.pages.append(self._object(body))
+
+    def add_image_page(self, data, width, height, dpi, *, filter="DCTDecode", colorspace="DeviceRGB",
+                       boxes=None):
+        """Append a page holding one full-bleed raster at ``dpi``."""
+        image_id = self.add_image(data, width, height, filter=filter, colorspace=colorspace)
+        width_pt = width * POINTS_PER_INCH / dpi
+        height_pt = height * POINTS_PER_INCH / dpi
+        content = b"q %s 0 0 %s 0 0 cm /Im0 Do Q" % (_number(width_pt), _number(height_pt))
+        self.add_page(width_pt, height_pt, content, {"Im0": image_id}, boxes)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % page for page in self.pages)
+        self._object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)), obj_id=2)
+        self._object(b"<< /Type /Catalog /Pages 2 0 R >>", obj_id=1)
+        xref = self.position
+        size = self.next_id
+        lines = [b"xref\n0 %d\n0000000000 65535 f \n" % size]
+        for obj_id in range(1, size):
+            lines.append(b"%010d 00000 n \n" % self.offsets[obj_id])
+        self._write(b"".join(lines))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref))
+        self.fp.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def flate_pixels(image):
+    """Zlib-compress the raw samples of an RGB/CMYK/L image for ``FlateDecode``."""
+    return zlib.compress(image.tobytes(), 6)
+
+
+def _number(value):
+    return (b"%.4f" % value).rstrip(b"0").rstrip(b".")
+
+
+def _numbers(values):
+    return b" ".join(_number(v) for v in values)
@@ -0,0 +1,394 @@
+"""Rasterize Fabric.js canvas JSON at print resolution with Pillow and NumPy.
+
+The browser canvas is zoomed to fit the window, so ``toDataURL`` output
+depends on the user's screen.  This renderer works from the JSON produced
+by ``canvas.toJSON()`` (or a saved ``business-card-template.json``) and draws
+it in canvas units, which are print pixels at the design's DPI.
+"""
+import base64
+import binascii
+import io
+import json
+import math
+import pathlib
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+from . import backends, fabric
+from .colors import parse_color
+from .fonts import is_bold, is_italic, load_font
+
+# Text is measured at a fixed size and scaled so layout does not depend on
+# the hinting of whatever pixel size the card is rendered at.
+MEASURE_SIZE = 256
+# Fabric's Blur filter samples +/- ``blur * 0.12`` of the image size.
+FABRIC_BLUR_SPREAD = 0.12
+# Blurs wider than this many pixels run on a reduced copy of the image.
+BLUR_REDUCE_RADIUS = 4
+
+
+def load_design(source):
+    """Return ``(canvas_json, metadata)`` from a design in any saved form.
+
+    ``source`` may be the ``canvas.toJSON()`` dict, the ``save-template``
+    wrapper (``{"canvas": ..., "metadata": ...}``), a JSON string/bytes, a
+    :class:`pathlib.Path` or a binary file object.  Strings are always JSON,
+    never file names: uploaded designs arrive as strings and bytes, and must
+    not make the server read its own files.
+    """
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, pathlib.Path):
+        source = source.read_bytes()
+    if isinstance(source, (bytes, bytearray)):
+        source = source.decode("utf-8")
+    if isinstance(source, str):
+        if not source.lstrip().startswith("{"):
+            raise ValueError("design must be a JSON object")
+        source = json.loads(source)
+    if not isinstance(source, dict):
+        raise ValueError("design must be a JSON object")
+    if "canvas" in source and isinstance(source["canvas"], dict):
+        return source["canvas"], source.get("metadata") or {}
+    return source, {}
+
+
+def load_image_source(src):
+    """Decode a Fabric image ``src`` data URL into a PIL image.
+
+    Designs come from users, so nothing else is opened: a path or URL would
+    let a design read files from the server into its export.  Other sources
+    need an ``image_loader`` such as :meth:`AssetStore.open_image`.
+    """
+    if not src.startswith("data:"):
+        raise ValueError(f"cannot load image {src[:80]!r}: only data URLs and stored assets are allowed")
+    header, _, payload = src.partition(",")
+    try:
+        data = base64.b64decode(payload) if ";base64" in header else payload.encode("utf-8")
+    except binascii.Error as exc:
+        raise ValueError("invalid base64 image data") from exc
+    return Image.open(io.BytesIO(data))
+
+
+@lru_cache(maxsize=1)
+def _cv2():
+    # OpenCV is optional and slow to import; Pillow's box-filter Gaussian is the fallback.
+    try:
+        return backends.load("opencv")
+    except ImportError:
+        return None
+
+
+def fabric_blur_radius(blur, width, height):
+    """Gaussian radius approximating Fabric's ``Blur`` filter of strength ``blur``."""
+    return FABRIC_BLUR_SPREAD * float(blur) * max(width, height) / math.sqrt(3)
+
+
+def gaussian_blur(image, radius):
+    """Separable Gaussian blur of standard deviation ``radius`` pixels.
+
+    A wide blur removes all detail finer than its radius, so the image is
+    reduced by up to 8x first and the result scaled back up, which keeps
+    the cost flat for the very large radii Fabric's ``Blur`` produces.
+    """
+    factor = max(1, min(8, int(radius // BLUR_REDUCE_RADIUS)))
+    small = image.reduce(factor) if factor > 1 else image
+    cv2 = _cv2()
+    if cv2 is not None:
+        pixels = cv2.GaussianBlur(np.asarray(small), (0, 0), radius / factor, borderType=cv2.BORDER_REPLICATE)
+        small = Image.fromarray(pixels, small.mode)
+    else:
+        small = small.filter(ImageFilter.GaussianBlur(radius / factor))
+    return small.resize(image.size, Image.BILINEAR) if factor > 1 else small
+
+
+def apply_filters(image, filters):
+    """Apply the Fabric image filters the editor uses (Brightness, Blur)."""
+    for spec in filters or ():
+        kind = (spec or {}).get("type")
+        if kind == "Brightness":
+            delta = round(float(spec.get("brightness", 0)) * 255)
+            if delta:
+                lut = np.clip(np.arange(256) + delta, 0, 255).astype(np.uint8).tolist()
+                identity = list(range(256))
+                image = image.point([v for band in image.getbands() for v in (identity if band == "A" else lut)])
+        elif kind == "Blur":
+            radius = fabric_blur_radius(spec.get("blur", 0), *image.size)
+            if radius > 0:
+                image = gaussian_blur(image, radius)
+    return image
+
+
+@lru_cache(maxsize=8)
+def _prepared_image(src, filters_key, loader):
+    image = (loader or load_image_source)(src)
+    image = image.convert("RGBA")
+    return apply_filters(image, json.loads(filters_key))
+
+
+class _Renderer:
+    def __init__(self, size, view, antialias, image_loader):
+        self.image = None
+        self.size = size
+        self.view = view
+        self.antialias = max(1, int(antialias))
+        self.image_loader = image_loader
+
+    # -- text metrics -----------------------------------------------------
+
+    def _font(self, obj, size):
+        return load_font(obj.get("fontFamily") or "Times New Roman", size,
+                         is_bold(obj.get("fontWeight")), is_italic(obj.get("fontStyle")))
+
+    def line_width(self, obj, line):
+        """Width of one text line in canvas units."""
+        font_size = float(obj.get("fontSize") or 40)
+        font = self._font(obj, MEASURE_SIZE)
+        width = font.getlength(line) * font_size / MEASURE_SIZE
+        spacing = float(obj.get("charSpacing") or 0) * font_size / 1000
+        if spacing and len(line) > 1:
+            width += spacing * (len(line) - 1)
+        return width
+
+    def measure(self, obj):
+        height = fabric.text_height(obj)
+        if obj.get("type") == "textbox":
+            return float(obj.get("width") or 0), height
+        return max(self.line_width(obj, line) for line in fabric.text_lines(obj)), height
+
+    # -- compositing ------------------------------------------------------
+
+    def _clip_box(self, points, pad):
+        x0, y0, x1, y1 = fabric.bounding_box(points)
+        x0 = max(0, math.floor(x0 - pad))
+        y0 = max(0, math.floor(y0 - pad))
+        x1 = min(self.size[0], math.ceil(x1 + pad))
+        y1 = min(self.size[1], math.ceil(y1 + pad))
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1, y1
+
+    def _paint_layer(self, paint, mask, box, obj, matrix, alpha):
+        if isinstance(paint, dict):
+            layer = self._gradient(paint, obj, matrix, box)
+            if layer is None:
+                return
+            mask = ImageChops.multiply(mask, layer.getchannel("A"))
+        else:
+            rgba = parse_color(paint)
+            if rgba is None:
+                return
+            layer = Image.new("RGBA", mask.size, rgba[:3] + (0,))
+            alpha *= rgba[3] / 255
+        if alpha < 1:
+            mask = mask.point([round(i * alpha) for i in range(256)])
+        layer.putalpha(mask)
+        self.image.alpha_composite(layer, box[:2])
+
+    def _gradient(self, gradient, obj, matrix, box):
+        stops = sorted(gradient.get("colorStops") or (), key=lambda s: float(s.get("offset", 0)))
+        colors = []
+        for stop in stops:
+            rgba = parse_color(stop.get("color")) or (0, 0, 0, 0)
+            opacity = float(stop.get("opacity", 1) if stop.get("opacity") is not None else 1)
+            colors.append((float(stop.get("offset", 0)), rgba[:3] + (rgba[3] * opacity,)))
+        if not colors:
+            return None
+        w, h = fabric.object_size(obj)
+        g = fabric.translate(-w / 2 + float(gradient.get("offsetX") or 0), -h / 2 + float(gradient.get("offsetY") or 0))
+        if gradient.get("gradientUnits") == "percentage":
+            g = fabric.multiply(g, fabric.scale(w, h))
+        if gradient.get("gradientTransform"):
+            g = fabric.multiply(g, tuple(gradient["gradientTransform"]))
+        inv = fabric.invert(fabric.multiply(matrix, g))
+        x0, y0, x1, y1 = box
+        ys, xs = np.mgrid[y0:y1, x0:x1].astype(np.float32) + 0.5
+        gx = inv[0] * xs + inv[2] * ys + inv[4]
+        gy = inv[1] * xs + inv[3] * ys + inv[5]
+        c = gradient.get("coords") or {}
+        if gradient.get("type") == "radial":
+            r1, r2 = float(c.get("r1", 0)), float(c.get("r2", 0))
+            dist = np.hypot(gx - float(c.get("x2", 0)), gy - float(c.get("y2", 0)))
+            t = (dist - r1) / ((r2 - r1) or 1.0)
+        else:
+            dx = float(c.get("x2", 0)) - float(c.get("x1", 0))
+            dy = float(c.get("y2", 0)) - float(c.get("y1", 0))
+            t = ((gx - float(c.get("x1", 0))) * dx + (gy - float(c.get("y1", 0))) * dy) / ((dx * dx + dy * dy) or 1.0)
+        t = np.clip(t, 0.0, 1.0)
+        offsets = [o for o, _ in colors]
+        channels = [np.interp(t, offsets, [rgba[i] for _, rgba in colors]) for i in range(4)]
+        pixels = np.dstack(channels).round().astype(np.uint8)
+        return Image.fromarray(pixels, "RGBA")
+
+    def composite_image(self, image, matrix, alpha, resample=Image.BILINEAR):
+        """Draw ``image`` whose pixel space maps to the output through ``matrix``."""
+        w, h = image.size
+        corners = fabric.apply(matrix, [(0, 0), (w, 0), (w, h), (0, h)])
+        a, b, c, d, e, f = matrix
+        if b == 0 and c == 0 and abs(a - 1) < 1e-6 and abs(d - 1) < 1e-6:
+            x, y = round(e), round(f)
+            crop = (max(0, -x), max(0, -y), min(w, self.size[0] - x), min(h, self.size[1] - y))
+            if crop[2] <= crop[0] or crop[3] <= crop[1]:
+                return
+            layer = image.crop(crop) if crop != (0, 0, w, h) else image
+            box = (x + crop[0], y + crop[1])
+        else:
+            clip = self._clip_box(corners, 1)
+            if clip is None:
+                return
+            x0, y0, x1, y1 = clip
+            ia, ib, ic, id_, ie, if_ = fabric.invert(matrix)
+            data = (ia, ic, ia * x0 + ic * y0 + ie, ib, id_, ib * x0 + id_ * y0 + if_)
+            layer = image.transform((x1 - x0, y1 - y0), Image.AFFINE, data, resample=resample)
+            box = (x0, y0)
+        if alpha < 1:
+            layer = layer.copy() if layer is image else layer
+            layer.putalpha(layer.getchannel("A").point([round(i * alpha) for i in range(256)]))
+        self.image.alpha_composite(layer, box)
+
+    # -- object types -----------------------------------------------------
+
+    def draw_shape(self, obj, matrix, alpha):
+        shape = fabric.outline(obj, matrix)
+        if shape is None:
+            return
+        points, closed = shape
+        device = fabric.apply(matrix, points)
+        stroke = obj.get("stroke")
+        stroke_width = float(obj.get("strokeWidth") or 0) if stroke else 0.0
+        if stroke_width:
+            stroke_width *= fabric.linear_scale(self.view if obj.get("strokeUniform") else matrix)
+        box = self._clip_box(device, stroke_width / 2 + 1)
+        if box is None:
+            return
+        ss = self.antialias
+        x0, y0, x1, y1 = box
+        size = ((x1 - x0) * ss, (y1 - y0) * ss)
+        local = [((x - x0) * ss, (y - y0) * ss) for x, y in device]
+        fill = obj.get("fill")
+        if closed and fill:
+            mask = Image.new("L", size, 0)
+            ImageDraw.Draw(mask).polygon(local, fill=255)
+            self._paint_layer(fill, mask.reduce(ss) if ss > 1 else mask, box, obj, matrix, alpha)
+        if stroke_width > 0:
+            mask = Image.new("L", size, 0)
+            path = local + local[:2] if closed else local
+            joint = "curve" if len(local) <= 8 else None
+            ImageDraw.Draw(mask).line(path, fill=255, width=max(1, round(stroke_width * ss)), joint=joint)
+            self._paint_layer(stroke, mask.reduce(ss) if ss > 1 else mask, box, obj, matrix, alpha)
+
+    def draw_text(self, obj, matrix, alpha, size):
+        width, height = size
+        fill, stroke = obj.get("fill"), obj.get("stroke")
+        if not fill and not stroke:
+            return
+        k = max(math.hypot(matrix[0], matrix[1]), math.hypot(matrix[2], matrix[3]))
+        if k <= 0:
+            return
+        font_size = float(obj.get("fontSize") or 40)
+        font = self._font(obj, font_size * k)
+        spacing = float(obj.get("charSpacing") or 0) * font_size / 1000
+        stroke_px = round(float(obj.get("strokeWidth") or 0) * k) if stroke else 0
+        pad = math.ceil(font_size * k * 0.5) + stroke_px + 2
+        canvas_size = (math.ceil(width * k) + 2 * pad, math.ceil(height * k) + 2 * pad)
+        mask = Image.new("L", canvas_size, 0)
+        stroke_mask = Image.new("L", canvas_size, 0) if stroke_px else None
+        align = obj.get("textAlign") or "left"
+        thickness = max(1, round(font_size * k / 15))
+        for line, base in zip(fabric.text_lines(obj), fabric.baseline_offsets(obj, height)):
+            line_width = self.line_width(obj, line)
+            offset = {"center": (width - line_width) / 2, "right": width - line_width}.get(align, 0.0)
+            x = pad + offset * k
+            y = pad + (base + height / 2) * k
+            for target, extra in ((mask, {}), (stroke_mask, {"stroke_width": stroke_px, "stroke_fill": 255})):
+                if target is None:
+                    continue
+                draw = ImageDraw.Draw(target)
+                if spacing:
+                    cx = x
+                    for ch in line:
+                        draw.text((cx, y), ch, font=font, fill=255, anchor="ls", **extra)
+                        cx += font.getlength(ch) + spacing * k
+                else:
+                    draw.text((x, y), line, font=font, fill=255, anchor="ls", **extra)
+            for decoration, offset_em in fabric.DECORATION_OFFSETS.items():
+                if obj.get(decoration) and line:
+                    dy = y + offset_em * font_size * k
+                    ImageDraw.Draw(mask).rectangle(
+                        (x, dy - thickness / 2, x + line_width * k, dy + thickness / 2), fill=255)
+        to_local = fabric.multiply(fabric.translate(-width / 2, -height / 2),
+                                   fabric.multiply(fabric.scale(1 / k), fabric.translate(-pad, -pad)))
+        device = fabric.multiply(matrix, to_local)
+        if stroke_mask is not None:
+            # Pillow strokes grow outwards from the glyph; keep only the ring.
+            stroke_mask = ImageChops.subtract(stroke_mask, mask)
+        for paint, layer_mask in ((fill, mask), (stroke, stroke_mask)):
+            rgba = parse_color(paint) if isinstance(paint, str) else None
+            if rgba is None or layer_mask is None:
+                continue
+            layer = Image.new("RGBA", canvas_size, rgba[:3] + (0,))
+            if rgba[3] < 255:
+                layer_mask = layer_mask.point([round(i * rgba[3] / 255) for i in range(256)])
+            layer.putalpha(layer_mask)
+            self.composite_image(layer, device, alpha)
+
+    def draw_image(self, obj, matrix, alpha, size):
+        src = obj.get("src")
+        if not src:
+            return
+        image = _prepared_image(src, json.dumps(obj.get("filters") or [], sort_keys=True), self.image_loader)
+        width, height = size
+        crop_x, crop_y = float(obj.get("cropX") or 0), float(obj.get("cropY") or 0)
+        if crop_x or crop_y or (width, height) != image.size:
+            image = image.crop((round(crop_x), round(crop_y), round(crop_x + width), round(crop_y + height)))
+        # Pre-shrink big sources so the affine resample does not alias.
+        factor = int(1 / max(fabric.linear_scale(matrix), 1e-6))
+        if factor >= 2:
+            image = image.reduce(factor)
+        to_local = fabric.multiply(fabric.translate(-width / 2, -height / 2),
+                                   fabric.scale(width / image.size[0], height / image.size[1]))
+        self.composite_image(image, fabric.multiply(matrix, to_local), alpha)
+
+    def draw(self, objects):
+        for obj, matrix, alpha, size in fabric.walk(objects, self.view, 1.0, self.measure):
+            if alpha <= 0:
+                continue
+            kind = obj.get("type")
+            if fabric.is_text(obj):
+                self.draw_text(obj, matrix, alpha, size)
+            elif kind == "image":
+                self.draw_image(obj, matrix, alpha, size)
+            else:
+                self.draw_shape(obj, matrix, alpha)
+
+
+def render_design(design, width, height, bleed=0, *, scale=1.0, include_bleed=True,
+                  antialias=2, image_loader=None):
+    """Render canvas JSON to an RGBA image.
+
+    ``width``/``height`` are the trim size in canvas pixels (the sidebar's
+    ``pixels_w``/``pixels_h``) and ``bleed`` the margin the editor adds on
+    every side.  With ``include_bleed=False`` only the trim area is returned.
+    ``scale`` resamples the output, e.g. for previews; ``antialias`` is the
+    supersampling factor used for shape edges.  ``image_loader`` resolves other
+    image ``src`` values; without one only data URLs are accepted.
+    """
+    canvas_json, _metadata = load_design(design)
+    offset = 0 if include_bleed else bleed
+    out_w = width + (2 * bleed if include_bleed else 0)
+    out_h = height + (2 * bleed if include_bleed else 0)
+    size = (max(1, round(out_w * scale)), max(1, round(out_h * scale)))
+    view = fabric.multiply(fabric.scale(scale), fabric.translate(-offset, -offset))
+
+    renderer = _Renderer(size, view, antialias, image_loader)
+    background = canvas_json.get("background")
+    renderer.image = Image.new("RGBA", size, (parse_color(background) if isinstance(background, str) else None)
+                               or (0, 0, 0, 0))
+    if isinstance(canvas_json.get("backgroundImage"), dict):
+        renderer.draw([canvas_json["backgroundImage"]])
+    renderer.draw(canvas_json.get("objects"))
+    if isinstance(canvas_json.get("overlayImage"), dict):
+        renderer.draw([canvas_json["overlayImage"]])
+    return renderer.image
@@ -0,0 +1,362 @@
+"""SVG export of Fabric.js canvas JSON, written in a single streaming pass.
+
+Each object becomes one SVG element in its local (centre-origin) space
+with its Fabric matrix as the ``transform``, and groups become ``<g>``
+elements, so the file keeps the design's structure.  Text stays live text
+in the design's font family.  Nothing is rasterized: images are referenced
+by URL, inlined as data URLs or handed to an ``assets`` callable that
+stores them and returns the URL to use (:meth:`AssetStore.put
+<card_designer.assets.AssetStore.put>` fits), so a background shared by
+thousands of batch cards is written once.
+
+With ``minify`` (the default) numbers are rounded to ``precision``
+decimals of a canvas pixel, which is itself a print pixel, and no
+whitespace separates elements.
+"""
+import base64
+import io
+import json
+import math
+from functools import lru_cache
+from typing import NamedTuple
+
+from PIL import Image
+
+from . import fabric
+from .colors import parse_color
+from .fonts import is_bold, is_italic
+from .render import _prepared_image, load_design, load_image_source
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+XLINK_NAMESPACE = "http://www.w3.org/1999/xlink"
+IMAGE_JPEG_QUALITY = 95
+_ANCHORS = {"center": "middle", "right": "end"}
+_DECORATIONS = (("underline", "underline"), ("linethrough", "line-through"), ("overline", "overline"))
+_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
+
+class ImageAsset(NamedTuple):
+    data: bytes
+    mime: str
+    size: tuple
+
+
+@lru_cache(maxsize=8)
+def _image_asset(src, filters_key, loader):
+    """Encoded bytes of an image ``src`` after its filters, memoized across cards."""
+    filters = json.loads(filters_key)
+    if not filters and src.startswith("data:") and ";base64," in src:
+        header, _, payload = src.partition(",")
+        data = base64.b64decode(payload)
+        return ImageAsset(data, header[len("data:"):].split(";")[0], Image.open(io.BytesIO(data)).size)
+    if not filters:
+        image = (loader or load_image_source)(src)
+        filename = getattr(image, "filename", None)
+        if filename and image.format in Image.MIME:
+            with open(filename, "rb") as fp:
+                return ImageAsset(fp.read(), Image.MIME[image.format], image.size)
+    image = _prepared_image(src, filters_key, loader)
+    buffer = io.BytesIO()
+    if image.getextrema()[3][0] == 255:
+        image.convert("RGB").save(buffer, "JPEG", quality=IMAGE_JPEG_QUALITY)
+        return ImageAsset(buffer.getvalue(), "image/jpeg", image.size)
+    image.save(buffer, "PNG")
+    return ImageAsset(buffer.getvalue(), "image/png", image.size)
+
+
+def _escape(text):
+    return str(text).translate(_ESCAPES)
+
+
+class SvgWriter:
+    """Write Fabric objects as SVG elements to the binary file object ``fp``."""
+
+    def __init__(self, fp, *, image_loader=None, assets=None, minify=True, precision=2):
+        self.fp = fp
+        self.image_loader = image_loader
+        self.assets = assets
+        self.minify = minify
+        self.precision = precision
+        self._ids = 0
+        self._hrefs = {}
+
+    def write(self, text):
+        self.fp.write(text.encode("utf-8"))
+
+    # -- formatting -------------------------------------------------------
+
+    def number(self, value):
+        digits = self.precision if self.minify else 8
+        text = f"{float(value):.{digits}f}".rstrip("0").rstrip(".")
+        if text in ("", "-0"):
+            return "0"
+        if self.minify and text.startswith(("0.", "-0.")):
+            text = text.replace("0.", ".", 1)
+        return text
+
+    def numbers(self, values):
+        return " ".join(self.number(v) for v in values)
+
+    def transform(self, m):
+        if m == fabric.IDENTITY:
+            return None
+        if m[:4] == fabric.IDENTITY[:4]:
+            return f"translate({self.numbers(m[4:])})"
+        return f"matrix({self.numbers(m)})"
+
+    def color(self, rgba):
+        r, g, b = rgba[:3]
+        if self.minify and r % 17 == g % 17 == b % 17 == 0:
+            return f"#{r // 17:x}{g // 17:x}{b // 17:x}"
+        return f"#{r:02x}{g:02x}{b:02x}"
+
+    def tag(self, name, attrs, content=None, close=True):
+        parts = [f"<{name}"]
+        parts.extend(f' {key}="{_escape(value)}"' for key, value in attrs if value is not None)
+        if content is not None:
+            parts.append(f">{content}</{name}>")
+        else:
+            parts.append("/>" if close else ">")
+        if not self.minify:
+            parts.append("\n")
+        self.write("".join(parts))
+
+    def end(self, name):
+        self.write(f"</{name}>" if self.minify else f"</{name}>\n")
+
+    # -- paint ------------------------------------------------------------
+
+    def _color_attrs(self, name, value, alpha):
+        rgba = parse_color(value) if isinstance(value, str) else None
+        if rgba is None or not rgba[3]:
+            return [(name, "none")]
+        attrs = [(name, self.color(rgba))]
+        opacity = alpha * rgba[3] / 255
+        if opacity < 1:
+            attrs.append((name.replace("-color", "") + "-opacity", self.number(opacity)))
+        return attrs
+
+    def _gradient(self, gradient, obj, alpha):
+        stops = sorted(gradient.get("colorStops") or (), key=lambda s: float(s.get("offset", 0)))
+        if not stops:
+            return None
+        self._ids += 1
+        gradient_id = f"g{self._ids}"
+        w, h = fabric.object_size(obj)
+        m = fabric.translate(-w / 2 + float(gradient.get("offsetX") or 0),
+                             -h / 2 + float(gradient.get("offsetY") or 0))
+        if gradient.get("gradientUnits") == "percentage":
+            m = fabric.multiply(m, fabric.scale(w, h))
+        if gradient.get("gradientTransform"):
+            m = fabric.multiply(m, tuple(float(v) for v in gradient["gradientTransform"]))
+        c = {k: float(v or 0) for k, v in (gradient.get("coords") or {}).items()}
+        positions = [min(1.0, max(0.0, float(stop.get("offset", 0)))) for stop in stops]
+        attrs = [("id", gradient_id), ("gradientUnits", "userSpaceOnUse")]
+        if gradient.get("type") == "radial":
+            kind = "radialGradient"
+            # SVG 1.1 has no focal radius; fold the inner radius into the stops.
+            r1, r2 = c.get("r1", 0.0), c.get("r2", 0.0)
+            inner = r1 / r2 if r2 else 0.0
+            positions = [inner + p * (1 - inner) for p in positions]
+            attrs += [("cx", self.number(c.get("x2", 0.0))), ("cy", self.number(c.get("y2", 0.0))),
+                      ("r", self.number(r2)), ("fx", self.number(c.get("x1", 0.0))),
+                      ("fy", self.number(c.get("y1", 0.0)))]
+        else:
+            kind = "linearGradient"
+            attrs += [(key, self.number(c.get(key, 0.0))) for key in ("x1", "y1", "x2", "y2")]
+        attrs.append(("gradientTransform", self.transform(m)))
+        self.write("<defs>")
+        self.tag(kind, attrs, close=False)
+        for stop, position in zip(stops, positions):
+            paint = self._color_attrs("stop-color", stop.get("color"), alpha)
+            self.tag("stop", [("offset", self.number(position))] + paint)
+        self.end(kind)
+        self.write("</defs>")
+        return gradient_id
+
+    def _paint_attrs(self, obj, matrix, alpha, fill=True):
+        value = obj.get("fill")
+        if not fill:
+            attrs = [("fill", "none")]
+        elif isinstance(value, dict):
+            gradient_id = self._gradient(value, obj, alpha)
+            attrs = [("fill", f"url(#{gradient_id})" if gradient_id else "none")]
+        else:
+            attrs = self._color_attrs("fill", value, alpha)
+        width = float(obj.get("strokeWidth") or 0)
+        if width and obj.get("strokeUniform"):
+            width /= max(fabric.linear_scale(matrix), 1e-9)
+        stroke = self._color_attrs("stroke", obj.get("stroke"), alpha)
+        if not width or stroke[0][1] == "none":
+            return attrs
+        attrs += stroke
+        attrs.append(("stroke-width", self.number(width)))
+        if obj.get("strokeLineCap") in ("round", "square"):
+            attrs.append(("stroke-linecap", obj["strokeLineCap"]))
+        if obj.get("strokeLineJoin") in ("round", "bevel"):
+            attrs.append(("stroke-linejoin", obj["strokeLineJoin"]))
+        if float(obj.get("strokeMiterLimit") or 4) != 4:
+            attrs.append(("stroke-miterlimit", self.number(obj["strokeMiterLimit"])))
+        if obj.get("strokeDashArray"):
+            attrs.append(("stroke-dasharray", self.numbers(obj["strokeDashArray"])))
+            if obj.get("strokeDashOffset"):
+                attrs.append(("stroke-dashoffset", self.number(obj["strokeDashOffset"])))
+        return attrs
+
+    # -- object types -----------------------------------------------------
+
+    def write_shape(self, obj, own, matrix, alpha):
+        kind = obj.get("type")
+        w, h = fabric.object_size(obj)
+        transform = ("transform", self.transform(own))
+        if kind == "rect":
+            rx, ry = float(obj.get("rx") or 0), float(obj.get("ry") or 0)
+            geometry = [("x", self.number(-w / 2)), ("y", self.number(-h / 2)),
+                        ("width", self.number(w)), ("height", self.number(h)),
+                        ("rx", self.number(rx) if rx else None), ("ry", self.number(ry) if ry else None)]
+            self.tag("rect", [transform] + geometry + self._paint_attrs(obj, matrix, alpha))
+        elif kind == "ellipse":
+            geometry = [("rx", self.number(obj.get("rx") or 0)), ("ry", self.number(obj.get("ry") or 0))]
+            self.tag("ellipse", [transform] + geometry + self._paint_attrs(obj, matrix, alpha))
+        elif kind == "circle":
+            r = float(obj.get("radius") or 0)
+            start = float(obj.get("startAngle") or 0)
+            end = float(obj.get("endAngle", 360) if obj.get("endAngle") is not None else 360)
+            if end - start >= 360:
+                self.tag("circle", [transform, ("r", self.number(r))] + self._paint_attrs(obj, matrix, alpha))
+            else:
+                a0, a1 = math.radians(start), math.radians(end)
+                d = (f"M{self.numbers((r * math.cos(a0), r * math.sin(a0)))}A{self.numbers((r, r))} 0 "
+                     f"{int(end - start > 180)} 1 {self.numbers((r * math.cos(a1), r * math.sin(a1)))}")
+                self.tag("path", [transform, ("d", d)] + self._paint_attrs(obj, matrix, alpha))
+        else:
+            shape = fabric.outline(obj, matrix)
+            if shape is None:
+                return
+            points, closed = shape
+            if kind == "line":
+                geometry = [(key, self.number(v)) for key, v in zip(("x1", "y1", "x2", "y2"), points[0] + points[1])]
+                self.tag("line", [transform] + geometry + self._paint_attrs(obj, matrix, alpha, fill=False))
+                return
+            coords = self.numbers(v for point in points for v in point)
+            self.tag("polygon" if closed else "polyline",
+                     [transform, ("points", coords)] + self._paint_attrs(obj, matrix, alpha, fill=closed))
+
+    def write_text(self, obj, own, matrix, alpha, size):
+        width, height = size
+        font_size = float(obj.get("fontSize") or 40)
+        spacing = float(obj.get("charSpacing") or 0) * font_size / 1000
+        align = obj.get("textAlign") or "left"
+        x = {"center": 0.0, "right": width / 2}.get(align, -width / 2)
+        decorations = " ".join(name for key, name in _DECORATIONS if obj.get(key))
+        attrs = [
+            ("transform", self.transform(own)),
+            ("font-family", obj.get("fontFamily") or "Times New Roman"),
+            ("font-size", self.number(font_size)),
+            ("font-weight", "bold" if is_bold(obj.get("fontWeight")) else None),
+            ("font-style", "italic" if is_italic(obj.get("fontStyle")) else None),
+            ("letter-spacing", self.number(spacing) if spacing else None),
+            ("text-decoration", decorations or None),
+            ("text-anchor", _ANCHORS.get(align)),
+            ("xml:space", "preserve"),
+        ] + self._paint_attrs(obj, matrix, alpha)
+        lines = "".join(f'<tspan x="{self.number(x)}" y="{self.number(base)}">{_escape(line)}</tspan>'
+                        for line, base in zip(fabric.text_lines(obj), fabric.baseline_offsets(obj, height)))
+        self.tag("text", attrs, lines)
+
+    def _image(self, obj):
+        filters_key = json.dumps(obj.get("filters") or [], sort_keys=True)
+        return _image_asset(obj["src"], filters_key, self.image_loader)
+
+    def href(self, obj):
+        """URL for an image object's pixels, embedding or externalizing them as configured."""
+        src = obj["src"]
+        filters = obj.get("filters") or []
+        key = (src, json.dumps(filters, sort_keys=True))
+        if key not in self._hrefs:
+            if self.assets is None and not filters and (src.startswith("data:") or self.image_loader is None):
+                self._hrefs[key] = src
+            else:
+                asset = self._image(obj)
+                if self.assets is not None:
+                    self._hrefs[key] = self.assets(asset.data, asset.mime)
+                else:
+                    self._hrefs[key] = f"data:{asset.mime};base64,{base64.b64encode(asset.data).decode('ascii')}"
+        return self._hrefs[key]
+
+    def write_image(self, obj, own, alpha, size):
+        if not obj.get("src"):
+            return
+        width, height = size
+        crop = (float(obj.get("cropX") or 0), float(obj.get("cropY") or 0))
+        box = [("x", self.number(-width / 2)), ("y", self.number(-height / 2)),
+               ("width", self.number(width)), ("height", self.number(height))]
+        common = [("opacity", self.number(alpha) if alpha < 1 else None), ("xlink:href", self.href(obj))]
+        if crop == (0, 0):
+            self.tag("image", [("transform", self.transform(own))] + box
+                     + [("preserveAspectRatio", "none")] + common)
+            return
+        # A nested viewport shows the cropped region of the full image.
+        natural_w, natural_h = self._image(obj).size
+        self.tag("svg", [("transform", self.transform(own))] + box
+                 + [("viewBox", self.numbers(crop + (width, height)))], close=False)
+        self.tag("image", [("width", self.number(natural_w)), ("height", self.number(natural_h))] + common)
+        self.end("svg")
+
+    def write_objects(self, objects, matrix=fabric.IDENTITY, opacity=1.0):
+        """Write ``objects`` whose parent space maps to the document through ``matrix``."""
+        for obj in objects or ():
+            if obj.get("visible") is False:
+                continue
+            size = fabric.object_size(obj)
+            own = fabric.own_matrix(obj, size)
+            m = fabric.multiply(matrix, own)
+            alpha = opacity * float(obj.get("opacity", 1) if obj.get("opacity") is not None else 1)
+            if obj.get("type") == "group":
+                # Opacity is applied per child, as Fabric does, not to the composited group.
+                self.tag("g", [("transform", self.transform(own))], close=False)
+                self.write_objects(obj.get("objects"), m, alpha)
+                self.end("g")
+            elif alpha <= 0:
+                continue
+            elif fabric.is_text(obj):
+                self.write_text(obj, own, m, alpha, size)
+            elif obj.get("type") == "image":
+                self.write_image(obj, own, alpha, size)
+            else:
+                self.write_shape(obj, own, m, alpha)
+
+    def write_design(self, canvas_json, width, height, bleed=0, *, dpi=300, include_bleed=True):
+        """Write a complete SVG document for one card, sized in inches."""
+        offset = 0 if include_bleed else bleed
+        out_w = width + (2 * bleed if include_bleed else 0)
+        out_h = height + (2 * bleed if include_bleed else 0)
+        self.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.tag("svg", [("xmlns", SVG_NAMESPACE), ("xmlns:xlink", XLINK_NAMESPACE), ("version", "1.1"),
+                         ("width", f"{out_w / dpi:g}in"), ("height", f"{out_h / dpi:g}in"),
+                         ("viewBox", self.numbers((offset, offset, out_w, out_h)))], close=False)
+        background = canvas_json.get("background")
+        if isinstance(background, str) and (parse_color(background) or (0, 0, 0, 0))[3]:
+            self.tag("rect", [("x", self.number(offset)), ("y", self.number(offset)), ("width", self.number(out_w)),
+                              ("height", self.number(out_h))] + self._color_attrs("fill", background, 1.0))
+        if isinstance(canvas_json.get("backgroundImage"), dict):
+            self.write_objects([canvas_json["backgroundImage"]])
+        self.write_objects(canvas_json.get("objects"))
+        if isinstance(canvas_json.get("overlayImage"), dict):
+            self.write_objects([canvas_json["overlayImage"]])
+        self.end("svg")
+
+
+def export_svg(design, fp, width, height, bleed=0, *, dpi=300, include_bleed=True, image_loader=None,
+               assets=None, minify=True, precision=2):
+    """Write ``design`` to the binary file object ``fp`` as an SVG document.
+
+    Sizes are canvas pixels as for :func:`~card_designer.render.render_design`.
+    Images that are not data URLs are embedded when an ``image_loader`` is
+    given (so the file stands alone) and referenced by ``src`` otherwise;
+    with ``assets`` every image is stored through ``assets(data, mime)`` and
+    referenced by the URL it returns.
+    """
+    canvas_json, _metadata = load_design(design)
+    writer = SvgWriter(fp, image_loader=image_loader, assets=assets, minify=minify, precision=precision)
+    writer.write_design(canvas_json, width, height, bleed, dpi=dpi, include_bleed=include_bleed)
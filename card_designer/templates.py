@@ -0,0 +1,37 @@
+"""Built-in design templates offered in the editor's Templates tab."""
+
+# Default text the editor inserts, mapped to the CSV column that replaces it.
+DEFAULT_PLACEHOLDERS = {
+    "Your Name": "name",
+    "Your Title": "title",
+    "email@company.com": "email",
+    "(555) 123-4567": "phone",
+    "Your Company Name": "company",
+}
+
+TEMPLATE_CONFIGS = {
+    "Corporate Clean": {
+        "bg_color": "#f8f9fa",
+        "primary_color": "#2c3e50",
+        "accent_color": "#3498db",
+        "font": "Arial"
+    },
+    "Creative Gradient": {
+        "bg_gradient": "linear-gradient(135deg, #667eea 0%, #764ba2 100%)",
+        "primary_color": "#ffffff",
+        "accent_color": "#f093fb",
+        "font": "Helvetica"
+    },
+    "Minimal Modern": {
+        "bg_color": "#ffffff",
+        "primary_color": "#333333",
+        "accent_color": "#000000",
+        "font": "Helvetica"
+    },
+    "Professional Dark": {
+        "bg_color": "#2c3e50",
+        "primary_color": "#ecf0f1",
+        "accent_color": "#e74c3c",
+        "font": "Georgia"
+    }
+}
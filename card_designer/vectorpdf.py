@@ -0,0 +1,364 @@
+"""Vector PDF export of Fabric.js canvas JSON with ReportLab.
+
+Shapes become PDF paths and text is set in embedded (subset) TrueType
+fonts, so the print vendor gets resolution-independent artwork.  Only
+raster images, typically the background photo, are embedded as images, and
+ReportLab stores identical images once per document.  Pages carry a
+``TrimBox`` at the card edge and a ``BleedBox`` around the bleed margin.
+
+Canvas units are print pixels at the design DPI; each object is drawn in
+its own local space through its Fabric matrix, with the page transform
+mapping canvas pixels to points and flipping y.
+"""
+import io
+import json
+import pathlib
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.lib.colors import CMYKColor, Color
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen.canvas import Canvas
+
+from . import fabric
+from .cmyk import rgb_to_cmyk, to_cmyk
+from .colors import parse_color
+from .fonts import is_bold, is_italic, resolve_font
+from .render import _prepared_image, load_design
+
+POINTS_PER_INCH = 72
+IMAGE_JPEG_QUALITY = 95
+# Bezier control distance for a quarter ellipse.
+KAPPA = 0.5522847498
+_STANDARD_FONTS = {
+    (False, False): "Helvetica", (True, False): "Helvetica-Bold",
+    (False, True): "Helvetica-Oblique", (True, True): "Helvetica-BoldOblique",
+}
+_LINE_CAPS = {"butt": 0, "round": 1, "square": 2}
+_LINE_JOINS = {"miter": 0, "round": 1, "bevel": 2}
+
+_registered_fonts = {}
+
+
+def pdf_font(family, bold=False, italic=False):
+    """Register the TrueType file for a family with ReportLab; returns its name.
+
+    Falls back to the standard Helvetica faces when no usable TrueType file
+    is installed (ReportLab cannot embed CFF-flavoured OpenType fonts).
+    """
+    path = resolve_font(family, bold, italic)
+    if path is None:
+        return _STANDARD_FONTS[bold, italic]
+    if path not in _registered_fonts:
+        name = "CD-" + pathlib.Path(path).stem
+        try:
+            pdfmetrics.registerFont(TTFont(name, path))
+        except TTFError:
+            name = _STANDARD_FONTS[bold, italic]
+        _registered_fonts[path] = name
+    return _registered_fonts[path]
+
+
+def pdf_color(value, alpha=1.0, color="rgb"):
+    """ReportLab colour for a Fabric colour string, or ``None`` for no paint.
+
+    With ``color="cmyk"`` the result is a :class:`CMYKColor` converted by
+    :func:`~card_designer.cmyk.rgb_to_cmyk`, which memoizes each swatch.
+    """
+    rgba = parse_color(value) if isinstance(value, str) else None
+    if rgba is None:
+        return None
+    r, g, b, a = rgba
+    if color == "cmyk":
+        return CMYKColor(*rgb_to_cmyk((r, g, b)), alpha=alpha * a / 255)
+    return Color(r / 255, g / 255, b / 255, alpha=alpha * a / 255)
+
+
+def _ellipse_path(path, cx, cy, rx, ry):
+    kx, ky = rx * KAPPA, ry * KAPPA
+    path.moveTo(cx + rx, cy)
+    path.curveTo(cx + rx, cy + ky, cx + kx, cy + ry, cx, cy + ry)
+    path.curveTo(cx - kx, cy + ry, cx - rx, cy + ky, cx - rx, cy)
+    path.curveTo(cx - rx, cy - ky, cx - kx, cy - ry, cx, cy - ry)
+    path.curveTo(cx + kx, cy - ry, cx + rx, cy - ky, cx + rx, cy)
+    path.close()
+
+
+def _rect_path(path, w, h, rx, ry):
+    rx, ry = min(rx or ry, w / 2), min(ry or rx, h / 2)
+    x0, y0, x1, y1 = -w / 2, -h / 2, w / 2, h / 2
+    if rx <= 0 or ry <= 0:
+        path.rect(x0, y0, w, h)
+        return
+    kx, ky = rx * KAPPA, ry * KAPPA
+    path.moveTo(x0 + rx, y0)
+    path.lineTo(x1 - rx, y0)
+    path.curveTo(x1 - rx + kx, y0, x1, y0 + ry - ky, x1, y0 + ry)
+    path.lineTo(x1, y1 - ry)
+    path.curveTo(x1, y1 - ry + ky, x1 - rx + kx, y1, x1 - rx, y1)
+    path.lineTo(x0 + rx, y1)
+    path.curveTo(x0 + rx - kx, y1, x0, y1 - ry + ky, x0, y1 - ry)
+    path.lineTo(x0, y0 + ry)
+    path.curveTo(x0, y0 + ry - ky, x0 + rx - kx, y0, x0 + rx, y0)
+    path.close()
+
+
+class PdfPainter:
+    """Draw Fabric objects onto one ReportLab page."""
+
+    def __init__(self, pdf, image_loader, color="rgb"):
+        self.pdf = pdf
+        self.image_loader = image_loader
+        self.color = color
+        self._images = {}
+
+    # -- text metrics -----------------------------------------------------
+
+    def _font(self, obj):
+        return pdf_font(obj.get("fontFamily") or "Times New Roman",
+                        is_bold(obj.get("fontWeight")), is_italic(obj.get("fontStyle")))
+
+    def line_width(self, obj, line):
+        font_size = float(obj.get("fontSize") or 40)
+        width = pdfmetrics.stringWidth(line, self._font(obj), font_size)
+        spacing = float(obj.get("charSpacing") or 0) * font_size / 1000
+        if spacing and len(line) > 1:
+            width += spacing * (len(line) - 1)
+        return width
+
+    def measure(self, obj):
+        height = fabric.text_height(obj)
+        if obj.get("type") == "textbox":
+            return float(obj.get("width") or 0), height
+        return max(self.line_width(obj, line) for line in fabric.text_lines(obj)), height
+
+    # -- paint ------------------------------------------------------------
+
+    def _stroke_width(self, obj, matrix):
+        width = float(obj.get("strokeWidth") or 0)
+        if width and obj.get("strokeUniform"):
+            width /= max(fabric.linear_scale(matrix), 1e-9)
+        return width
+
+    def _set_stroke(self, obj, matrix, alpha):
+        color = pdf_color(obj.get("stroke"), alpha, self.color)
+        width = self._stroke_width(obj, matrix) if color else 0
+        if not width:
+            return False
+        pdf = self.pdf
+        pdf.setStrokeColor(color)
+        pdf.setLineWidth(width)
+        pdf.setLineCap(_LINE_CAPS.get(obj.get("strokeLineCap"), 0))
+        pdf.setLineJoin(_LINE_JOINS.get(obj.get("strokeLineJoin"), 0))
+        pdf.setMiterLimit(float(obj.get("strokeMiterLimit") or 4))
+        dashes = obj.get("strokeDashArray")
+        if dashes:
+            pdf.setDash([float(d) for d in dashes], float(obj.get("strokeDashOffset") or 0))
+        return True
+
+    def _gradient(self, gradient, obj, path, alpha):
+        stops = sorted(gradient.get("colorStops") or (), key=lambda s: float(s.get("offset", 0)))
+        colors = [pdf_color(stop.get("color"), alpha, self.color) for stop in stops]
+        if not stops or None in colors:
+            return
+        positions = [min(1.0, max(0.0, float(stop.get("offset", 0)))) for stop in stops]
+        w, h = fabric.object_size(obj)
+        pdf = self.pdf
+        pdf.saveState()
+        pdf.clipPath(path, stroke=0, fill=0)
+        pdf.transform(*fabric.translate(-w / 2 + float(gradient.get("offsetX") or 0),
+                                        -h / 2 + float(gradient.get("offsetY") or 0)))
+        if gradient.get("gradientUnits") == "percentage":
+            pdf.scale(w, h)
+        if gradient.get("gradientTransform"):
+            pdf.transform(*gradient["gradientTransform"])
+        c = {k: float(v or 0) for k, v in (gradient.get("coords") or {}).items()}
+        if gradient.get("type") == "radial":
+            # PDF radial shadings in ReportLab have one circle; fold the
+            # inner radius into the stop positions instead.
+            r1, r2 = c.get("r1", 0.0), c.get("r2", 0.0)
+            inner = r1 / r2 if r2 else 0.0
+            positions = [inner + p * (1 - inner) for p in positions]
+            pdf.radialGradient(c.get("x2", 0.0), c.get("y2", 0.0), r2, colors, positions)
+        else:
+            pdf.linearGradient(c.get("x1", 0.0), c.get("y1", 0.0), c.get("x2", 0.0), c.get("y2", 0.0),
+                               colors, positions)
+        pdf.restoreState()
+
+    # -- object types -----------------------------------------------------
+
+    def draw_shape(self, obj, matrix, alpha):
+        kind = obj.get("type")
+        path = self.pdf.beginPath()
+        closed = True
+        w, h = fabric.object_size(obj)
+        if kind == "rect":
+            _rect_path(path, w, h, float(obj.get("rx") or 0), float(obj.get("ry") or 0))
+        elif kind == "ellipse":
+            _ellipse_path(path, 0, 0, float(obj.get("rx") or 0), float(obj.get("ry") or 0))
+        elif kind == "circle":
+            r = float(obj.get("radius") or 0)
+            start = float(obj.get("startAngle") or 0)
+            end = float(obj.get("endAngle", 360) if obj.get("endAngle") is not None else 360)
+            if end - start >= 360:
+                _ellipse_path(path, 0, 0, r, r)
+            else:
+                path.arc(-r, -r, r, r, start, end - start)
+        else:
+            shape = fabric.outline(obj, matrix)
+            if shape is None:
+                return
+            points, closed = shape
+            path.moveTo(*points[0])
+            for point in points[1:]:
+                path.lineTo(*point)
+            if closed:
+                path.close()
+        fill = obj.get("fill")
+        pdf = self.pdf
+        pdf.saveState()
+        pdf.transform(*matrix)
+        fill_color = pdf_color(fill, alpha, self.color) if closed else None
+        if closed and isinstance(fill, dict):
+            self._gradient(fill, obj, path, alpha)
+        if fill_color is not None:
+            pdf.setFillColor(fill_color)
+        stroke = self._set_stroke(obj, matrix, alpha)
+        if fill_color is not None or stroke:
+            pdf.drawPath(path, stroke=int(stroke), fill=int(fill_color is not None))
+        pdf.restoreState()
+
+    def draw_text(self, obj, matrix, alpha, size):
+        width, height = size
+        fill_color = pdf_color(obj.get("fill"), alpha, self.color)
+        pdf = self.pdf
+        pdf.saveState()
+        pdf.transform(*matrix)
+        stroke = self._set_stroke(obj, matrix, alpha)
+        if fill_color is None and not stroke:
+            pdf.restoreState()
+            return
+        if fill_color is not None:
+            pdf.setFillColor(fill_color)
+        font, font_size = self._font(obj), float(obj.get("fontSize") or 40)
+        spacing = float(obj.get("charSpacing") or 0) * font_size / 1000
+        mode = 2 if fill_color is not None and stroke else (1 if stroke else 0)
+        align = obj.get("textAlign") or "left"
+        thickness = font_size / 15
+        for line, base in zip(fabric.text_lines(obj), fabric.baseline_offsets(obj, height)):
+            line_width = self.line_width(obj, line)
+            x = -width / 2 + {"center": (width - line_width) / 2, "right": width - line_width}.get(align, 0.0)
+            if line:
+                # Local space is y-down; glyphs are set in a flipped text matrix.
+                text = pdf.beginText()
+                text.setTextOrigin(0, 0)
+                text.setTextTransform(1, 0, 0, -1, x, base)
+                text.setFont(font, font_size)
+                text.setCharSpace(spacing)
+                text.setTextRenderMode(mode)
+                text.textOut(line)
+                pdf.drawText(text)
+            if fill_color is not None:
+                for decoration, offset_em in fabric.DECORATION_OFFSETS.items():
+                    if obj.get(decoration) and line:
+                        pdf.rect(x, base + offset_em * font_size - thickness / 2, line_width, thickness,
+                                 stroke=0, fill=1)
+        pdf.restoreState()
+
+    def _image_reader(self, obj, size):
+        filters_key = json.dumps(obj.get("filters") or [], sort_keys=True)
+        width, height = size
+        crop = (round(float(obj.get("cropX") or 0)), round(float(obj.get("cropY") or 0)))
+        key = (obj.get("src"), filters_key, crop, size)
+        if key not in self._images:
+            image = _prepared_image(obj["src"], filters_key, self.image_loader)
+            if crop != (0, 0) or (width, height) != image.size:
+                image = image.crop((crop[0], crop[1], crop[0] + round(width), crop[1] + round(height)))
+            buffer = io.BytesIO()
+            if image.getextrema()[3][0] == 255:
+                # Opaque photos are embedded as JPEG rather than Flate-compressed samples.
+                opaque = to_cmyk(image) if self.color == "cmyk" else image.convert("RGB")
+                opaque.save(buffer, "JPEG", quality=IMAGE_JPEG_QUALITY)
+            else:
+                image.save(buffer, "PNG")
+            buffer.seek(0)
+            self._images[key] = ImageReader(buffer)
+        return self._images[key]
+
+    def draw_image(self, obj, matrix, alpha, size):
+        if not obj.get("src"):
+            return
+        width, height = size
+        reader = self._image_reader(obj, size)
+        pdf = self.pdf
+        pdf.saveState()
+        pdf.transform(*matrix)
+        pdf.setFillAlpha(alpha)
+        # Images are drawn y-up from their bottom-left corner.
+        pdf.transform(1, 0, 0, -1, -width / 2, height / 2)
+        pdf.drawImage(reader, 0, 0, width, height, mask="auto")
+        pdf.restoreState()
+
+    def draw(self, objects, view):
+        for obj, matrix, alpha, size in fabric.walk(objects, view, 1.0, self.measure):
+            if alpha <= 0:
+                continue
+            if fabric.is_text(obj):
+                self.draw_text(obj, matrix, alpha, size)
+            elif obj.get("type") == "image":
+                self.draw_image(obj, matrix, alpha, size)
+            else:
+                self.draw_shape(obj, matrix, alpha)
+
+
+def draw_design(pdf, painter, canvas_json, width, height, bleed, origin, points_per_pixel, *,
+                include_bleed=True):
+    """Draw one design with its trim box's top-left corner at ``origin`` (points, PDF space)."""
+    offset = 0 if include_bleed else bleed
+    out_w = width + (2 * bleed if include_bleed else 0)
+    out_h = height + (2 * bleed if include_bleed else 0)
+    k = points_per_pixel
+    x0, y0 = origin[0] - (bleed - offset) * k, origin[1] + (bleed - offset) * k
+    pdf.saveState()
+    clip = pdf.beginPath()
+    clip.rect(x0, y0 - out_h * k, out_w * k, out_h * k)
+    pdf.clipPath(clip, stroke=0, fill=0)
+    # Canvas pixels (y down) to page points (y up).
+    pdf.transform(k, 0, 0, -k, x0 - offset * k, y0 + offset * k)
+    background = pdf_color(canvas_json.get("background"), 1.0, painter.color)
+    if background is not None:
+        pdf.setFillColor(background)
+        pdf.rect(offset, offset, out_w, out_h, stroke=0, fill=1)
+    view = fabric.IDENTITY
+    if isinstance(canvas_json.get("backgroundImage"), dict):
+        painter.draw([canvas_json["backgroundImage"]], view)
+    painter.draw(canvas_json.get("objects"), view)
+    if isinstance(canvas_json.get("overlayImage"), dict):
+        painter.draw([canvas_json["overlayImage"]], view)
+    pdf.restoreState()
+
+
+def export_pdf(design, fp, width, height, bleed=0, *, dpi=300, include_bleed=True, image_loader=None,
+               title="Business Card", color="rgb"):
+    """Write ``design`` to ``fp`` as a one-page vector PDF.
+
+    ``width``/``height``/``bleed`` are canvas pixels as for
+    :func:`~card_designer.render.render_design`; ``dpi`` converts them to
+    points.  With ``include_bleed`` the page is the bleed box and the
+    ``TrimBox`` marks the cut; otherwise the page is the trim size.
+    ``color="cmyk"`` paints fills, strokes and opaque images in CMYK.
+    """
+    canvas_json, _metadata = load_design(design)
+    k = POINTS_PER_INCH / dpi
+    margin = bleed * k if include_bleed else 0.0
+    page_w, page_h = width * k + 2 * margin, height * k + 2 * margin
+    pdf = Canvas(fp, pagesize=(page_w, page_h), pageCompression=1)
+    pdf.setTitle(title)
+    pdf.setCreator("Professional Business Card Designer")
+    pdf.setBleedBox((0, 0, page_w, page_h))
+    pdf.setTrimBox((margin, margin, page_w - margin, page_h - margin))
+    painter = PdfPainter(pdf, image_loader, color)
+    draw_design(pdf, painter, canvas_json, width, height, bleed, (margin, page_h - margin), k,
+                include_bleed=include_bleed)
+    pdf.showPage()
+    pdf.save()
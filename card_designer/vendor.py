@@ -0,0 +1,72 @@
+"""Third-party scripts served with the editor component instead of a CDN.
+
+The editor iframe loads Fabric.js from the committed ``frontend/vendor``
+directory, so it starts without network access and the browser can cache
+the file across sessions (the name carries the version, so a new release
+never reuses a stale cache entry).  There is no CDN fallback.  To upgrade,
+add the new version to :data:`VENDOR_LIBRARIES`, run
+``python -m card_designer.vendor`` on a machine with network access, pin
+the printed checksum and commit the file.
+"""
+import argparse
+import hashlib
+import os
+import pathlib
+import tempfile
+import urllib.request
+from typing import NamedTuple, Optional
+
+VENDOR_DIR = pathlib.Path(__file__).parent / "frontend" / "vendor"
+
+
+class VendorLibrary(NamedTuple):
+    name: str
+    version: str
+    filename: str
+    url: str
+    sha256: Optional[str] = None
+
+
+VENDOR_LIBRARIES = (
+    VendorLibrary("fabric", "5.3.0", "fabric-5.3.0.min.js",
+                  "https://cdnjs.cloudflare.com/ajax/libs/fabric.js/5.3.0/fabric.min.js",
+                  "48f8f0915beb512fc7fe1b48c0eeb075dd0803c790efdfd75cd007f9c3eea2ca"),
+)
+
+
+def missing_libraries():
+    """Libraries whose vendored file is absent; the editor cannot start without them."""
+    return [library for library in VENDOR_LIBRARIES if not (VENDOR_DIR / library.filename).is_file()]
+
+
+def fetch(library, *, timeout=30):
+    """Download one library into :data:`VENDOR_DIR`; returns its SHA-256.
+
+    Raises ``ValueError`` if a pinned checksum does not match.
+    """
+    with urllib.request.urlopen(library.url, timeout=timeout) as response:
+        data = response.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if library.sha256 and digest != library.sha256:
+        raise ValueError(f"{library.filename}: checksum {digest} does not match pinned {library.sha256}")
+    VENDOR_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=VENDOR_DIR, suffix=".part")
+    with os.fdopen(fd, "wb") as fp:
+        fp.write(data)
+    os.replace(tmp, VENDOR_DIR / library.filename)
+    return digest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the editor's third-party scripts.")
+    parser.add_argument("--force", action="store_true", help="re-download files that already exist")
+    args = parser.parse_args(argv)
+    libraries = VENDOR_LIBRARIES if args.force else missing_libraries()
+    for library in libraries:
+        print(f"{library.filename}  sha256={fetch(library)}")
+    if not libraries:
+        print(f"All vendored libraries present in {VENDOR_DIR}")
+
+
+if __name__ == "__main__":
+    main()
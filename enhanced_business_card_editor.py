@@ -1,13 +1,58 @@
 # enhanced_business_card_editor.py
 import streamlit as st
-import base64
-from io import BytesIO
-import textwrap
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from functools import partial
 import pathlib
-import json
+import tempfile
+
+from card_designer import (DEFAULT_PLACEHOLDERS, DPI_OPTIONS, FORMAT_DIMS, ORIENTATIONS, SHEET_SIZES, TEMPLATE_CONFIGS,
+                           bleed_pixels, card_geometry, load_design, render_design)
+from card_designer.cache import DiskLRUCache, canonical_hash
+from card_designer.export import DEFAULT_PNG_COMPRESSION, output_format
+from card_designer.jobs import JobScheduler, QueueFull, export_job, merge_job
+from card_designer.component import EDITOR_TTI_TARGET_MS, canvas_json, card_canvas
+from card_designer.vendor import missing_libraries
+from card_designer.assets import AssetStore
+from card_designer.ingest import adjust_background, prepare_background
+from card_designer.instrument import ClientTelemetry, RerunProfile, new_history, set_memory_tracing, summarize
 
 st.set_page_config(page_title="Professional Business Card Designer", layout="wide", initial_sidebar_state="expanded")
 
+
+@st.cache_resource
+def get_asset_store():
+    # Served at app/static/assets via server.enableStaticServing in .streamlit/config.toml
+    return AssetStore(pathlib.Path(__file__).parent / "static" / "assets", max_bytes=256 * 1024 * 1024)
+
+
+@st.cache_resource
+def get_render_cache():
+    return DiskLRUCache(pathlib.Path(tempfile.gettempdir()) / "card_designer" / "renders", max_bytes=512 * 1024 * 1024)
+
+
+@st.cache_resource
+def get_scheduler():
+    # Pool size: CARD_DESIGNER_WORKERS, or one worker per CPU
+    return JobScheduler()
+
+
+@st.cache_resource
+def get_client_telemetry():
+    # Editor timings reported by every session's browser
+    return ClientTelemetry()
+
+
+asset_store = get_asset_store()
+render_cache = get_render_cache()
+scheduler = get_scheduler()
+client_telemetry = get_client_telemetry()
+session_id = get_script_run_ctx().session_id
+
+# Stage timings of this rerun; memory is traced only while the performance panel is open
+perf_panel = st.session_state.get("perf_panel", False)
+set_memory_tracing(perf_panel)
+profile = RerunProfile(session_id, trace_memory=perf_panel)
+
 # Custom CSS for better styling
 st.markdown("""
 <style>
@@ -50,27 +95,14 @@ with st.sidebar:
     col1, col2 = st.columns(2)
     with col1:
         card_format = st.selectbox("Card Format", 
-                                   options=["US Standard", "EU Standard", "Square", "Mini", "Jumbo"],
+                                   options=list(FORMAT_DIMS),
                                    help="Choose standard business card dimensions")
     with col2:
-        orientation = st.selectbox("Orientation", options=["Landscape", "Portrait"])
-    
-    # Define dimensions based on format
-    format_dims = {
-        "US Standard": (3.5, 2.0),
-        "EU Standard": (3.346, 2.165),
-        "Square": (2.5, 2.5),
-        "Mini": (2.75, 1.75),
-        "Jumbo": (4.25, 2.75)
-    }
-    
-    w_in, h_in = format_dims[card_format]
-    if orientation == "Portrait":
-        w_in, h_in = h_in, w_in
+        orientation = st.selectbox("Orientation", options=ORIENTATIONS)
     
     # DPI and quality settings
     dpi = st.selectbox("Print Quality (DPI)", 
-                       options=[150, 300, 600], 
+                       options=DPI_OPTIONS, 
                        index=1,
                        help="Higher DPI = better print quality but larger files")
     
@@ -78,11 +110,13 @@ with st.sidebar:
     color_profile = st.selectbox("Color Profile", 
                                  options=["RGB (Screen)", "CMYK (Print)"],
                                  help="RGB for digital use, CMYK for professional printing")
+    output_color = "cmyk" if color_profile == "CMYK (Print)" else "rgb"
     
-    pixels_w = int(w_in * dpi)
-    pixels_h = int(h_in * dpi)
+    geometry = card_geometry(card_format, orientation, dpi)
+    pixels_w, pixels_h = geometry.width, geometry.height
     
-    st.markdown(f"**Canvas:** {w_in:.2f}\" × {h_in:.2f}\" → **{pixels_w} × {pixels_h} px** @ {dpi} DPI")
+    st.markdown(f"**Canvas:** {geometry.width_in:.2f}\" × {geometry.height_in:.2f}\" → "
+                f"**{pixels_w} × {pixels_h} px** @ {dpi} DPI")
     
     st.markdown("---")
     
@@ -112,10 +146,24 @@ with st.sidebar:
                                 options=["PNG", "JPG", "PDF", "SVG"],
                                 help="Choose output format")
     
-    if export_format in ["PNG", "JPG"]:
+    export_quality = 95
+    png_compression = DEFAULT_PNG_COMPRESSION
+    if export_format == "JPG":
         export_quality = st.slider("Image Quality", 1, 100, 95)
+    elif export_format == "PNG":
+        png_compression = st.slider("PNG Compression", 0, 9, DEFAULT_PNG_COMPRESSION,
+                                    help="PNG is lossless at every level; higher levels are smaller but slower")
     
     include_bleed = st.checkbox("Include Bleed in Export", value=True)
+    
+    st.markdown("---")
+    
+    # Editor settings
+    st.markdown("### ⚙️ Editor")
+    history_budget_mb = st.number_input("Undo History Memory (MB)", min_value=1, max_value=256, value=16,
+                                        help="Oldest undo steps are dropped once history exceeds this size")
+    st.checkbox("Performance Panel", key="perf_panel",
+                help="Time each stage of a rerun and trace peak memory (tracing slows the app while on)")
 
 # Main content area with tabs
 tab1, tab2, tab3, tab4 = st.tabs(["🎨 Designer", "📷 Assets", "🎨 Styling", "📋 Templates"])
@@ -206,1199 +254,176 @@ with tab4:
                 if st.button(f"Preview {template_name}", key=f"preview_{template_name}"):
                     st.info(f"Previewing {template_name}")
 
-# Process uploaded image
-image_data_url = ""
-if uploaded is not None:
-    raw = uploaded.read()
-    b64 = base64.b64encode(raw).decode("utf-8")
-    mime = uploaded.type or "image/png"
-    image_data_url = f"data:{mime};base64,{b64}"
+    profile.mark("widgets")
+    st.markdown("### 📇 Mail Merge")
+    st.caption("Generate one card per row from a saved template. Columns replace the editor's placeholder text: "
+               + ", ".join(f'"{text}" → `{column}`' for text, column in DEFAULT_PLACEHOLDERS.items())
+               + ". Any `{{column}}` token in a text object is replaced as well.")
+    col1, col2 = st.columns(2)
+    with col1:
+        merge_template = st.file_uploader("Saved template (JSON)", type=["json"], key="merge_template")
+    with col2:
+        merge_rows = st.file_uploader("Contacts (CSV)", type=["csv"], key="merge_rows")
+    merge_output = st.radio("Output", options=["ZIP of images", "Multi-page PDF", "Press sheets (PDF)"],
+                            horizontal=True)
+    if merge_output == "Press sheets (PDF)":
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            sheet_size = st.selectbox("Sheet", options=list(SHEET_SIZES))
+        with col2:
+            sheet_cut = st.radio("Cutting", options=["Bleed per card", "Shared cut lines"],
+                                 help="Shared cut lines fit more cards (10-up on Letter) but need no edge-to-edge art")
+        with col3:
+            sheet_mode = st.radio("Artwork", options=["Auto", "Vector", "Raster"],
+                                  help="Auto draws vector sheets and switches to raster for very large merges")
+        st.caption("Without a contacts file, one sheet is filled with copies of the template.")
+    can_generate = merge_template is not None and (merge_rows is not None or merge_output == "Press sheets (PDF)")
+    if can_generate and st.button("Generate Cards", type="primary"):
+        output = "zip" if merge_output == "ZIP of images" else "pdf"
+        rows = merge_rows.getvalue() if merge_rows is not None else None
+        if merge_output == "Press sheets (PDF)":
+            options = dict(imposition=True, mode=sheet_mode.lower(), sheet=sheet_size,
+                           cut="bleed" if sheet_cut == "Bleed per card" else "shared")
+        else:
+            options = dict(output=output, include_bleed=include_bleed)
+        try:
+            job = scheduler.submit(session_id, merge_job, merge_template.getvalue(), rows,
+                                   label=f"{merge_output} @ {dpi} DPI", suffix=f".{output}", dpi=dpi,
+                                   image_format=export_format.lower(), quality=export_quality,
+                                   image_loader=asset_store.open_image, color=output_color, **options)
+        except QueueFull as exc:
+            st.error(f"Could not queue the job: {exc}")
+        else:
+            st.session_state.setdefault("jobs", []).append({
+                "job": job, "file_name": f"business-cards-{dpi}dpi.{output}",
+                "mime": "application/pdf" if output == "pdf" else "application/zip"})
 
-# Enhanced HTML/JavaScript Canvas Application
-import streamlit.components.v1 as components
+    # Jobs run in the shared worker pool; the panel polls them while any is active
+    session_jobs = st.session_state.get("jobs", [])
+    polling = any(entry["job"].active for entry in session_jobs)
 
-# Template configurations
-template_configs = {
-    "Corporate Clean": {
-        "bg_color": "#f8f9fa",
-        "primary_color": "#2c3e50",
-        "accent_color": "#3498db",
-        "font": "Arial"
-    },
-    "Creative Gradient": {
-        "bg_gradient": "linear-gradient(135deg, #667eea 0%, #764ba2 100%)",
-        "primary_color": "#ffffff",
-        "accent_color": "#f093fb",
-        "font": "Helvetica"
-    },
-    "Minimal Modern": {
-        "bg_color": "#ffffff",
-        "primary_color": "#333333",
-        "accent_color": "#000000",
-        "font": "Helvetica"
-    },
-    "Professional Dark": {
-        "bg_color": "#2c3e50",
-        "primary_color": "#ecf0f1",
-        "accent_color": "#e74c3c",
-        "font": "Georgia"
-    }
+    @st.fragment(run_every=1.0 if polling else None)
+    def show_jobs():
+        active = False
+        for entry in list(session_jobs):
+            job = entry["job"]
+            active = active or job.active
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                if job.state == "queued":
+                    st.progress(0.0, text=f"{job.label}: queued for {job.wait_seconds:.0f} s")
+                elif job.state == "running":
+                    fraction = job.done / job.total if job.total else 0.0
+                    st.progress(fraction, text=f"{job.label}: rendered {job.done} cards")
+                elif job.state == "done":
+                    st.download_button(f"📥 Download {job.result} cards ({job.label})", job.read,
+                                       file_name=entry["file_name"], mime=entry["mime"], on_click="ignore",
+                                       key=f"job-download-{job.id}")
+                elif job.state == "failed":
+                    st.error(f"{job.label} failed: {job.error}")
+                else:
+                    st.caption(f"{job.label}: cancelled")
+            with col2:
+                if st.button("Cancel" if job.active else "Dismiss", key=f"job-close-{job.id}"):
+                    scheduler.discard(job)
+                    session_jobs.remove(entry)
+                    st.rerun()
+        if polling and not active:
+            st.rerun()  # a full run stops the polling
+
+    show_jobs()
+    metrics = scheduler.metrics()
+    wait, run = metrics["wait_ms"], metrics["run_ms"]
+    caption = f"Render workers: {metrics['running']}/{metrics['workers']} busy, {metrics['queued']} queued"
+    if run["p50"] is not None:
+        caption += (f" · queue wait p50 {wait['p50']:.0f} ms, p95 {wait['p95']:.0f} ms"
+                    f" · run time p50 {run['p50']:.0f} ms, p95 {run['p95']:.0f} ms")
+    st.caption(caption)
+    profile.mark("mail_merge")
+
+# Process uploaded image: a proxy sized to the canvas is stored once and referenced by URL
+background_url = ""
+if uploaded is not None:
+    bleed_px = bleed_pixels(dpi)
+    proxy = prepare_background(uploaded.getvalue(), (pixels_w + 2 * bleed_px, pixels_h + 2 * bleed_px), dpi,
+                               uploaded.type or "image/png")
+    # Blur and brightness are baked in server-side; the editor only sets opacity
+    proxy = adjust_background(proxy, bg_blur, bg_brightness)
+    background_url = asset_store.put(proxy.data, proxy.mime)
+profile.mark("upload")
+
+# Canvas editor: a persistent component that receives settings and syncs edits back
+editor_settings = {
+    "canvas": {"width": pixels_w, "height": pixels_h, "dpi": dpi,
+               "format": card_format, "orientation": orientation},
+    "guides": {"bleed": show_bleed, "safeZone": show_safe_zone,
+               "center": show_center_guides, "grid": show_grid},
+    "style": {"primaryColor": primary_color, "roundedCorners": rounded_corners},
+    "background": {"url": background_url, "opacity": bg_opacity} if background_url else None,
+    "template": template,
+    "templates": TEMPLATE_CONFIGS,
+    "export": {"format": export_format},
+    "historyBudgetBytes": history_budget_mb * 1024 * 1024,
+    "frameHeight": 800,
 }
+profile.payload("settings", editor_settings)
+profile.payload("delta", st.session_state.get("card_canvas"))
+profile.mark("settings")
+canvas_state = card_canvas(editor_settings)
+if canvas_state["telemetry"]:
+    client_telemetry.add(session_id, canvas_state["telemetry"])
+    canvas_state["telemetry"] = None
+profile.mark("component")
+tti_ms = canvas_state["metrics"].get("ttiMs")
+if tti_ms is not None:
+    status = "✅" if tti_ms <= EDITOR_TTI_TARGET_MS else "⚠️"
+    st.caption(f"{status} Editor interactive in {tti_ms} ms (target {EDITOR_TTI_TARGET_MS} ms)")
+if missing_libraries():
+    st.error("Editor libraries are missing from card_designer/frontend/vendor; "
+             "run `python -m card_designer.vendor` to restore them.")
 
-html = f"""
-<!doctype html>
-<html>
-<head>
-    <meta charset="utf-8" />
-    <title>Professional Business Card Canvas</title>
-    <style>
-        body {{ 
-            margin: 0; 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            background: #f5f5f5;
-        }}
-        .app-container {{
-            background: white;
-            border-radius: 12px;
-            box-shadow: 0 4px 20px rgba(0,0,0,0.1);
-            overflow: hidden;
-        }}
-        .toolbar {{ 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            padding: 16px; 
-            display: flex; 
-            gap: 12px; 
-            flex-wrap: wrap; 
-            align-items: center;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }}
-        .toolbar-section {{
-            display: flex;
-            gap: 8px;
-            align-items: center;
-            background: rgba(255,255,255,0.1);
-            padding: 8px 12px;
-            border-radius: 6px;
-            backdrop-filter: blur(10px);
-        }}
-        .toolbar button, .toolbar select, .toolbar input[type="number"], .toolbar input[type="text"] {{ 
-            padding: 8px 12px; 
-            font-size: 14px; 
-            border: none;
-            border-radius: 4px;
-            background: white;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            cursor: pointer;
-            transition: all 0.3s ease;
-        }}
-        .toolbar button:hover {{
-            transform: translateY(-2px);
-            box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-        }}
-        .toolbar input[type="color"] {{
-            width: 40px;
-            height: 35px;
-            padding: 2px;
-            border: none;
-            border-radius: 4px;
-            cursor: pointer;
-        }}
-        .toolbar label {{
-            color: white;
-            font-weight: 500;
-            font-size: 13px;
-        }}
-        #canvas-holder {{ 
-            border: none;
-            display: flex; 
-            justify-content: center; 
-            align-items: center; 
-            background: #f8f9fa;
-            padding: 32px;
-            position: relative;
-        }}
-        .canvas-wrapper {{
-            background: white;
-            border-radius: 8px;
-            box-shadow: 0 8px 32px rgba(0,0,0,0.1);
-            padding: 16px;
-            position: relative;
-        }}
-        .layer-panel {{
-            position: absolute;
-            right: 20px;
-            top: 20px;
-            background: white;
-            border-radius: 8px;
-            box-shadow: 0 4px 16px rgba(0,0,0,0.1);
-            padding: 16px;
-            min-width: 200px;
-            z-index: 1000;
-        }}
-        .layer-item {{
-            padding: 8px;
-            border-radius: 4px;
-            margin: 4px 0;
-            cursor: pointer;
-            border: 1px solid #e0e0e0;
-            transition: all 0.2s ease;
-        }}
-        .layer-item:hover {{
-            background: #f0f0f0;
-        }}
-        .layer-item.active {{
-            background: #667eea;
-            color: white;
-            border-color: #667eea;
-        }}
-        .properties-panel {{
-            position: absolute;
-            left: 20px;
-            top: 20px;
-            background: white;
-            border-radius: 8px;
-            box-shadow: 0 4px 16px rgba(0,0,0,0.1);
-            padding: 16px;
-            min-width: 220px;
-            z-index: 1000;
-            max-height: 400px;
-            overflow-y: auto;
-        }}
-        .property-group {{
-            margin-bottom: 16px;
-            padding-bottom: 12px;
-            border-bottom: 1px solid #eee;
-        }}
-        .property-group:last-child {{
-            border-bottom: none;
-        }}
-        .property-group h4 {{
-            margin: 0 0 8px 0;
-            color: #333;
-            font-size: 14px;
-        }}
-        .property-row {{
-            display: flex;
-            align-items: center;
-            gap: 8px;
-            margin: 6px 0;
-        }}
-        .property-row label {{
-            flex: 1;
-            font-size: 12px;
-            color: #666;
-        }}
-        .property-row input, .property-row select {{
-            flex: 1;
-            padding: 4px 6px;
-            border: 1px solid #ddd;
-            border-radius: 3px;
-            font-size: 12px;
-        }}
-        .status-bar {{
-            background: #34495e;
-            color: white;
-            padding: 8px 16px;
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-            font-size: 12px;
-        }}
-        .btn-primary {{ background: #667eea !important; }}
-        .btn-success {{ background: #27ae60 !important; }}
-        .btn-danger {{ background: #e74c3c !important; }}
-        .btn-warning {{ background: #f39c12 !important; }}
-        .hidden {{ display: none !important; }}
-        
-        /* Responsive design */
-        @media (max-width: 768px) {{
-            .toolbar {{ flex-direction: column; align-items: stretch; }}
-            .toolbar-section {{ justify-content: center; }}
-            .layer-panel, .properties-panel {{ 
-                position: relative; 
-                width: 100%; 
-                margin: 10px 0;
-            }}
-        }}
-    </style>
-    <!-- Enhanced Fabric.js CDN -->
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/fabric.js/5.3.0/fabric.min.js"></script>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/jscolor/2.5.1/jscolor.min.js"></script>
-</head>
-<body>
-    <div class="app-container">
-        <!-- Enhanced Toolbar -->
-        <div class="toolbar">
-            <div class="toolbar-section">
-                <button id="add-text" class="btn-primary">📝 Add Text</button>
-                <button id="add-heading" class="btn-primary">🎯 Add Heading</button>
-                <button id="add-contact" class="btn-primary">📞 Contact Info</button>
-            </div>
-            
-            <div class="toolbar-section">
-                <button id="add-rect">⬜ Rectangle</button>
-                <button id="add-circle">⭕ Circle</button>
-                <button id="add-line">📏 Line</button>
-                <button id="add-triangle">🔺 Triangle</button>
-            </div>
-            
-            <div class="toolbar-section">
-                <label>Font:</label>
-                <select id="font-family">
-                    <option value="Arial">Arial</option>
-                    <option value="Helvetica">Helvetica</option>
-                    <option value="Times New Roman">Times</option>
-                    <option value="Georgia">Georgia</option>
-                    <option value="Verdana">Verdana</option>
-                    <option value="Impact">Impact</option>
-                </select>
-                <label>Size:</label>
-                <input id="font-size" type="number" value="24" min="8" max="100" style="width:60px">
-                <input id="text-color" type="color" value="#000000" title="Text Color">
-            </div>
-            
-            <div class="toolbar-section">
-                <button id="text-bold">B</button>
-                <button id="text-italic">I</button>
-                <button id="text-underline">U</button>
-                <button id="align-left">◀</button>
-                <button id="align-center">▣</button>
-                <button id="align-right">▶</button>
-            </div>
-            
-            <div class="toolbar-section">
-                <button id="bring-forward">⬆ Forward</button>
-                <button id="send-backward">⬇ Backward</button>
-                <button id="bring-front">⏫ Front</button>
-                <button id="send-back">⏬ Back</button>
-            </div>
-            
-            <div class="toolbar-section">
-                <button id="group">🔗 Group</button>
-                <button id="ungroup">💥 Ungroup</button>
-                <button id="duplicate">📋 Duplicate</button>
-                <button id="delete" class="btn-danger">🗑 Delete</button>
-            </div>
-            
-            <div class="toolbar-section">
-                <button id="zoom-in">🔍+ Zoom In</button>
-                <button id="zoom-out">🔍- Zoom Out</button>
-                <button id="zoom-fit">🎯 Fit</button>
-                <button id="toggle-panels">👁 Panels</button>
-            </div>
-            
-            <div class="toolbar-section">
-                <button id="undo">↶ Undo</button>
-                <button id="redo">↷ Redo</button>
-                <button id="clear-all" class="btn-warning">🧹 Clear</button>
-                <button id="save-template">💾 Save</button>
-            </div>
-            
-            <div class="toolbar-section">
-                <button id="export-png" class="btn-success">📤 Export PNG</button>
-                <button id="export-pdf" class="btn-success">📤 Export PDF</button>
-                <button id="print" class="btn-success">🖨 Print</button>
-            </div>
-        </div>
-        
-        <!-- Canvas Area with Panels -->
-        <div id="canvas-holder">
-            <div class="properties-panel" id="properties-panel">
-                <h3 style="margin-top:0; color:#667eea;">🎨 Properties</h3>
-                <div id="object-properties">
-                    <p style="color:#999; font-style:italic;">Select an object to edit properties</p>
-                </div>
-            </div>
-            
-            <div class="canvas-wrapper">
-                <canvas id="canvas"></canvas>
-            </div>
-            
-            <div class="layer-panel" id="layer-panel">
-                <h3 style="margin-top:0; color:#667eea;">📚 Layers</h3>
-                <div id="layer-list">
-                    <!-- Layers will be populated here -->
-                </div>
-            </div>
-        </div>
-        
-        <!-- Status Bar -->
-        <div class="status-bar">
-            <div id="status-left">Ready • {card_format} • {orientation} • {dpi} DPI</div>
-            <div id="status-right">
-                <span id="object-count">0 objects</span> • 
-                <span id="canvas-zoom">100%</span> • 
-                <span id="mouse-coords">0, 0</span>
-            </div>
-        </div>
-    </div>
+# Server-side print export of the live canvas or a saved design (💾 Save in the editor)
+with st.expander("🖨️ Print-Resolution Export"):
+    st.markdown(f"Renders the design at exactly **{pixels_w} × {pixels_h} px** @ {dpi} DPI, "
+                "independent of the editor's on-screen zoom.")
+    export_source = st.radio("Source", ["Current canvas", "Saved design file"], horizontal=True)
+    design = None
+    if export_source == "Current canvas":
+        st.caption(f"{len(canvas_state['objects'])} objects synced from the editor")
+        if st.button("Render Current Canvas"):
+            design = canvas_json(canvas_state)
+    else:
+        saved_design = st.file_uploader("Saved design (business-card-template.json)", type=["json"],
+                                        key="print_export_design")
+        if saved_design is not None:
+            design = saved_design.getvalue()
+    if design is not None:
+        try:
+            canvas, _metadata = load_design(design)
+            preview = render_design(canvas, pixels_w, pixels_h, bleed_pixels(dpi), scale=min(1.0, 800 / pixels_w),
+                                    include_bleed=include_bleed, image_loader=asset_store.open_image)
+        except ValueError as exc:
+            st.error(f"Could not render design: {exc}")
+        else:
+            st.image(preview, caption=f"Preview of the {export_format} export", use_container_width=True)
+            fmt = export_format.lower()
+            target = output_format(fmt, output_color)
+            export_settings = {"format": fmt, "size": [pixels_w, pixels_h], "dpi": dpi, "bleed": include_bleed,
+                               "color": output_color, "quality": export_quality, "compression": png_compression}
 
-<script>
-    // Canvas configuration
-    const canvasW = {pixels_w};
-    const canvasH = {pixels_h};
-    const dpi = {dpi};
-    const safeMarginPx = Math.round(0.125 * dpi);
-    const bleedMarginPx = Math.round(0.125 * dpi);
-    
-    // Initialize canvas
-    const canvasEl = document.getElementById('canvas');
-    canvasEl.width = canvasW + (2 * bleedMarginPx);
-    canvasEl.height = canvasH + (2 * bleedMarginPx);
-    
-    const canvas = new fabric.Canvas('canvas', {{
-        backgroundColor: '#ffffff',
-        preserveObjectStacking: true,
-        selection: true,
-        imageSmoothingEnabled: true,
-    }});
-    
-    // Global variables
-    let currentZoom = 1;
-    let panelsVisible = true;
-    let undoStack = [];
-    let redoStack = [];
-    let objectCounter = 0;
-    
-    // Template configurations
-    const templates = {json.dumps(template_configs)};
-    
-    // Responsive canvas scaling
-    function fitCanvasDisplay() {{
-        const holder = document.getElementById('canvas-holder');
-        const wrapper = holder.querySelector('.canvas-wrapper');
-        const availableWidth = window.innerWidth - (panelsVisible ? 480 : 80);
-        const availableHeight = window.innerHeight - 300;
-        
-        const scale = Math.min(
-            availableWidth / (canvasW + 2 * bleedMarginPx), 
-            availableHeight / (canvasH + 2 * bleedMarginPx),
-            1
-        );
-        
-        canvas.setWidth((canvasW + 2 * bleedMarginPx) * scale);
-        canvas.setHeight((canvasH + 2 * bleedMarginPx) * scale);
-        canvas.setZoom(scale);
-        canvas.calcOffset();
-        currentZoom = scale;
-        updateStatusBar();
-    }}
-    
-    window.addEventListener('resize', fitCanvasDisplay);
-    fitCanvasDisplay();
-    
-    // Initialize guides and grid
-    function createGuides() {{
-        // Bleed area
-        if ({str(show_bleed).lower()}) {{
-            const bleedRect = new fabric.Rect({{
-                left: 0, top: 0,
-                width: canvasW + 2 * bleedMarginPx,
-                height: canvasH + 2 * bleedMarginPx,
-                fill: 'rgba(255,0,0,0.05)',
-                stroke: 'rgba(255,0,0,0.3)',
-                strokeDashArray: [5, 5],
-                selectable: false,
-                evented: false,
-                excludeFromExport: true
-            }});
-            canvas.add(bleedRect);
-            canvas.sendToBack(bleedRect);
-        }}
-        
-        // Safe zone
-        if ({str(show_safe_zone).lower()}) {{
-            const safeRect = new fabric.Rect({{
-                left: bleedMarginPx + safeMarginPx,
-                top: bleedMarginPx + safeMarginPx,
-                width: canvasW - 2 * safeMarginPx,
-                height: canvasH - 2 * safeMarginPx,
-                fill: 'rgba(0,0,0,0)',
-                stroke: 'rgba(0,0,255,0.4)',
-                strokeDashArray: [3, 3],
-                selectable: false,
-                evented: false,
-                excludeFromExport: true
-            }});
-            canvas.add(safeRect);
-        }}
-        
-        // Center guides
-        if ({str(show_center_guides).lower()}) {{
-            const centerX = (canvasW + 2 * bleedMarginPx) / 2;
-            const centerY = (canvasH + 2 * bleedMarginPx) / 2;
-            
-            const vLine = new fabric.Line([centerX, 0, centerX, canvasH + 2 * bleedMarginPx], {{
-                stroke: 'rgba(0,255,0,0.5)',
-                strokeWidth: 1,
-                selectable: false,
-                evented: false,
-                excludeFromExport: true
-            }});
-            
-            const hLine = new fabric.Line([0, centerY, canvasW + 2 * bleedMarginPx, centerY], {{
-                stroke: 'rgba(0,255,0,0.5)',
-                strokeWidth: 1,
-                selectable: false,
-                evented: false,
-                excludeFromExport: true
-            }});
-            
-            canvas.add(vLine, hLine);
-        }}
-        
-        // Grid
-        if ({str(show_grid).lower()}) {{
-            const gridSize = dpi / 8; // 1/8 inch grid
-            for (let i = gridSize; i < canvasW + 2 * bleedMarginPx; i += gridSize) {{
-                const line = new fabric.Line([i, 0, i, canvasH + 2 * bleedMarginPx], {{
-                    stroke: 'rgba(0,0,0,0.1)',
-                    strokeWidth: 0.5,
-                    selectable: false,
-                    evented: false,
-                    excludeFromExport: true
-                }});
-                canvas.add(line);
-            }}
-            for (let i = gridSize; i < canvasH + 2 * bleedMarginPx; i += gridSize) {{
-                const line = new fabric.Line([0, i, canvasW + 2 * bleedMarginPx, i], {{
-                    stroke: 'rgba(0,0,0,0.1)',
-                    strokeWidth: 0.5,
-                    selectable: false,
-                    evented: false,
-                    excludeFromExport: true
-                }});
-                canvas.add(line);
-            }}
-        }}
-    }}
-    
-    createGuides();
-    
-    // Enhanced text creation functions
-    document.getElementById('add-text').onclick = () => {{
-        const size = parseInt(document.getElementById('font-size').value) || 24;
-        const color = document.getElementById('text-color').value || '#000';
-        const font = document.getElementById('font-family').value || 'Arial';
-        
-        const text = new fabric.IText('Click to edit text', {{
-            left: bleedMarginPx + 50, 
-            top: bleedMarginPx + 50,
-            fontSize: size,
-            fill: color,
-            fontFamily: font,
-            editable: true,
-            id: 'text_' + (++objectCounter)
-        }});
-        addObjectToCanvas(text);
-    }};
-    
-    document.getElementById('add-heading').onclick = () => {{
-        const font = document.getElementById('font-family').value || 'Arial';
-        
-        const heading = new fabric.IText('Your Name', {{
-            left: bleedMarginPx + 50,
-            top: bleedMarginPx + 30,
-            fontSize: 36,
-            fill: '{primary_color}',
-            fontFamily: font,
-            fontWeight: 'bold',
-            editable: true,
-            id: 'heading_' + (++objectCounter)
-        }});
-        addObjectToCanvas(heading);
-    }};
-    
-    document.getElementById('add-contact').onclick = () => {{
-        const font = document.getElementById('font-family').value || 'Arial';
-        
-        const contact = new fabric.IText('📧 email@company.com\\n📞 (555) 123-4567\\n🏢 Your Company Name', {{
-            left: bleedMarginPx + 50,
-            top: bleedMarginPx + 120,
-            fontSize: 16,
-            fill: '#666666',
-            fontFamily: font,
-            editable: true,
-            id: 'contact_' + (++objectCounter)
-        }});
-        addObjectToCanvas(contact);
-    }};
-    
-    // Shape creation functions
-    document.getElementById('add-rect').onclick = () => {{
-        const rect = new fabric.Rect({{
-            left: bleedMarginPx + 60,
-            top: bleedMarginPx + 60,
-            width: canvasW * 0.3,
-            height: canvasH * 0.25,
-            fill: 'rgba(102, 126, 234, 0.3)',
-            stroke: '#667eea',
-            strokeWidth: 2,
-            rx: {str(rounded_corners).lower()} ? 8 : 0,
-            ry: {str(rounded_corners).lower()} ? 8 : 0,
-            id: 'rect_' + (++objectCounter)
-        }});
-        addObjectToCanvas(rect);
-    }};
-    
-    document.getElementById('add-circle').onclick = () => {{
-        const circle = new fabric.Circle({{
-            left: bleedMarginPx + 80,
-            top: bleedMarginPx + 80,
-            radius: Math.min(canvasW, canvasH) * 0.08,
-            fill: 'rgba(240, 147, 251, 0.3)',
-            stroke: '#f093fb',
-            strokeWidth: 2,
-            id: 'circle_' + (++objectCounter)
-        }});
-        addObjectToCanvas(circle);
-    }};
-    
-    document.getElementById('add-line').onclick = () => {{
-        const line = new fabric.Line([50, 50, 200, 50], {{
-            left: bleedMarginPx + 50,
-            top: bleedMarginPx + 100,
-            stroke: '#333333',
-            strokeWidth: 3,
-            id: 'line_' + (++objectCounter)
-        }});
-        addObjectToCanvas(line);
-    }};
-    
-    document.getElementById('add-triangle').onclick = () => {{
-        const triangle = new fabric.Triangle({{
-            left: bleedMarginPx + 100,
-            top: bleedMarginPx + 100,
-            width: 80,
-            height: 80,
-            fill: 'rgba(231, 76, 60, 0.3)',
-            stroke: '#e74c3c',
-            strokeWidth: 2,
-            id: 'triangle_' + (++objectCounter)
-        }});
-        addObjectToCanvas(triangle);
-    }};
-    
-    // Text formatting functions
-    document.getElementById('text-bold').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj && obj.type === 'i-text') {{
-            obj.set('fontWeight', obj.fontWeight === 'bold' ? 'normal' : 'bold');
-            canvas.renderAll();
-            updatePropertiesPanel();
-        }}
-    }};
-    
-    document.getElementById('text-italic').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj && obj.type === 'i-text') {{
-            obj.set('fontStyle', obj.fontStyle === 'italic' ? 'normal' : 'italic');
-            canvas.renderAll();
-            updatePropertiesPanel();
-        }}
-    }};
-    
-    document.getElementById('text-underline').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj && obj.type === 'i-text') {{
-            obj.set('underline', !obj.underline);
-            canvas.renderAll();
-            updatePropertiesPanel();
-        }}
-    }};
-    
-    document.getElementById('align-left').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj && obj.type === 'i-text') {{
-            obj.set('textAlign', 'left');
-            canvas.renderAll();
-        }}
-    }};
-    
-    document.getElementById('align-center').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj && obj.type === 'i-text') {{
-            obj.set('textAlign', 'center');
-            canvas.renderAll();
-        }}
-    }};
-    
-    document.getElementById('align-right').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj && obj.type === 'i-text') {{
-            obj.set('textAlign', 'right');
-            canvas.renderAll();
-        }}
-    }};
-    
-    // Layer management functions
-    document.getElementById('bring-forward').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            obj.bringForward();
-            updateLayerPanel();
-            saveState();
-        }}
-    }};
-    
-    document.getElementById('send-backward').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            obj.sendBackwards();
-            updateLayerPanel();
-            saveState();
-        }}
-    }};
-    
-    document.getElementById('bring-front').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            canvas.bringToFront(obj);
-            updateLayerPanel();
-            saveState();
-        }}
-    }};
-    
-    document.getElementById('send-back').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            canvas.sendToBack(obj);
-            updateLayerPanel();
-            saveState();
-        }}
-    }};
-    
-    // Object manipulation functions
-    document.getElementById('group').onclick = () => {{
-        const activeSelection = canvas.getActiveObject();
-        if (activeSelection && activeSelection.type === 'activeSelection') {{
-            const group = activeSelection.toGroup();
-            group.id = 'group_' + (++objectCounter);
-            canvas.requestRenderAll();
-            updateLayerPanel();
-            saveState();
-        }}
-    }};
-    
-    document.getElementById('ungroup').onclick = () => {{
-        const activeObject = canvas.getActiveObject();
-        if (activeObject && activeObject.type === 'group') {{
-            activeObject.toActiveSelection();
-            canvas.requestRenderAll();
-            updateLayerPanel();
-            saveState();
-        }}
-    }};
-    
-    document.getElementById('duplicate').onclick = () => {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            obj.clone((cloned) => {{
-                cloned.set({{
-                    left: cloned.left + 20,
-                    top: cloned.top + 20,
-                    id: obj.type + '_' + (++objectCounter)
-                }});
-                addObjectToCanvas(cloned);
-            }});
-        }}
-    }};
-    
-    document.getElementById('delete').onclick = () => {{
-        const activeObjects = canvas.getActiveObjects();
-        if (activeObjects.length) {{
-            activeObjects.forEach(obj => canvas.remove(obj));
-            canvas.discardActiveObject();
-            updateLayerPanel();
-            updateStatusBar();
-            saveState();
-        }}
-    }};
-    
-    // Zoom and view functions
-    document.getElementById('zoom-in').onclick = () => {{
-        let zoom = canvas.getZoom();
-        zoom = zoom * 1.2;
-        if (zoom > 5) zoom = 5;
-        canvas.setZoom(zoom);
-        currentZoom = zoom;
-        updateStatusBar();
-    }};
-    
-    document.getElementById('zoom-out').onclick = () => {{
-        let zoom = canvas.getZoom();
-        zoom = zoom / 1.2;
-        if (zoom < 0.1) zoom = 0.1;
-        canvas.setZoom(zoom);
-        currentZoom = zoom;
-        updateStatusBar();
-    }};
-    
-    document.getElementById('zoom-fit').onclick = () => {{
-        fitCanvasDisplay();
-    }};
-    
-    document.getElementById('toggle-panels').onclick = () => {{
-        panelsVisible = !panelsVisible;
-        const propertiesPanel = document.getElementById('properties-panel');
-        const layerPanel = document.getElementById('layer-panel');
-        
-        if (panelsVisible) {{
-            propertiesPanel.style.display = 'block';
-            layerPanel.style.display = 'block';
-        }} else {{
-            propertiesPanel.style.display = 'none';
-            layerPanel.style.display = 'none';
-        }}
-        fitCanvasDisplay();
-    }};
-    
-    // History functions
-    document.getElementById('undo').onclick = () => {{
-        if (undoStack.length > 0) {{
-            redoStack.push(canvas.toJSON());
-            const state = undoStack.pop();
-            canvas.loadFromJSON(state, () => {{
-                canvas.renderAll();
-                updateLayerPanel();
-                updateStatusBar();
-            }});
-        }}
-    }};
-    
-    document.getElementById('redo').onclick = () => {{
-        if (redoStack.length > 0) {{
-            undoStack.push(canvas.toJSON());
-            const state = redoStack.pop();
-            canvas.loadFromJSON(state, () => {{
-                canvas.renderAll();
-                updateLayerPanel();
-                updateStatusBar();
-            }});
-        }}
-    }};
-    
-    document.getElementById('clear-all').onclick = () => {{
-        if (confirm('Are you sure you want to clear all objects?')) {{
-            canvas.clear();
-            canvas.backgroundColor = '#ffffff';
-            createGuides();
-            updateLayerPanel();
-            updateStatusBar();
-            saveState();
-        }}
-    }};
-    
-    document.getElementById('save-template').onclick = () => {{
-        const templateData = {{
-            canvas: canvas.toJSON(),
-            metadata: {{
-                name: 'Custom Template',
-                created: new Date().toISOString(),
-                dimensions: {{ width: canvasW, height: canvasH, dpi: dpi }}
-            }}
-        }};
-        
-        const blob = new Blob([JSON.stringify(templateData, null, 2)], {{ type: 'application/json' }});
-        const url = URL.createObjectURL(blob);
-        const link = document.createElement('a');
-        link.href = url;
-        link.download = 'business-card-template.json';
-        link.click();
-        URL.revokeObjectURL(url);
-        
-        alert('Template saved successfully!');
-    }};
-    
-    // Export functions
-    document.getElementById('export-png').onclick = () => {{
-        // Hide guides and selection for clean export
-        const guides = canvas.getObjects().filter(obj => obj.excludeFromExport);
-        guides.forEach(guide => guide.visible = false);
-        canvas.discardActiveObject();
-        
-        // Calculate export dimensions
-        const exportW = {str(include_bleed).lower()} ? canvasW + 2 * bleedMarginPx : canvasW;
-        const exportH = {str(include_bleed).lower()} ? canvasH + 2 * bleedMarginPx : canvasH;
-        const exportLeft = {str(include_bleed).lower()} ? 0 : bleedMarginPx;
-        const exportTop = {str(include_bleed).lower()} ? 0 : bleedMarginPx;
-        
-        const dataURL = canvas.toDataURL({{
-            format: 'png',
-            quality: 1,
-            left: exportLeft,
-            top: exportTop,
-            width: exportW,
-            height: exportH,
-            multiplier: 1
-        }});
-        
-        // Restore guides
-        guides.forEach(guide => guide.visible = true);
-        
-        const link = document.createElement('a');
-        link.href = dataURL;
-        link.download = `business-card-{dpi}dpi.png`;
-        link.click();
-    }};
-    
-    document.getElementById('export-pdf').onclick = () => {{
-        // This would require a PDF library like jsPDF
-        alert('PDF export feature would require additional PDF library integration');
-    }};
-    
-    document.getElementById('print').onclick = () => {{
-        window.print();
-    }};
-    
-    // Helper functions
-    function addObjectToCanvas(obj) {{
-        canvas.add(obj);
-        canvas.setActiveObject(obj);
-        updateLayerPanel();
-        updateStatusBar();
-        saveState();
-    }}
-    
-    function saveState() {{
-        const state = canvas.toJSON();
-        undoStack.push(JSON.stringify(state));
-        if (undoStack.length > 20) undoStack.shift(); // Limit history
-        redoStack = []; // Clear redo stack on new action
-    }}
-    
-    function updateLayerPanel() {{
-        const layerList = document.getElementById('layer-list');
-        layerList.innerHTML = '';
-        
-        const objects = canvas.getObjects().filter(obj => !obj.excludeFromExport);
-        
-        objects.reverse().forEach((obj, index) => {{
-            const layerItem = document.createElement('div');
-            layerItem.className = 'layer-item';
-            layerItem.innerHTML = `
-                <div style="display:flex; justify-content:space-between; align-items:center;">
-                    <span>${{obj.id || obj.type || 'Object'}} ${{index + 1}}</span>
-                    <div>
-                        <button onclick="toggleObjectVisibility('${{obj.id}}')" style="font-size:12px; padding:2px 4px;">${{obj.visible === false ? '👁‍🗨' : '👁'}}</button>
-                        <button onclick="lockObject('${{obj.id}}')" style="font-size:12px; padding:2px 4px;">${{obj.lockMovementX ? '🔒' : '🔓'}}</button>
-                    </div>
-                </div>
-            `;
-            
-            layerItem.onclick = () => {{
-                canvas.setActiveObject(obj);
-                canvas.renderAll();
-                updatePropertiesPanel();
-                
-                // Update visual selection in layer panel
-                document.querySelectorAll('.layer-item').forEach(item => item.classList.remove('active'));
-                layerItem.classList.add('active');
-            }};
-            
-            layerList.appendChild(layerItem);
-        }});
-    }}
-    
-    function updatePropertiesPanel() {{
-        const obj = canvas.getActiveObject();
-        const propertiesDiv = document.getElementById('object-properties');
-        
-        if (!obj) {{
-            propertiesDiv.innerHTML = '<p style="color:#999; font-style:italic;">Select an object to edit properties</p>';
-            return;
-        }}
-        
-        let html = `
-            <div class="property-group">
-                <h4>📐 Position & Size</h4>
-                <div class="property-row">
-                    <label>X:</label>
-                    <input type="number" value="${{Math.round(obj.left)}}" onchange="updateObjectProperty('left', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Y:</label>
-                    <input type="number" value="${{Math.round(obj.top)}}" onchange="updateObjectProperty('top', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Width:</label>
-                    <input type="number" value="${{Math.round(obj.width * obj.scaleX)}}" onchange="updateObjectSize('width', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Height:</label>
-                    <input type="number" value="${{Math.round(obj.height * obj.scaleY)}}" onchange="updateObjectSize('height', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Rotation:</label>
-                    <input type="number" value="${{Math.round(obj.angle)}}" min="0" max="360" onchange="updateObjectProperty('angle', this.value)">
-                </div>
-            </div>
-            
-            <div class="property-group">
-                <h4>🎨 Appearance</h4>
-                <div class="property-row">
-                    <label>Opacity:</label>
-                    <input type="range" min="0" max="1" step="0.1" value="${{obj.opacity}}" onchange="updateObjectProperty('opacity', this.value)">
-                </div>
-        `;
-        
-        if (obj.type === 'i-text') {{
-            html += `
-                <div class="property-row">
-                    <label>Font Size:</label>
-                    <input type="number" value="${{obj.fontSize}}" min="8" max="200" onchange="updateObjectProperty('fontSize', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Color:</label>
-                    <input type="color" value="${{obj.fill}}" onchange="updateObjectProperty('fill', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Font:</label>
-                    <select onchange="updateObjectProperty('fontFamily', this.value)">
-                        <option value="Arial" ${{obj.fontFamily === 'Arial' ? 'selected' : ''}}>Arial</option>
-                        <option value="Helvetica" ${{obj.fontFamily === 'Helvetica' ? 'selected' : ''}}>Helvetica</option>
-                        <option value="Times New Roman" ${{obj.fontFamily === 'Times New Roman' ? 'selected' : ''}}>Times New Roman</option>
-                        <option value="Georgia" ${{obj.fontFamily === 'Georgia' ? 'selected' : ''}}>Georgia</option>
-                    </select>
-                </div>
-            `;
-        }} else {{
-            html += `
-                <div class="property-row">
-                    <label>Fill:</label>
-                    <input type="color" value="${{obj.fill}}" onchange="updateObjectProperty('fill', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Stroke:</label>
-                    <input type="color" value="${{obj.stroke || '#000000'}}" onchange="updateObjectProperty('stroke', this.value)">
-                </div>
-                <div class="property-row">
-                    <label>Stroke Width:</label>
-                    <input type="number" value="${{obj.strokeWidth || 0}}" min="0" max="20" onchange="updateObjectProperty('strokeWidth', this.value)">
-                </div>
-            `;
-        }}
-        
-        html += `
-            </div>
-            
-            <div class="property-group">
-                <h4>🔧 Actions</h4>
-                <button onclick="duplicateActiveObject()" style="width:100%; margin:2px 0;">Duplicate</button>
-                <button onclick="deleteActiveObject()" style="width:100%; margin:2px 0; background:#e74c3c; color:white;">Delete</button>
-            </div>
-        `;
-        
-        propertiesDiv.innerHTML = html;
-    }}
-    
-    function updateObjectProperty(prop, value) {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            if (prop === 'fill' || prop === 'stroke') {{
-                obj.set(prop, value);
-            }} else {{
-                obj.set(prop, parseFloat(value) || value);
-            }}
-            canvas.renderAll();
-            saveState();
-        }}
-    }}
-    
-    function updateObjectSize(dimension, value) {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            const newValue = parseFloat(value);
-            if (dimension === 'width') {{
-                const scale = newValue / obj.width;
-                obj.set('scaleX', scale);
-            }} else if (dimension === 'height') {{
-                const scale = newValue / obj.height;
-                obj.set('scaleY', scale);
-            }}
-            canvas.renderAll();
-            saveState();
-        }}
-    }}
-    
-    function updateStatusBar() {{
-        const objectCount = canvas.getObjects().filter(obj => !obj.excludeFromExport).length;
-        document.getElementById('object-count').textContent = `${{objectCount}} object${{objectCount !== 1 ? 's' : ''}}`;
-        document.getElementById('canvas-zoom').textContent = `${{Math.round(currentZoom * 100)}}%`;
-    }}
-    
-    function toggleObjectVisibility(id) {{
-        const obj = canvas.getObjects().find(o => o.id === id);
-        if (obj) {{
-            obj.set('visible', !obj.visible);
-            canvas.renderAll();
-            updateLayerPanel();
-        }}
-    }}
-    
-    function lockObject(id) {{
-        const obj = canvas.getObjects().find(o => o.id === id);
-        if (obj) {{
-            const locked = !obj.lockMovementX;
-            obj.set({{
-                lockMovementX: locked,
-                lockMovementY: locked,
-                lockScalingX: locked,
-                lockScalingY: locked,
-                lockRotation: locked
-            }});
-            updateLayerPanel();
-        }}
-    }}
-    
-    function duplicateActiveObject() {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            obj.clone((cloned) => {{
-                cloned.set({{
-                    left: cloned.left + 20,
-                    top: cloned.top + 20,
-                    id: obj.type + '_' + (++objectCounter)
-                }});
-                addObjectToCanvas(cloned);
-            }});
-        }}
-    }}
-    
-    function deleteActiveObject() {{
-        const obj = canvas.getActiveObject();
-        if (obj) {{
-            canvas.remove(obj);
-            updateLayerPanel();
-            updateStatusBar();
-            saveState();
-        }}
-    }}
-    
-    // Background image handling
-    async function setBackgroundFromDataUrl(dataUrl) {{
-        if (!dataUrl) return;
-        
-        fabric.Image.fromURL(dataUrl, function(img) {{
-            const scale = Math.max(
-                (canvasW + 2 * bleedMarginPx) / img.width, 
-                (canvasH + 2 * bleedMarginPx) / img.height
-            );
-            
-            img.scale(scale);
-            img.set({{
-                left: ((canvasW + 2 * bleedMarginPx) - img.width * scale) / 2,
-                top: ((canvasH + 2 * bleedMarginPx) - img.height * scale) / 2,
-                selectable: false,
-                opacity: {bg_opacity if uploaded else 1},
-                id: 'background_image'
-            }});
-            
-            // Apply filters if specified
-            {f'img.filters = [new fabric.Image.filters.Blur({{ blur: {bg_blur} }}), new fabric.Image.filters.Brightness({{ brightness: {bg_brightness} - 1 }})];' if uploaded else ''}
-            {f'img.applyFilters();' if uploaded else ''}
-            
-            // Remove existing background images
-            const toRemove = canvas.getObjects().filter(o => o.id === 'background_image');
-            toRemove.forEach(o => canvas.remove(o));
-            
-            canvas.add(img);
-            canvas.sendToBack(img);
-            canvas.renderAll();
-            updateLayerPanel();
-            saveState();
-        }}, {{ crossOrigin: 'anonymous' }});
-    }}
-    
-    // Load uploaded image
-    const injectedImage = {repr(image_data_url) if image_data_url else 'null'};
-    if (injectedImage) {{
-        setBackgroundFromDataUrl(injectedImage);
-    }}
-    
-    // Apply template function
-    function applyTemplate(templateName) {{
-        if (!templates[templateName]) return;
-        
-        const template = templates[templateName];
-        
-        // Apply background
-        if (template.bg_color) {{
-            canvas.backgroundColor = template.bg_color;
-        }} else if (template.bg_gradient) {{
-            // Note: Fabric.js doesn't directly support CSS gradients
-            // This would need additional implementation
-            canvas.backgroundColor = template.bg_gradient.split(',')[0].replace('linear-gradient(135deg, ', '').trim();
-        }}
-        
-        canvas.renderAll();
-        saveState();
-        alert(`Template "${{templateName}}" applied successfully!`);
-    }}
-    
-    // Apply template from Streamlit selection
-    const selectedTemplate = '{template}';
-    if (selectedTemplate && selectedTemplate !== 'Blank') {{
-        setTimeout(() => applyTemplate(selectedTemplate), 100);
-    }}
-    
-    // Event listeners
-    canvas.on('object:added', updateLayerPanel);
-    canvas.on('object:removed', updateLayerPanel);
-    canvas.on('selection:created', updatePropertiesPanel);
-    canvas.on('selection:updated', updatePropertiesPanel);
-    canvas.on('selection:cleared', updatePropertiesPanel);
-    canvas.on('object:modified', saveState);
-    
-    // Mouse tracking
-    canvas.on('mouse:move', function(e) {{
-        const pointer = canvas.getPointer(e.e);
-        document.getElementById('mouse-coords').textContent = 
-            `${{Math.round(pointer.x)}}, ${{Math.round(pointer.y)}}`;
-    }});
-    
-    // Keyboard shortcuts
-    window.addEventListener('keydown', function(e) {{
-        if (e.ctrlKey || e.metaKey) {{
-            switch(e.key) {{
-                case 'z': e.preventDefault(); document.getElementById('undo').click(); break;
-                case 'y': e.preventDefault(); document.getElementById('redo').click(); break;
-                case 'c': e.preventDefault(); /* Copy functionality */ break;
-                case 'v': e.preventDefault(); /* Paste functionality */ break;
-                case 'd': e.preventDefault(); document.getElementById('duplicate').click(); break;
-                case 's': e.preventDefault(); document.getElementById('save-template').click(); break;
-            }}
-        }} else {{
-            switch(e.key) {{
-                case 'Delete': document.getElementById('delete').click(); break;
-                case 'Escape': canvas.discardActiveObject(); canvas.renderAll(); break;
-            }}
-        }}
-    }});
-    
-    // Initialize
-    updateLayerPanel();
-    updateStatusBar();
-    saveState();
-    
-    // Auto-save functionality (saves to browser storage periodically)
-    setInterval(() => {{
-        const autoSaveData = {{
-            canvas: canvas.toJSON(),
-            timestamp: Date.now()
-        }};
-        // Note: localStorage not available in Claude artifacts
-        console.log('Auto-save triggered');
-    }}, 30000); // Every 30 seconds
-    
-    console.log('Professional Business Card Designer loaded successfully!');
-</script>
-</body>
-</html>
-"""
+            # Encoding runs in the shared worker pool when the button is clicked,
+            # and the result is cached on disk by design and settings.
+            export_bytes = partial(render_cache.get_or_create, canonical_hash(canvas, export_settings), partial(
+                scheduler.run, session_id, export_job, canvas, fmt, pixels_w, pixels_h, bleed_pixels(dpi),
+                label=f"{export_format} export", dpi=dpi, quality=export_quality, compress_level=png_compression,
+                include_bleed=include_bleed, image_loader=asset_store.open_image, color=output_color))
 
-# Display the enhanced canvas
-components.html(html, height=800, scrolling=True)
+            st.download_button(f"📥 Download {export_format}" + (" (CMYK TIFF)" if target.extension == "tif" else ""),
+                               export_bytes, file_name=f"business-card-{dpi}dpi.{target.extension}",
+                               mime=target.mime, on_click="ignore", type="primary")
+    st.caption(f"Render cache: {render_cache.hits} hits · {render_cache.misses} misses · "
+               f"{len(render_cache)} files, {render_cache.current_bytes / 1e6:.1f} MB")
+profile.mark("export")
 
 # Additional features below canvas
 st.markdown("---")
@@ -1474,4 +499,38 @@ st.markdown("""
     <p><strong>Professional Business Card Designer</strong> • Built with Streamlit & Fabric.js</p>
     <p>💡 <em>Tip: For best results, use high-resolution images and save at 300 DPI for professional printing</em></p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# Rerun performance: logged every run, shown when the sidebar's Performance Panel is on
+rerun = profile.finish("page")
+perf_history = st.session_state.setdefault("perf_history", new_history())
+perf_history.append(rerun)
+if perf_panel:
+    with st.expander("⏱️ Rerun Performance", expanded=True):
+        summary = summarize(perf_history)
+        st.dataframe([{"Stage": name, "This run (ms)": round(ms, 1),
+                       "p50 (ms)": summary["stages_ms"][name]["p50"], "p95 (ms)": summary["stages_ms"][name]["p95"]}
+                      for name, ms in rerun["stages_ms"].items()], hide_index=True, use_container_width=True)
+        peak = rerun["peak_bytes"]
+        st.caption(f"Total {rerun['total_ms']:.0f} ms (p50 {summary['total_ms']['p50']:.0f} ms, "
+                   f"p95 {summary['total_ms']['p95']:.0f} ms over {summary['runs']} reruns) · "
+                   f"settings payload {rerun['payload_bytes']['settings'] / 1e3:.1f} kB · "
+                   f"editor delta {rerun['payload_bytes']['delta'] / 1e3:.1f} kB · "
+                   + (f"peak heap {peak / 1e6:.1f} MB" if peak is not None else "peak heap from the next rerun"))
+        client = client_telemetry.summary()
+        st.markdown("**Editor (browser), all sessions**")
+        if client["operations"]:
+            st.dataframe([{"Operation": op["operation"], "DPI": op["dpi"], "Count": op["count"], "p50 (ms)": op["p50"],
+                           "p95 (ms)": op["p95"], "Max (ms)": op["max"]} for op in client["operations"]],
+                         hide_index=True, use_container_width=True)
+            gauges = client["gauges"]
+            caption = f"{client['reports']} editor reports"
+            if "historyBytes" in gauges:
+                caption += (f" · undo history per session: p50 {gauges['historyBytes']['p50'] / 1e6:.1f} MB, "
+                            f"max {gauges['historyBytes']['max'] / 1e6:.1f} MB")
+            if "renderRequests" in gauges and "rendersCoalesced" in gauges:
+                caption += (f" · canvas redraw requests per session: p50 {gauges['renderRequests']['p50']:.0f}, "
+                            f"of which coalesced into shared frames p50 {gauges['rendersCoalesced']['p50']:.0f}")
+            st.caption(caption)
+        else:
+            st.caption("No editor timings reported yet; they arrive with the editor's next sync.")